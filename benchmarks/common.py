@@ -0,0 +1,119 @@
+import datetime
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+import numpy as np
+
+ROOT_PATH = pathlib.Path(__file__).absolute().parent.parent
+if str(ROOT_PATH) not in sys.path:
+    sys.path.insert(0, str(ROOT_PATH))
+
+PERCENTILES = (50, 90, 99)
+
+
+def headless():
+    """
+    Use offscreen Qt platform, must be called before QApplication is created
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def measure(name, func: Callable, calls=1000, samples_per_call=1, warmup=10, allocation_calls=None) -> dict:
+    """
+    Time every call of `func` and return rate, latency percentiles and memory allocations.
+    Allocations are measured in separate run under tracemalloc, so tracing doesn't distort timing.
+    """
+    for _ in range(warmup):
+        func()
+    durations = np.empty(calls)
+    clock = time.perf_counter
+    for index in range(calls):
+        start = clock()
+        func()
+        durations[index] = clock() - start
+
+    allocation_calls = calls if allocation_calls is None else allocation_calls
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    for _ in range(allocation_calls):
+        func()
+    after, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+                 if stat.count_diff > 0)
+    tracemalloc.stop()
+
+    total = durations.sum()
+    result = {
+        "name": name,
+        "calls": calls,
+        "samples_per_call": samples_per_call,
+        "samples_per_second": calls * samples_per_call / total if total > 0 else None,
+        "latency_us": {"mean": durations.mean() * 1e6, "max": durations.max() * 1e6},
+        "peak_bytes": peak - before,
+        "retained_bytes_per_call": (after - before) / allocation_calls,
+        "retained_blocks": blocks,
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+        result["latency_us"]["p{}".format(percentile)] = value * 1e6
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT_PATH), capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata(**parameters) -> dict:
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "parameters": parameters,
+    }
+
+
+def save(path, meta: dict, results: List[dict]):
+    with open(path, "w") as fout:
+        json.dump({"meta": meta, "results": results}, fout, indent=2)
+
+
+def load(path) -> dict:
+    with open(path) as fout:
+        return json.load(fout)
+
+
+def print_results(results: List[dict], baseline: Optional[dict] = None, out=sys.stdout):
+    """
+    Print table of results, `baseline` is loaded JSON of previous run for comparison of rates
+    """
+    previous = {}
+    if baseline is not None:
+        previous = {result["name"]: result for result in baseline["results"]}
+    header = "{:<32} {:>14} {:>10} {:>10} {:>10} {:>12}".format(
+        "benchmark", "samples/s", "p50, us", "p99, us", "max, us", "peak, KiB")
+    if previous:
+        header += " {:>8}".format("vs base")
+    out.write(header + "\n")
+    for result in results:
+        latency = result["latency_us"]
+        line = "{:<32} {:>14.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>12.1f}".format(
+            result["name"], result["samples_per_second"] or 0.0, latency["p50"], latency["p99"], latency["max"],
+            result["peak_bytes"] / 1024)
+        old = previous.get(result["name"])
+        if old is not None and old["samples_per_second"]:
+            line += " {:>7.2f}x".format(result["samples_per_second"] / old["samples_per_second"])
+        out.write(line + "\n")
+    out.flush()
@@ -0,0 +1,266 @@
+"""
+Timing of signal generators: period error, edge jitter, cumulative drift and missed ticks.
+
+    python benchmarks/generator_timing.py --duration 60 --output timing.json
+    python benchmarks/generator_timing.py --generator "square wave" --stall 50 --stall-every 2
+
+Every generator runs in Qt event loop (offscreen platform) against simulated device which timestamps
+every received transfer. Ticks are transfers of one timer event (transfers closer than CLUSTER
+are merged), they are compared with ideal grid of nominal period started at the first tick.
+Optional stalls block event loop periodically, as slow redraw of GUI does.
+"""
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import common
+
+CLUSTER = 0.005  # seconds, transfers of one tick are closer than that
+HISTOGRAM_WIDTH = 50  # characters
+
+CUSTOM_GENERATOR = """
+TIME_STEP = {time_step}
+PERIOD = {period}
+
+
+def generator(t):
+    return 100.0 + 10.0 * t, 10.0
+"""
+
+
+def create_device():
+    from hv.device_registry import DeviceData
+    from hv.hv_device import HVDevice
+    from hv.simulator import SimulatedDevice, SimulationConfig
+
+    class TimestampingDevice(SimulatedDevice):
+        """
+        Simulated device which keeps time of every transfer and its bytes
+        """
+
+        def __init__(self, url, name, config=None):
+            super(TimestampingDevice, self).__init__(url, name, config)
+            self.log = []
+
+        def write_frames(self, frames: bytes):
+            self.log.append((time.monotonic(), bytes(frames)))
+            super(TimestampingDevice, self).write_frames(frames)
+
+    name = "HT-60-30-P"
+    config = SimulationConfig(latency=0.0, jitter=0.0, rise_time=0.05, seed=0)
+    device = HVDevice(TimestampingDevice("sim://timing", name, config), DeviceData.load_device_data(name))
+    device.open()
+    return device
+
+
+def create_generator(name, device, directory: pathlib.Path, tick):
+    from hv.ui.generators import SquareWave, Stairs, ReversedRawtoothWave, CustomGenerator
+    if name == SquareWave.NAME:
+        generator = SquareWave(device, dict(period=tick, max_voltage=1000.0, current=100.0, duty_cycle=0.5))
+        return generator, tick
+    if name == Stairs.NAME:
+        generator = Stairs(device, dict(time_step=tick, voltage_step=100.0, max_voltage=1000.0, current=100.0))
+        return generator, tick
+    if name == ReversedRawtoothWave.NAME:
+        generator = ReversedRawtoothWave(device, dict(period=4 * tick, max_voltage=1000.0, current=100.0))
+        generator.MIN_TICK = tick
+        return generator, tick
+    if name == CustomGenerator.NAME:
+        path = directory / "custom_generator.py"
+        path.write_text(CUSTOM_GENERATOR.format(time_step=tick, period=10.0))
+        generator = CustomGenerator(device)
+        generator.path = path
+        return generator, tick
+    raise ValueError("Unknown generator {}".format(name))
+
+
+def setpoint_events(device, log):
+    """
+    Return times and voltages of applied setpoints (UPDATE after SET and RESET)
+    """
+    from hv import protocol
+    codec = device.codec
+    times, voltages = [], []
+    pending = 0.0
+    for t, frames in log:
+        position = 0
+        while position < len(frames):
+            code = frames[position]
+            if code == protocol.SET_CODE:
+                pending = (frames[position + 1] | frames[position + 2] << 8) / codec.voltage_scale
+                position += 5
+                continue
+            if code == protocol.UPDATE_CODE:
+                times.append(t)
+                voltages.append(pending)
+            elif code == protocol.RESET_CODE:
+                times.append(t)
+                voltages.append(0.0)
+            position += 1
+    return np.array(times), np.array(voltages)
+
+
+def clusters(times):
+    if len(times) == 0:
+        return times
+    times = np.asarray(times)
+    starts = np.concatenate([[True], np.diff(times) > CLUSTER])
+    return times[starts]
+
+
+def histogram(values, bins):
+    if len(values) == 0:
+        return {"edges": [], "counts": []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def tick_statistics(ticks, period, bins, every_tick=True) -> dict:
+    """
+    Compare ticks with ideal grid: period error, jitter, drift from grid and missed ticks.
+    If generator doesn't write on every tick, gaps are idle or missed ticks.
+    """
+    if len(ticks) < 2:
+        return {"ticks": len(ticks)}
+    intervals = np.diff(ticks)
+    steps = np.maximum(np.rint(intervals / period), 1)
+    missed = int(np.sum(steps - 1))
+    # Error of every interval per nominal tick, missed ticks don't count as error
+    errors = intervals / steps - period
+    index = np.concatenate([[0], np.cumsum(steps)])
+    drift = ticks - (ticks[0] + index * period)
+    slope = np.polyfit(ticks - ticks[0], drift, 1)[0] if len(ticks) > 2 else 0.0
+    return {
+        "ticks": len(ticks),
+        "missed_ticks" if every_tick else "idle_or_missed_ticks": missed,
+        "period_error_ms": {"mean": errors.mean() * 1000, "min": errors.min() * 1000, "max": errors.max() * 1000},
+        "jitter_ms": errors.std() * 1000,
+        "drift_ms": {"final": drift[-1] * 1000, "max": np.abs(drift).max() * 1000,
+                     "per_hour": slope * 3600 * 1000},
+        "period_error_histogram_ms": histogram(errors * 1000, bins),
+        "drift_histogram_ms": histogram(drift * 1000, bins),
+    }
+
+
+def analyse(name, device, period, bins) -> dict:
+    from hv.ui.generators import SquareWave, ReversedRawtoothWave
+    log = device.device.log
+    result = {"generator": name, "period_s": period, "transfers": len(log)}
+    if name == SquareWave.NAME:
+        times, voltages = setpoint_events(device, log)
+        rising = times[voltages > 0]
+        falling = times[voltages == 0]
+        result.update(tick_statistics(rising, period, bins))
+        if len(rising) != 0 and len(falling) != 0:
+            # Falling edge is expected impulse length after the previous rising edge
+            previous = np.searchsorted(rising, falling) - 1
+            valid = previous >= 0
+            errors = falling[valid] - rising[previous[valid]] - period * 0.5
+            result["falling_edge_error_ms"] = {"mean": errors.mean() * 1000, "std": errors.std() * 1000,
+                                               "max": errors.max() * 1000}
+            result["falling_edge_histogram_ms"] = histogram(errors * 1000, bins)
+    else:
+        every_tick = name != ReversedRawtoothWave.NAME  # it is idle between impulses
+        result.update(tick_statistics(clusters([t for t, _ in log]), period, bins, every_tick))
+    return result
+
+
+def run_generator(name, duration, tick, stall, stall_every, directory, bins=20) -> dict:
+    from PyQt5.QtCore import QEventLoop, QTimer
+    device = create_device()
+    generator, period = create_generator(name, device, directory, tick)
+    loop = QEventLoop()
+    stall_timer = None
+    if stall > 0:
+        def block():
+            deadline = time.monotonic() + stall
+            while time.monotonic() < deadline:
+                pass
+        stall_timer = QTimer()
+        stall_timer.timeout.connect(block)
+        stall_timer.start(int(stall_every * 1000))
+    QTimer.singleShot(int(duration * 1000), loop.quit)
+    generator.start()
+    loop.exec_()
+    generator.stop()
+    if stall_timer is not None:
+        stall_timer.stop()
+    device.close()
+    return analyse(name, device, period, bins)
+
+
+def print_histogram(title, data, out):
+    counts = data["counts"]
+    if not counts:
+        return
+    out.write("  {}\n".format(title))
+    scale = HISTOGRAM_WIDTH / max(max(counts), 1)
+    edges = data["edges"]
+    for index, count in enumerate(counts):
+        out.write("  {:>10.3f} .. {:>10.3f} {:>6} {}\n".format(edges[index], edges[index + 1], count,
+                                                              "#" * int(round(count * scale))))
+
+
+def print_result(result, out=sys.stdout):
+    out.write("{} (period {} s, {} transfers)\n".format(result["generator"], result["period_s"],
+                                                        result["transfers"]))
+    if "period_error_ms" not in result:
+        out.write("  not enough ticks: {}\n".format(result["ticks"]))
+        return
+    error = result["period_error_ms"]
+    drift = result["drift_ms"]
+    missed = result.get("missed_ticks", result.get("idle_or_missed_ticks"))
+    label = "missed" if "missed_ticks" in result else "idle or missed"
+    out.write("  ticks {}, {} {}, period error mean {:.3f} ms, min {:.3f}, max {:.3f}, jitter {:.3f} ms\n".format(
+        result["ticks"], label, missed, error["mean"], error["min"], error["max"], result["jitter_ms"]))
+    out.write("  drift final {:.3f} ms, max {:.3f} ms, {:.1f} ms/hour\n".format(
+        drift["final"], drift["max"], drift["per_hour"]))
+    if "falling_edge_error_ms" in result:
+        falling = result["falling_edge_error_ms"]
+        out.write("  falling edge error mean {:.3f} ms, std {:.3f}, max {:.3f}\n".format(
+            falling["mean"], falling["std"], falling["max"]))
+    print_histogram("period error, ms", result["period_error_histogram_ms"], out)
+    print_histogram("drift, ms", result["drift_histogram_ms"], out)
+    if "falling_edge_histogram_ms" in result:
+        print_histogram("falling edge error, ms", result["falling_edge_histogram_ms"], out)
+    out.flush()
+
+
+def main():
+    from hv.ui.generators import GENERATOR_FACTORY
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generator", action="append", choices=list(GENERATOR_FACTORY.keys()),
+                        help="Generator to measure, all by default")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of every run")
+    parser.add_argument("--tick", type=float, default=0.5, help="Period of square wave or tick of others, s")
+    parser.add_argument("--stall", type=float, default=0.0, metavar="MS", help="Block event loop for MS")
+    parser.add_argument("--stall-every", type=float, default=1.0, metavar="SECONDS", help="Period of stalls")
+    parser.add_argument("--bins", type=int, default=20, help="Bins of histograms")
+    parser.add_argument("--output", help="Save results to JSON file")
+    args = parser.parse_args()
+
+    common.headless()
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.generator or GENERATOR_FACTORY.keys():
+            result = run_generator(name, args.duration, args.tick, args.stall / 1000, args.stall_every,
+                                   pathlib.Path(directory), args.bins)
+            print_result(result)
+            results.append(result)
+    if args.output:
+        meta = common.metadata(duration=args.duration, tick=args.tick, stall_ms=args.stall,
+                               stall_every=args.stall_every)
+        with open(args.output, "w") as fout:
+            json.dump({"meta": meta, "results": results}, fout, indent=2)
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
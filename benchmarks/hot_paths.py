@@ -0,0 +1,188 @@
+"""
+Benchmarks of hot paths of acquisition, codec, plotting and recording.
+
+    python benchmarks/hot_paths.py --output results.json
+    python benchmarks/hot_paths.py --output new.json --compare results.json
+
+Devices are simulated, by default with ideal link (no latency and transmission time), so timings show
+cost of host code. Qt widgets are created on offscreen platform.
+"""
+import argparse
+import logging
+import sys
+import tempfile
+
+import numpy as np
+
+import common
+
+
+def device_benchmarks(calls, latency):
+    from hv.hv_device import HVDevice
+    from hv.device_registry import DeviceData
+    from hv.simulator import SimulatedDevice, SimulationConfig
+
+    class Link(SimulatedDevice):
+        BYTE_TIME = SimulatedDevice.BYTE_TIME if latency > 0 else 0.0
+
+    config = SimulationConfig(latency=latency, jitter=0.0, rise_time=0.0, seed=0)
+    device = HVDevice(Link("sim://bench", "HT-60-30-P", config), DeviceData.load_device_data("HT-60-30-P"))
+    device.open()
+    device.set_value(1000, 100)
+    device.update_value()
+
+    def batch():
+        with device.transaction() as transaction:
+            for _ in range(10):
+                transaction.get_IU()
+
+    results = [
+        common.measure("HVDevice.get_IU", device.get_IU, calls),
+        common.measure("HVDevice.set_value", lambda: device.set_value(1000, 100), calls),
+        common.measure("Transaction 10 x get_IU", batch, calls // 10, samples_per_call=10),
+    ]
+    device.close()
+    return results
+
+
+def codec_benchmarks(calls):
+    from hv.codec import DeviceCodec
+    from hv.device_registry import DeviceData
+    codec = DeviceCodec(DeviceData.load_device_data("HT-60-30-P"))
+    size = 4096
+    voltage = np.linspace(0, 30000, size)
+    frames = bytes(np.tile(np.array([0x10, 0x20, 0x30, 0x40, 0x0D], dtype=np.uint8), size))
+    frame = frames[:5]
+    return [
+        common.measure("DeviceCodec.encode_setpoint", lambda: codec.encode_setpoint(1000, 100), calls),
+        common.measure("DeviceCodec.decode_frame", lambda: codec.decode_frame(frame), calls),
+        common.measure("DeviceCodec.encode_setpoints", lambda: codec.encode_setpoints(voltage, 100),
+                       calls // 10, samples_per_call=size),
+        common.measure("DeviceCodec.decode_frames", lambda: codec.decode_frames(frames),
+                       calls // 10, samples_per_call=size),
+    ]
+
+
+def waveform_benchmarks(calls):
+    from hv import waveform
+    from hv.codec import DeviceCodec
+    from hv.device_registry import DeviceData
+    codec = DeviceCodec(DeviceData.load_device_data("HT-60-30-P"))
+    # Uncached compilation, generators get cached waveform on restart
+    stairs = waveform.stairs.__wrapped__
+    compiled = stairs(codec, 1.0, 0.5, 10.0, 30000.0, 0.0, 100.0)
+    state = {"index": 0}
+
+    def lookup():
+        state["index"] += 1
+        return compiled.frames[state["index"] % len(compiled)]
+
+    return [
+        common.measure("waveform.stairs (3002 rows)", lambda: stairs(codec, 1.0, 0.5, 10.0, 30000.0, 0.0, 100.0),
+                       calls // 100, samples_per_call=len(compiled)),
+        common.measure("Waveform row lookup", lookup, calls),
+    ]
+
+
+def acquisition_benchmarks(calls):
+    from hv.acquisition import SampleBuffer
+    buffer = SampleBuffer()
+    state = {"count": 0, "t": 0.0}
+
+    def push():
+        state["t"] += 0.01
+        buffer.push(state["t"], 1000.0, 10.0)
+
+    def read():
+        for _ in range(16):
+            push()
+        state["count"] = buffer.read_since(state["count"])[0]
+
+    return [
+        common.measure("SampleBuffer.push", push, calls),
+        common.measure("SampleBuffer.read_since (16)", read, calls // 10, samples_per_call=16),
+    ]
+
+
+def ui_benchmarks(calls, directory):
+    from PyQt5.QtWidgets import QApplication, QWidget
+    from hv.ui.oscilloscope import Oscilloscope
+    from hv.ui.recorder import Recorder
+    from hv.ui.utils import HVWidgetSettings, QtLogging
+
+    parent = QWidget()
+    parent.resize(1280, 720)
+    oscilloscope = Oscilloscope(parent, "μA")
+    oscilloscope.resize(1000, 700)
+    parent.show()
+    QApplication.processEvents()
+    state = {"t": oscilloscope.init_time}
+
+    def update():
+        state["t"] += 0.01
+        oscilloscope.update_data(state["t"], 1000.0 + np.sin(state["t"]), 10.0)
+
+    def redraw():
+        for _ in range(10):
+            update()
+        oscilloscope._update_canvas()
+
+    results = [
+        common.measure("Oscilloscope.update_data", update, calls),
+        common.measure("Oscilloscope redraw (10 samples)", redraw, calls // 20, samples_per_call=10,
+                       allocation_calls=calls // 100),
+    ]
+
+    for suffix in ["csv", "hvr"]:
+        settings = HVWidgetSettings(last_voltage=0.0, last_current=0.0,
+                                    last_file="{}/record.{}".format(directory, suffix))
+        recorder = Recorder(parent, settings)
+        recorder.writer = recorder._create_writer()
+        recorder.writer.start()
+        recorder.turn_on = True
+        results.append(common.measure("Recorder.add_data ({})".format(suffix),
+                                      lambda: recorder.add_data(state["t"], 1000.0, 10.0), calls))
+        recorder.close()
+
+    logger = logging.getLogger("benchmark")
+    logger.propagate = False
+    handler = QtLogging(parent, logger)
+    record = logger.makeRecord(logger.name, logging.INFO, __file__, 0, "Set voltage %s V", (1000,), None)
+    results.append(common.measure("QtLogging.emit", lambda: handler.emit(record), calls))
+    parent.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Save results to JSON file")
+    parser.add_argument("--compare", help="JSON file of previous run, rates are compared with it")
+    parser.add_argument("--calls", type=int, default=2000, help="Calls of every benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="Latency of simulated link, 0 for ideal link")
+    parser.add_argument("--no-gui", action="store_true", help="Skip benchmarks of Qt widgets")
+    args = parser.parse_args()
+
+    common.headless()
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+
+    results = []
+    results += device_benchmarks(args.calls, args.latency / 1000)
+    results += codec_benchmarks(args.calls)
+    results += waveform_benchmarks(args.calls)
+    results += acquisition_benchmarks(args.calls)
+    if not args.no_gui:
+        with tempfile.TemporaryDirectory() as directory:
+            results += ui_benchmarks(args.calls, directory)
+
+    baseline = common.load(args.compare) if args.compare else None
+    common.print_results(results, baseline)
+    if args.output:
+        common.save(args.output, common.metadata(calls=args.calls, latency_ms=args.latency, gui=not args.no_gui),
+                    results)
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from typing import Tuple
+
+import numpy as np
+
+from hv.hv_device import HVDevice
+from hv.protocol import ReadError
+
+
+class SampleBuffer:
+    """
+    Preallocated ring buffer of timestamped (I, U) samples.
+
+    Buffer has single writer (acquisition thread) and any number of readers.
+    Writer publishes sample by incrementing `count` after sample was stored,
+    readers remember `count` of the last read and never take locks.
+    Before storing writer sets `pending` to `count` after the write, so readers know which old slots
+    can be overwritten already.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.voltage = np.zeros(capacity)
+        self.current = np.zeros(capacity)
+        self.count = 0
+        self.pending = 0
+
+    def push(self, t, U, I):
+        self.pending = self.count + 1
+        index = self.count % self.capacity
+        self.times[index] = t
+        self.voltage[index] = U
+        self.current[index] = I
+        self.count += 1
+
+    def extend(self, times, voltage, current):
+        times = np.asarray(times)[-self.capacity:]
+        voltage = np.asarray(voltage)[-self.capacity:]
+        current = np.asarray(current)[-self.capacity:]
+        self.pending = self.count + len(times)
+        indices = np.arange(self.count, self.count + len(times)) % self.capacity
+        self.times[indices] = times
+        self.voltage[indices] = voltage
+        self.current[indices] = current
+        self.count += len(times)
+
+    def read_since(self, count) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return new count and copies of times, voltages, currents of samples pushed after `count`.
+        Samples which were overwritten before reading are lost.
+        """
+        last = self.count
+        first = max(count, last - self.capacity, 0)
+        indices = np.arange(first, last) % self.capacity
+        times = self.times[indices]
+        voltage = self.voltage[indices]
+        current = self.current[indices]
+        # Writer can overwrite the oldest samples while we copy them, including slots of unpublished samples
+        lost = self.pending - self.capacity - first
+        if lost > 0:
+            times, voltage, current = times[lost:], voltage[lost:], current[lost:]
+        return last, times, voltage, current
+
+    def snapshot(self):
+        """
+        Return all stored samples in chronological order
+        """
+        return self.read_since(self.count - self.capacity)[1:]
+
+    def latest(self):
+        """
+        Return last (time, U, I) sample or None if buffer is empty.
+        """
+        last = self.count
+        if last == 0:
+            return None
+        index = (last - 1) % self.capacity
+        return self.times[index], self.voltage[index], self.current[index]
+
+
+class Acquisition(threading.Thread):
+    """
+    Background thread which owns device polling and push samples into SampleBuffer.
+    If connection to device is lost, thread repeat connect.
+
+    Polls are scheduled at fixed absolute deadlines. If poll takes longer than poll period,
+    missed polls are counted in `overruns` and skipped, not queued. Failed polls are counted in `errors`.
+    In auto rate mode poll rate is tuned by measured round trip of GET request.
+    """
+    MIN_RATE = 0.1  # Hz
+    SAFETY_FACTOR = 2.0  # Keep half of link time free for setpoint commands
+    SMOOTHING = 0.1
+
+    def __init__(self, device: HVDevice, rate=0.5, auto_rate=False, buffer: SampleBuffer = None):
+        super(Acquisition, self).__init__(name="acquisition-{}".format(device), daemon=True)
+        self.device = device
+        self.rate = rate
+        self.auto_rate = auto_rate
+        self.buffer = SampleBuffer() if buffer is None else buffer
+        self.overruns = 0
+        self.errors = 0
+        self.round_trip = None
+        self._running = True
+        self._wakeup = threading.Event()
+
+    @property
+    def max_rate(self):
+        return self.device.MAX_POLL_RATE
+
+    def set_rate(self, rate):
+        self.rate = min(max(rate, self.MIN_RATE), self.max_rate)
+
+    def change_rate(self, rate):
+        """
+        Change poll rate from other thread, new rate is applied immediately.
+        """
+        self.set_rate(rate)
+        self._wakeup.set()
+
+    def _tune_rate(self):
+        round_trip = self.device.round_trip
+        if round_trip is None:
+            return
+        if self.round_trip is None:
+            self.round_trip = round_trip
+        else:
+            self.round_trip += self.SMOOTHING * (round_trip - self.round_trip)
+        if self.auto_rate and self.round_trip > 0:
+            self.set_rate(1 / (self.round_trip * self.SAFETY_FACTOR))
+
+    def run(self):
+        deadline = time.monotonic()
+        while self._running:
+            period = 1 / self.rate
+            deadline += period
+            now = time.monotonic()
+            if now > deadline:
+                missed = int((now - deadline) / period) + 1
+                self.overruns += missed
+                deadline += missed * period
+            if self._wakeup.wait(deadline - now):
+                # Rate was changed or thread was stopped, start new schedule
+                self._wakeup.clear()
+                deadline = time.monotonic()
+                continue
+            if self.device.is_open:
+                try:
+                    I, U = self.device.get_IU()
+                except ReadError as e:
+                    self.errors += 1
+                    logging.root.debug(str(e))
+                    continue
+                self.buffer.push(time.time(), U, I)
+                self._tune_rate()
+            else:
+                logging.root.debug("Reconnect to device {}".format(self.device))
+                self.device.open()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+        if self.is_alive():
+            self.join()
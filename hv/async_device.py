@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Optional
+
+from hv.hv_device import HVDevice
+from hv.protocol import ReadError
+
+
+class AsyncHVDevice:
+    """
+    asyncio wrapper over HVDevice. Commands are written directly to the port and replies are
+    awaited by polling bytes already received by port, so event loop is never blocked
+    and one loop can serve many devices:
+
+        devices = [AsyncHVDevice(dev) for dev in HVDevice.find_all_devices()]
+        values = await asyncio.gather(*[dev.get_IU() for dev in devices])
+
+    Every command accepts own timeout (seconds), `None` means default timeout of device.
+    Don't use the same device from blocking and async API at the same time.
+    """
+    TIMEOUT = 0.5  # seconds
+    POLL_INTERVAL = 0.002  # seconds
+
+    def __init__(self, device: HVDevice, timeout: float = TIMEOUT):
+        self.device = device
+        self.timeout = timeout
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __str__(self):
+        return str(self.device)
+
+    @property
+    def data(self):
+        return self.device.data
+
+    @property
+    def is_open(self):
+        return self.device.is_open
+
+    def _get_lock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _call(self, coro, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        async with self._get_lock():
+            try:
+                return await asyncio.wait_for(coro, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Reply of cancelled or timed out request can come later and must be dropped
+                self.device.stale = True
+                raise
+
+    def _write(self, code, data=None):
+        try:
+            self.device.device.write(code, data)
+        except Exception as e:
+            self.device.is_open = False
+            logging.root.warning(str(e))
+            raise
+
+    async def _command(self, code, data=None):
+        self._write(code, data)
+
+    async def _request(self, code):
+        if not self.device.is_open:
+            raise ReadError("Device {} is not connected".format(self))
+        self.device.drain()
+        self._write(code)
+        frames = []
+        while not frames:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            frames = self.device.parser.feed(self.device.device.read_available())
+        return frames[-1]
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.device.open)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.device.close)
+
+    async def set_value(self, voltage, current, timeout: float = None):
+        data = self.device.encode_value(voltage, current)
+        await self._call(self._command(HVDevice.SET_CODE, data), timeout)
+
+    async def update_value(self, timeout: float = None):
+        await self._call(self._command(HVDevice.UPDATE_CODE), timeout)
+
+    async def reset_value(self, timeout: float = None):
+        await self._call(self._command(HVDevice.RESET_CODE), timeout)
+
+    async def get_IU(self, timeout: float = None):
+        """
+        Return Current (microA or milliA) and Voltage (V).
+        Raise asyncio.TimeoutError if device didn't reply in time.
+        """
+        reply = await self._call(self._request(HVDevice.GET_CODE), timeout)
+        return self.device.decode_IU(reply)
@@ -1,7 +1,10 @@
 import cmd, sys
-from typing import Optional
+import collections
+import time
+from typing import List, Optional
 
-from hv.hv_device import HVDevice, create_test_device
+from hv.hv_device import HVDevice, Transaction
+from hv.protocol import ReadError
 
 
 def device_info(device: HVDevice):
@@ -22,12 +25,12 @@ Type list for get list of device and nextly attach device
     def __init__(self, args):
         super(HVShell, self).__init__()
         self.args = args
+        self.current = None
+        self.batch: Optional[Transaction] = None
+        self.timings = collections.defaultdict(list)
 
     def preloop(self) -> None:
-        if self.args.fake_device:
-            self.devices = [create_test_device()]
-        else:
-            self.devices = HVDevice.find_all_devices()
+        self.devices = HVDevice.find_all_devices()
 
     def do_list(self, arg):
         "Print list of all devices."
@@ -38,53 +41,180 @@ Type list for get list of device and nextly attach device
     def do_attach(self, arg):
         'Attach to device by ID: attach 0'
         try:
-            device_id = int(arg[0])
-            if len(self.devices) > device_id:
-                self.device = self.devices[device_id]
-                self.device.open()
-                self.prompt = '({}): '.format(self.device.device)
-                return
-        except Exception:
+            device_id = int(arg.split()[0])
+        except (ValueError, IndexError):
+            print("Bad device ID")
+            return
+        if device_id < len(self.devices):
+            self.flush()
+            self.device = self.devices[device_id]
+            self.device.open()
+            self.current = None
+            self.prompt = '({}): '.format(self.device.device)
+        else:
             print("Bad device ID")
 
     def do_detach(self, arg):
         "Detach device from shell."
-        self.device.close()
-        self.device = None
+        if self.device is not None:
+            self.flush()
+            self.device.close()
+            self.device = None
         self.prompt = self._empty_promt
 
+    def _target(self):
+        """
+        Return transaction in script mode or device in interactive mode
+        """
+        if self.batch is not None and self.batch.device is self.device:
+            return self.batch
+        return self.device
+
     def do_setup(self, arg):
-        'Setup the voltage:  setup 1500'
+        'Setup the voltage (V) and current (microA or milliA), current is kept from previous setup or is minimal:  setup 1500 [100]'
+        if self.device is None:
+            print("Attach device")
+            return
         try:
-            voltage = float(arg[0])
-            if self.device is not None:
-                self.device.set_value(voltage)
-        except Exception:
-            pass
-        finally:
-            print("Bad voltage")
+            values = [float(value) for value in arg.split()]
+            voltage = values[0]
+            current = values[1] if len(values) > 1 else self.current
+        except (ValueError, IndexError):
+            print("Bad voltage or current")
+            return
+        if current is None:
+            # As in GUI, limit is minimal until it is set explicitly
+            current = self.device.data.current_min
+        if len(values) == 1:
+            print("Current limit {} {}".format(current, self.device.units_label))
+        self.current = current
+        self._target().set_value(voltage, current)
 
     def do_apply(self, arg):
         'Apply the established voltage.'
         if self.device is not None:
-            self.device.update_value()
+            self._target().update_value()
 
     def do_reset(self, arg):
         'Turn off.'
         if self.device is not None:
-            self.device.reset_value()
+            self._target().reset_value()
 
     def do_get(self, arg):
         "Get voltage and current"
         if self.device is not None:
-            I, U = self.device.get_IU()
-            print("I = {}, U = {}".format(I, U))
+            try:
+                if self._target() is self.batch:
+                    # Reply is read together with pipelined commands
+                    self.batch.get_IU()
+                    I, U = self.flush()[-1]
+                else:
+                    I, U = self.device.get_IU()
+                print("I = {}, U = {}".format(I, U))
+            except ReadError as e:
+                print(e)
+            except IndexError:
+                print("Can not get data from device {}".format(self.device))
+
+    def do_wait(self, arg):
+        "Wait given seconds, pipelined commands are sent before wait: wait 0.5"
+        try:
+            seconds = float(arg.split()[0])
+        except (ValueError, IndexError):
+            print("Bad time")
+            return
+        if not 0 <= seconds < float("inf"):
+            print("Bad time")
+            return
+        self.flush()
+        time.sleep(seconds)
+
+    def flush(self) -> List:
+        """
+        Send pipelined commands of script and return replies of GET commands
+        """
+        if self.batch is None or not self.batch.frames:
+            return []
+        start = time.perf_counter()
+        try:
+            return self.batch.commit()
+        finally:
+            self.timings["(transfer)"].append(time.perf_counter() - start)
+            self.batch = self.device.transaction() if self.device is not None else None
+
+    @staticmethod
+    def parse_script(lines) -> list:
+        """
+        Return list of commands, block `repeat N` ... `end` is returned as ("repeat", N, commands)
+        """
+        stack = [[]]
+        for number, line in enumerate(lines, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            words = line.split()
+            if words[0].lower() == "repeat":
+                try:
+                    count = int(words[1])
+                except (ValueError, IndexError):
+                    raise ValueError("Line {}: bad count of repeat".format(number))
+                block = []
+                stack[-1].append(("repeat", count, block))
+                stack.append(block)
+            elif words[0].lower() == "end":
+                if len(stack) == 1:
+                    raise ValueError("Line {}: end without repeat".format(number))
+                stack.pop()
+            else:
+                stack[-1].append(line)
+        if len(stack) != 1:
+            raise ValueError("Repeat without end")
+        return stack[0]
+
+    def _run_commands(self, commands):
+        for command in commands:
+            if isinstance(command, tuple):
+                for _ in range(command[1]):
+                    self._run_commands(command[2])
+                continue
+            line = self.precmd(command)
+            name = line.split()[0]
+            if self.device is not None and (self.batch is None or self.batch.device is not self.device):
+                self.batch = self.device.transaction()
+            start = time.perf_counter()
+            self.onecmd(line)
+            self.timings[name].append(time.perf_counter() - start)
+
+    def run_script(self, path):
+        """
+        Execute commands of file without prompt. Commands setup, apply and reset are pipelined
+        and sent in one transfer before the next get, wait, attach or at the end of script.
+        Latency of commands is printed at the end.
+        """
+        with open(path) as fin:
+            commands = self.parse_script(fin.readlines())
+        self.preloop()
+        try:
+            self._run_commands(commands)
+            self.flush()
+        finally:
+            self.batch = None
+            self.print_timings()
+            self.close()
+
+    def print_timings(self):
+        print("{:>12} {:>8} {:>12} {:>12} {:>12}".format("command", "count", "mean, ms", "max, ms", "total, ms"))
+        for name, values in self.timings.items():
+            print("{:>12} {:>8} {:>12.3f} {:>12.3f} {:>12.3f}".format(
+                name, len(values), 1000 * sum(values) / len(values), 1000 * max(values), 1000 * sum(values)))
 
     def do_exit(self, arg):
+        self.flush()
         self.close()
         sys.exit()
 
     def do_eof(self, arg):
+        self.flush()
         self.close()
         sys.exit()
 
@@ -0,0 +1,92 @@
+import logging
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from hv.device_registry import DeviceData
+from hv.protocol import FrameParser, Reading, FrameError, FRAME_SIZE, TERMINATOR, SET_CODE
+
+CODE_MAX = 0xFFFF
+
+
+class DeviceCodec:
+    """
+    Conversion of setpoints to DAC codes and ADC replies to Current and Voltage for one device.
+    All scale factors are computed once at construction.
+
+    Scalar methods are used by HVDevice, vectorised methods encode whole waveforms
+    and decode captured streams of GET replies.
+    """
+    ADC_MEAN_COUNT = 16
+
+    def __init__(self, data: DeviceData, voltage_coef: Optional[float] = None, current_coef: Optional[float] = None):
+        self.data = data
+        self.voltage_scale = data.codemax_DAC / data.voltage_max
+        self.current_scale = data.codemax_DAC / data.current_max
+        if voltage_coef is not None and not math.isclose(self.voltage_scale, voltage_coef, abs_tol=1e-2):
+            logging.root.warning("Voltage coefficients not consistent {}, {}".format(self.voltage_scale, voltage_coef))
+        if current_coef is not None and not math.isclose(self.current_scale, current_coef, abs_tol=1e-2):
+            logging.root.warning("Current coefficients not consistent {}, {}".format(self.current_scale, current_coef))
+
+        self.voltage_unit = data.voltage_max / data.codemax_ADC / self.ADC_MEAN_COUNT
+        self.current_unit = data.current_max / data.codemax_DAC
+        self.leakage = 1 / data.feedback_resistanse if data.current_units == "micro" else 0.0
+        if data.current_units == "milli":
+            self.current_unit /= 1000
+
+    def _voltage_code(self, voltage):
+        return min(max(round(voltage * self.voltage_scale), 0), CODE_MAX)
+
+    def _current_code(self, current):
+        return min(max(round(current * self.current_scale), 0), CODE_MAX)
+
+    def encode_setpoint(self, voltage, current) -> bytes:
+        """
+        Return data bytes of SET command for Voltage (V) and Current (microA or milliA)
+        """
+        U = self._voltage_code(voltage)
+        I = self._current_code(current)
+        return bytes((U & 0xFF, U >> 8, I & 0xFF, I >> 8))
+
+    def encode_setpoints(self, voltage, current) -> bytes:
+        """
+        Return concatenated SET frames (code and data) for arrays of Voltage and Current
+        """
+        voltage = np.asarray(voltage, dtype=float)
+        current = np.broadcast_to(np.asarray(current, dtype=float), voltage.shape)
+        frames = np.empty((voltage.size, 5), dtype=np.uint8)
+        U = np.clip(np.rint(voltage.ravel() * self.voltage_scale), 0, CODE_MAX).astype(np.uint16)
+        I = np.clip(np.rint(current.ravel() * self.current_scale), 0, CODE_MAX).astype(np.uint16)
+        frames[:, 0] = SET_CODE
+        frames[:, 1:3] = U.astype("<u2").view(np.uint8).reshape(-1, 2)
+        frames[:, 3:5] = I.astype("<u2").view(np.uint8).reshape(-1, 2)
+        return frames.tobytes()
+
+    def decode_frame(self, frame) -> Reading:
+        """
+        Convert reply of GET command to Current (microA or milliA) and Voltage (V)
+        """
+        if len(frame) != FRAME_SIZE or frame[-1] != TERMINATOR:
+            raise FrameError("Bad reply {}".format(list(frame)))
+        U = (frame[2] * 256 + frame[3]) * self.voltage_unit
+        # Return absolute value
+        # if self.data.polarity == "N":
+        #     U = -U
+        I = (frame[0] * 256 + frame[1]) * self.current_unit - abs(U * self.leakage)
+        return Reading(I, U)
+
+    def decode_frames(self, data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert stream of GET replies to arrays of Current and Voltage.
+        Misaligned stream is realigned on terminator, broken frames are dropped.
+        """
+        data = bytes(data)
+        frames = np.frombuffer(data, dtype=np.uint8)[:len(data) - len(data) % FRAME_SIZE].reshape(-1, FRAME_SIZE)
+        if len(data) % FRAME_SIZE != 0 or not np.all(frames[:, -1] == TERMINATOR):
+            parsed = FrameParser().feed(data)
+            frames = np.frombuffer(b"".join(parsed), dtype=np.uint8).reshape(-1, FRAME_SIZE)
+        codes = frames[:, :4].astype(np.int64)
+        U = (codes[:, 2] * 256 + codes[:, 3]) * self.voltage_unit
+        I = (codes[:, 0] * 256 + codes[:, 1]) * self.current_unit - np.abs(U * self.leakage)
+        return I, U
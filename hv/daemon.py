@@ -0,0 +1,376 @@
+import collections
+import json
+import logging
+import math
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from hv.acquisition import Acquisition
+from hv.hv_device import HVDevice
+from hv.recording import RECORD_DTYPE
+
+"""
+Binary protocol of daemon. Every message is header (payload size u32, type u8) and payload, little-endian.
+
+Requests of client, each request gets exactly one reply OK, DEVICES or ERROR in order of requests:
+    LIST                                   -> DEVICES: UTF-8 JSON list of devices
+    SUBSCRIBE, UNSUBSCRIBE: device u16     -> OK
+    SET: device u16, voltage f64 (V), current f64 (μA or mA) -> OK
+    UPDATE, RESET: device u16              -> OK
+    RATE: device u16, poll rate f64 (Hz)   -> OK
+Samples of subscribed devices are sent at any moment between replies:
+    SAMPLES: device u16, count u32, count records RECORD_DTYPE (time, voltage, current)
+"""
+HEADER = struct.Struct("<IB")
+DEVICE = struct.Struct("<H")
+SETPOINT = struct.Struct("<Hdd")
+RATE_VALUE = struct.Struct("<Hd")
+SAMPLES_HEADER = struct.Struct("<HI")
+
+LIST = 0x01
+SUBSCRIBE = 0x02
+UNSUBSCRIBE = 0x03
+SET = 0x04
+UPDATE = 0x05
+RESET = 0x06
+RATE = 0x07
+
+OK = 0x80
+DEVICES = 0x81
+SAMPLES = 0x82
+ERROR = 0xFF
+
+
+class DaemonError(Exception):
+    pass
+
+
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "hv-controls.sock")
+    return os.path.join(tempfile.gettempdir(), "hv-controls-{}.sock".format(os.getuid()))
+
+
+def pack_message(kind, payload=b""):
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def read_message(fin) -> Optional[Tuple[int, bytes]]:
+    """
+    Return type and payload of the next message or None if connection is closed
+    """
+    header = fin.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    size, kind = HEADER.unpack(header)
+    payload = fin.read(size)
+    if len(payload) < size:
+        return None
+    return kind, payload
+
+
+def pack_samples(index, times, voltage, current):
+    records = np.empty(len(times), dtype=RECORD_DTYPE)
+    records["time"] = times
+    records["voltage"] = voltage
+    records["current"] = current
+    return pack_message(SAMPLES, SAMPLES_HEADER.pack(index, len(records)) + records.tobytes())
+
+
+def unpack_samples(payload) -> Tuple[int, np.ndarray]:
+    index, count = SAMPLES_HEADER.unpack_from(payload)
+    return index, np.frombuffer(payload, dtype=RECORD_DTYPE, count=count, offset=SAMPLES_HEADER.size)
+
+
+class _Client:
+    """
+    Connection of one client. Messages are sent by own thread, so slow client doesn't delay others.
+    If client doesn't read samples and queue is full, new messages of samples are dropped.
+    """
+    MAX_QUEUE = 1024  # messages
+
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.subscriptions = set()
+        self.dropped = 0
+        self._queue = queue.Queue(self.MAX_QUEUE)
+        self._thread = threading.Thread(target=self._run, name="client-{}".format(connection.fileno()), daemon=True)
+        self._thread.start()
+
+    def post(self, message, droppable=False):
+        try:
+            self._queue.put(message, block=not droppable)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                self.connection.sendall(message)
+            except OSError:
+                break
+
+    def close(self):
+        # Sentinel must not be dropped, but sender can be dead already
+        try:
+            self._queue.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        self._thread.join(1.0)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        client = _Client(self.request)
+        self.server.add_client(client)
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                client.post(self.server.execute(client, *message))
+        except OSError as e:
+            logging.root.debug("Client disconnected: {}".format(e))
+        finally:
+            self.server.remove_client(client)
+            client.close()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Daemon which owns devices, polls them by Acquisition threads and serves local clients over Unix socket.
+    Any number of clients can subscribe to samples of device and send commands, commands of different
+    clients are serialized by lock of HVDevice. Samples are published every PUBLISH_INTERVAL in batches.
+    """
+    daemon_threads = True
+    PUBLISH_INTERVAL = 0.05  # seconds
+
+    def __init__(self, path, devices: List[HVDevice], rate=1.0, auto_rate=False):
+        self.path = path
+        self.devices = devices
+        self.acquisitions = [Acquisition(device, rate, auto_rate) for device in devices]
+        self.clients = set()
+        self._clients_lock = threading.Lock()
+        self._running = threading.Event()
+        self._remove_stale_socket(path)
+        super(DaemonServer, self).__init__(path, _Handler)
+        self._publisher = threading.Thread(target=self._publish, name="publisher", daemon=True)
+
+    @staticmethod
+    def _remove_stale_socket(path):
+        if not os.path.exists(path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+        finally:
+            probe.close()
+        raise DaemonError("Daemon is already running on {}".format(path))
+
+    def add_client(self, client: _Client):
+        with self._clients_lock:
+            self.clients.add(client)
+
+    def remove_client(self, client: _Client):
+        with self._clients_lock:
+            self.clients.discard(client)
+        if client.dropped:
+            logging.root.warning("Client dropped {} messages of samples".format(client.dropped))
+
+    def describe(self):
+        return [{"index": index, "name": str(device), "model": device.data.name,
+                 "current_units": device.data.current_units, "voltage_max": device.data.voltage_max,
+                 "current_max": device.data.current_max, "connected": device.is_open}
+                for index, device in enumerate(self.devices)]
+
+    def _device(self, payload, packer=DEVICE):
+        values = packer.unpack(payload)
+        if values[0] >= len(self.devices):
+            raise DaemonError("Unknown device {}".format(values[0]))
+        return (self.devices[values[0]],) + values
+
+    def _check(self, device: HVDevice):
+        if not device.is_open:
+            raise DaemonError("Device {} is not connected".format(device))
+
+    @staticmethod
+    def _finite(*values):
+        if not all(math.isfinite(value) for value in values):
+            raise DaemonError("Values must be finite: {}".format(", ".join(map(str, values))))
+
+    def execute(self, client: _Client, kind, payload) -> bytes:
+        """
+        Execute request of client and return reply
+        """
+        try:
+            if kind == LIST:
+                return pack_message(DEVICES, json.dumps(self.describe()).encode("utf-8"))
+            elif kind == SUBSCRIBE:
+                client.subscriptions.add(self._device(payload)[1])
+            elif kind == UNSUBSCRIBE:
+                client.subscriptions.discard(self._device(payload)[1])
+            elif kind == SET:
+                device, _, voltage, current = self._device(payload, SETPOINT)
+                self._finite(voltage, current)
+                device.set_value(voltage, current)
+                self._check(device)
+            elif kind == UPDATE:
+                device = self._device(payload)[0]
+                device.update_value()
+                self._check(device)
+            elif kind == RESET:
+                device = self._device(payload)[0]
+                device.reset_value()
+                self._check(device)
+            elif kind == RATE:
+                _, index, rate = self._device(payload, RATE_VALUE)
+                self._finite(rate)
+                self.acquisitions[index].change_rate(rate)
+            else:
+                raise DaemonError("Unknown request {}".format(kind))
+        except (DaemonError, struct.error, ValueError, OverflowError) as e:
+            return pack_message(ERROR, bytes([kind]) + str(e).encode("utf-8"))
+        return pack_message(OK, bytes([kind]))
+
+    def _publish(self):
+        counts = [0] * len(self.devices)
+        while not self._running.wait(self.PUBLISH_INTERVAL):
+            with self._clients_lock:
+                clients = list(self.clients)
+            for index, acquisition in enumerate(self.acquisitions):
+                counts[index], times, voltage, current = acquisition.buffer.read_since(counts[index])
+                if len(times) == 0:
+                    continue
+                subscribers = [client for client in clients if index in client.subscriptions]
+                if subscribers:
+                    message = pack_samples(index, times, voltage, current)
+                    for client in subscribers:
+                        client.post(message, droppable=True)
+
+    def start(self):
+        for device, acquisition in zip(self.devices, self.acquisitions):
+            device.open()
+            acquisition.start()
+        self._publisher.start()
+        threading.Thread(target=self.serve_forever, name="daemon-server", daemon=True).start()
+        logging.root.info("Serve {} devices on {}".format(len(self.devices), self.path))
+
+    def stop(self, reset=True):
+        self.shutdown()
+        self._running.set()
+        for device, acquisition in zip(self.devices, self.acquisitions):
+            acquisition.stop()
+            if reset and device.is_open:
+                device.reset_value()
+            device.close()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def run_daemon(path, devices: List[HVDevice], rate=1.0, auto_rate=False, reset=True):
+    """
+    Serve devices until SIGINT or SIGTERM
+    """
+    server = DaemonServer(path, devices, rate, auto_rate)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    server.start()
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop(reset)
+
+
+class DaemonClient:
+    """
+    Blocking client of daemon:
+
+        client = DaemonClient()
+        devices = client.list_devices()
+        client.subscribe(0)
+        client.set_value(0, 1000, 10)
+        client.update_value(0)
+        index, samples = client.read_samples()  # samples["time"], samples["voltage"], samples["current"]
+
+    Samples which come while client waits for reply are kept and returned by `read_samples`.
+    """
+
+    def __init__(self, path=None):
+        self.path = default_socket_path() if path is None else path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(self.path)
+        self._file = self._socket.makefile("rb")
+        self._samples = collections.deque()
+
+    def _read(self):
+        message = read_message(self._file)
+        if message is None:
+            raise DaemonError("Connection to daemon is closed")
+        return message
+
+    def _request(self, kind, payload=b"") -> bytes:
+        self._socket.sendall(pack_message(kind, payload))
+        while True:
+            reply, payload = self._read()
+            if reply == SAMPLES:
+                self._samples.append(unpack_samples(payload))
+            elif reply == ERROR:
+                raise DaemonError(payload[1:].decode("utf-8"))
+            else:
+                return payload
+
+    def list_devices(self) -> List[dict]:
+        return json.loads(self._request(LIST).decode("utf-8"))
+
+    def subscribe(self, index):
+        self._request(SUBSCRIBE, DEVICE.pack(index))
+
+    def unsubscribe(self, index):
+        self._request(UNSUBSCRIBE, DEVICE.pack(index))
+
+    def set_value(self, index, voltage, current):
+        self._request(SET, SETPOINT.pack(index, voltage, current))
+
+    def update_value(self, index):
+        self._request(UPDATE, DEVICE.pack(index))
+
+    def reset_value(self, index):
+        self._request(RESET, DEVICE.pack(index))
+
+    def set_rate(self, index, rate):
+        self._request(RATE, RATE_VALUE.pack(index, rate))
+
+    def read_samples(self) -> Tuple[int, np.ndarray]:
+        """
+        Wait and return index of device and array of samples RECORD_DTYPE
+        """
+        if self._samples:
+            return self._samples.popleft()
+        while True:
+            kind, payload = self._read()
+            if kind == SAMPLES:
+                return unpack_samples(payload)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
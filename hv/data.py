@@ -0,0 +1,274 @@
+"""
+Reader of recorded sessions.
+
+    from hv import data
+    for chunk in data.read_chunks("session.csv", start=t0, stop=t0 + 3600, decimate=10):
+        chunk["time"], chunk["voltage"], chunk["current"]
+
+Files are read by chunks of fixed size, so memory usage does not depend on size of file.
+Supported files: CSV of Recorder (without header) and "Save buffer" of Oscilloscope (with header),
+binary `.hvr` files, segments compressed by gzip (`.gz`) or LZMA (`.xz`) and manifests of rotated records.
+Values are returned in units of file.
+"""
+import json
+import pathlib
+from typing import Iterator, Optional
+
+import numpy as np
+
+from hv.recording import RECORD_DTYPE, BinaryFormat, CsvFormat, Manifest, TimeIndex, COMPRESSION
+
+CHUNK_SIZE = 65536  # samples
+CSV_LINE_SIZE = 48  # approximate length of CSV line, characters
+
+OPENERS = {suffix: opener for suffix, opener in COMPRESSION.values()}
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def _open(path: pathlib.Path):
+    opener = OPENERS.get(path.suffix.lower(), open)
+    return opener(str(path), "rb")
+
+
+def _record_suffix(path: pathlib.Path):
+    """
+    Return suffix of record format, suffix of compression is skipped
+    """
+    if path.suffix.lower() in OPENERS:
+        path = path.with_suffix("")
+    return path.suffix.lower()
+
+
+def _parse_csv(lines, path):
+    values = np.fromstring(b"".join(lines).replace(b",", b" "), sep=" ")
+    if values.size % len(RECORD_DTYPE.names) != 0:
+        raise ValueError("Malformed CSV lines in {}".format(path))
+    values = values.reshape(-1, len(RECORD_DTYPE.names))
+    records = np.empty(len(values), dtype=RECORD_DTYPE)
+    for index, name in enumerate(RECORD_DTYPE.names):
+        records[name] = values[:, index]
+    return records
+
+
+def _read_csv(path: pathlib.Path, chunk_size, start=None) -> Iterator[np.ndarray]:
+    with _open(path) as fin:
+        offset = 0
+        if start is not None and path.suffix.lower() == CsvFormat.SUFFIX:
+            offset = TimeIndex.seek(TimeIndex.update(path), start)
+            fin.seek(offset)
+        first = offset == 0
+        while True:
+            lines = fin.readlines(chunk_size * CSV_LINE_SIZE)
+            if not lines:
+                break
+            if first:
+                first = False
+                if not TimeIndex.is_data_line(lines[0]):
+                    lines = lines[1:]
+            if not lines[-1].endswith(b"\n"):
+                # Line is being written now
+                lines = lines[:-1]
+            if lines:
+                yield _parse_csv(lines, path)
+
+
+def _read_binary(path: pathlib.Path, chunk_size, start=None, stop=None) -> Iterator[np.ndarray]:
+    header = BinaryFormat.read_header(path)
+    if header.count == 0:
+        return
+    records = np.memmap(path, RECORD_DTYPE, "r", header.size, (header.count,))
+    # Memory map allows binary search, only touched pages are read
+    first = 0 if start is None else np.searchsorted(records["time"], start, side="left")
+    last = header.count if stop is None else np.searchsorted(records["time"], stop, side="right")
+    for index in range(first, last, chunk_size):
+        yield np.array(records[index:min(index + chunk_size, last)])
+
+
+def _read_binary_stream(path: pathlib.Path, chunk_size) -> Iterator[np.ndarray]:
+    with _open(path) as fin:
+        data = fin.read(BinaryFormat.HEADER_SIZE)
+        header = BinaryFormat.unpack_header(data, path)
+        fin.read(header.size - len(data))
+        count = header.count
+        while count > 0:
+            data = fin.read(min(chunk_size, count) * header.record_size)
+            records = np.frombuffer(data[:len(data) - len(data) % header.record_size], dtype=RECORD_DTYPE)
+            if len(records) == 0:
+                break
+            count -= len(records)
+            yield records.copy()
+
+
+def _read_file(path: pathlib.Path, chunk_size, start, stop) -> Iterator[np.ndarray]:
+    suffix = _record_suffix(path)
+    if suffix == BinaryFormat.SUFFIX:
+        if path.suffix.lower() == suffix:
+            return _read_binary(path, chunk_size, start, stop)
+        return _read_binary_stream(path, chunk_size)
+    return _read_csv(path, chunk_size, start)
+
+
+def _segment_path(directory: pathlib.Path, name):
+    path = directory / name
+    if not path.exists():
+        # Segment can be compressed after manifest was read
+        for suffix in OPENERS.keys():
+            if (directory / (name + suffix)).exists():
+                return directory / (name + suffix)
+    return path
+
+
+def _read_manifest(path: pathlib.Path, chunk_size, start, stop) -> Iterator[np.ndarray]:
+    with path.open() as fin:
+        segments = sorted(json.load(fin)["segments"], key=lambda segment: segment["index"])
+    for segment in segments:
+        if start is not None and segment["end"] < start and segment.get("closed", True):
+            continue
+        if stop is not None and segment["start"] > stop:
+            break
+        yield from _read_file(_segment_path(path.parent, segment["file"]), chunk_size, start, stop)
+
+
+def _window(chunks, start, stop) -> Iterator[np.ndarray]:
+    for chunk in chunks:
+        times = chunk["time"]
+        if stop is not None and len(times) != 0 and times[0] > stop:
+            break
+        if start is not None or stop is not None:
+            mask = np.ones(len(times), dtype=bool)
+            if start is not None:
+                mask &= times >= start
+            if stop is not None:
+                mask &= times <= stop
+            chunk = chunk[mask]
+        if len(chunk) != 0:
+            yield chunk
+
+
+class _Decimator:
+    """
+    Average every `factor` samples, incomplete bucket is carried to the next chunk.
+    """
+
+    def __init__(self, factor):
+        self.factor = factor
+        self.rest = np.empty(0, dtype=RECORD_DTYPE)
+
+    @staticmethod
+    def _reduce(records, factor):
+        result = np.empty(len(records) // factor, dtype=RECORD_DTYPE)
+        for name in RECORD_DTYPE.names:
+            result[name] = records[name].reshape(-1, factor).mean(axis=1)
+        return result
+
+    def feed(self, chunk):
+        if len(self.rest) != 0:
+            chunk = np.concatenate([self.rest, chunk])
+        size = len(chunk) - len(chunk) % self.factor
+        self.rest = chunk[size:]
+        return self._reduce(chunk[:size], self.factor)
+
+    def finish(self):
+        rest, self.rest = self.rest, self.rest[:0]
+        return self._reduce(rest, len(rest)) if len(rest) != 0 else rest
+
+
+AGGREGATE_DTYPE = np.dtype([("time", "<f8"), ("count", "<i8"),
+                            ("voltage_mean", "<f8"), ("voltage_min", "<f8"), ("voltage_max", "<f8"),
+                            ("current_mean", "<f8"), ("current_min", "<f8"), ("current_max", "<f8")])
+
+
+def _aggregate_chunk(chunk, buckets, interval):
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(buckets)) + 1])
+    result = np.empty(len(starts), dtype=AGGREGATE_DTYPE)
+    result["time"] = buckets[starts] * interval
+    result["count"] = np.diff(np.append(starts, len(chunk)))
+    for name in ["voltage", "current"]:
+        values = chunk[name]
+        result[name + "_mean"] = np.add.reduceat(values, starts) / result["count"]
+        result[name + "_min"] = np.minimum.reduceat(values, starts)
+        result[name + "_max"] = np.maximum.reduceat(values, starts)
+    return result
+
+
+def _merge_bucket(first, second):
+    """
+    Merge arrays of one bucket `second` to `first` in place
+    """
+    count = first["count"] + second["count"]
+    for name in ["voltage", "current"]:
+        first[name + "_mean"] = (first[name + "_mean"] * first["count"] +
+                                 second[name + "_mean"] * second["count"]) / count
+        first[name + "_min"] = np.minimum(first[name + "_min"], second[name + "_min"])
+        first[name + "_max"] = np.maximum(first[name + "_max"], second[name + "_max"])
+    first["count"] = count
+
+
+def aggregate(chunks: Iterator[np.ndarray], interval) -> Iterator[np.ndarray]:
+    """
+    Generate arrays AGGREGATE_DTYPE with count, mean, min and max of samples
+    in buckets of `interval` seconds aligned to Unix time. Bucket can span any number of chunks.
+    """
+    pending = None  # the last bucket, it can be continued in the next chunk
+    for chunk in chunks:
+        result = _aggregate_chunk(chunk, np.floor(chunk["time"] / interval), interval)
+        if pending is not None and pending["time"][0] == result["time"][0]:
+            _merge_bucket(pending, result[:1])
+            result = result[1:]
+        if len(result) == 0:
+            continue
+        if pending is not None:
+            result = np.concatenate([pending, result])
+        if len(result) > 1:
+            yield result[:-1]
+        pending = result[-1:].copy()
+    if pending is not None:
+        yield pending
+
+
+def resolve_path(path) -> pathlib.Path:
+    """
+    Return manifest of rotated record if record itself does not exist
+    """
+    path = pathlib.Path(path)
+    if not path.exists():
+        manifest = Manifest.path_for(path)
+        if manifest.exists():
+            return manifest
+    return path
+
+
+def read_chunks(path, start: Optional[float] = None, stop: Optional[float] = None,
+                chunk_size=CHUNK_SIZE, decimate=1) -> Iterator[np.ndarray]:
+    """
+    Generate arrays RECORD_DTYPE with samples of record in time range [start, stop] (Unix time, s).
+    If `decimate` > 1, every `decimate` samples are averaged to one.
+    """
+    path = resolve_path(path)
+    if path.name.endswith(MANIFEST_SUFFIX):
+        chunks = _read_manifest(path, chunk_size, start, stop)
+    else:
+        chunks = _read_file(path, chunk_size, start, stop)
+    chunks = _window(chunks, start, stop)
+    if decimate <= 1:
+        yield from chunks
+        return
+    decimator = _Decimator(decimate)
+    for chunk in chunks:
+        chunk = decimator.feed(chunk)
+        if len(chunk) != 0:
+            yield chunk
+    chunk = decimator.finish()
+    if len(chunk) != 0:
+        yield chunk
+
+
+def load(path, start: Optional[float] = None, stop: Optional[float] = None, decimate=1) -> np.ndarray:
+    """
+    Read whole time range to one array RECORD_DTYPE
+    """
+    chunks = list(read_chunks(path, start, stop, decimate=decimate))
+    if not chunks:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.concatenate(chunks)
+
@@ -0,0 +1,182 @@
+import csv
+import functools
+import logging
+import pathlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+ROOT_PATH = pathlib.Path(__file__).parent.absolute()
+DEVICE_PATH = pathlib.Path(ROOT_PATH, "device_data")
+
+DEVICE_TABLES = ("device_table.csv", "HT-6W.csv")
+COEFFICIENT_TABLE = "data_from_protocol.csv"
+
+
+@dataclass
+class DeviceCoefficient:
+    max_voltage: int
+    voltage_coef: float
+    current_coef_6w: float
+    current_coef_15w: float
+    current_coef_60w: float
+
+    @staticmethod
+    def load_data(voltage):
+        return load_registry().coefficient(voltage)
+
+
+@dataclass
+class DeviceData:
+    name: str
+    codemax_ADC: int
+    codemax_DAC: int
+    voltage_max: float
+    voltage_min: float
+    voltage_step: float
+    current_step: float
+    polarity: str
+    sensor_resistance: float
+    feedback_resistanse: float
+    current_min: float
+    current_max: float
+    current_units: str
+
+    def resolve_current_label(self):
+        if self.current_units == "micro":
+            return "μA"
+        elif self.current_units == "milli":
+            return "mA"
+        else:
+            return "μA"
+
+    def resolve_current_step(self):
+        if self.current_units == "micro":
+            return self.current_step
+        elif self.current_units == "milli":
+            return self.current_step / 1000
+        else:
+            return self.current_step
+
+    @staticmethod
+    def load_device_data(name):
+        return load_registry().device(name)
+
+
+class RegistryError(ValueError):
+    pass
+
+
+def _parse_device(row: List[str]) -> DeviceData:
+    if len(row) != 13:
+        raise RegistryError("expected 13 columns, got {}".format(len(row)))
+    try:
+        data = DeviceData(name=row[0].strip(),
+                          codemax_ADC=int(row[1]),
+                          codemax_DAC=int(row[2]),
+                          voltage_max=float(row[3]),
+                          voltage_min=float(row[4]),
+                          voltage_step=float(row[5]),
+                          current_step=float(row[6]),
+                          polarity=row[7].strip(),
+                          sensor_resistance=float(row[8]),
+                          feedback_resistanse=float(row[9]),
+                          current_min=float(row[10]),
+                          current_max=float(row[11]),
+                          current_units=row[12].strip()
+                          )
+    except ValueError as e:
+        raise RegistryError(str(e))
+    if data.codemax_ADC <= 0 or data.codemax_DAC <= 0:
+        raise RegistryError("code of max voltage must be positive")
+    if not 0 <= data.voltage_min < data.voltage_max or data.voltage_step <= 0:
+        raise RegistryError("bad voltage range")
+    if not 0 <= data.current_min < data.current_max or data.current_step <= 0:
+        raise RegistryError("bad current range")
+    if data.polarity not in ("P", "N"):
+        raise RegistryError("unknown polarity {}".format(data.polarity))
+    if data.current_units not in ("micro", "milli"):
+        raise RegistryError("unknown current units {}".format(data.current_units))
+    return data
+
+
+def _parse_coefficient(row: List[str]) -> DeviceCoefficient:
+    if len(row) != 5:
+        raise RegistryError("expected 5 columns, got {}".format(len(row)))
+    try:
+        values = list(map(float, row))
+    except ValueError as e:
+        raise RegistryError(str(e))
+    return DeviceCoefficient(int(values[0]), *values[1:])
+
+
+def _read_table(path: pathlib.Path):
+    with path.open(newline="") as fin:
+        reader = csv.reader(fin, skipinitialspace=True)
+        next(reader, None)
+        for line, row in enumerate(reader, start=2):
+            if row:
+                yield line, row
+
+
+class DeviceRegistry:
+    """
+    Parameters of all known devices, parsed and validated once.
+    Devices are indexed by model name and by max voltage.
+    """
+
+    def __init__(self, devices: Dict[str, DeviceData], coefficients: Dict[int, DeviceCoefficient]):
+        self.devices = devices
+        self.coefficients = coefficients
+        self.voltage_index: Dict[float, List[DeviceData]] = {}
+        for data in devices.values():
+            self.voltage_index.setdefault(data.voltage_max, []).append(data)
+
+    def device(self, name) -> Optional[DeviceData]:
+        return self.devices.get(name)
+
+    def coefficient(self, max_voltage) -> Optional[DeviceCoefficient]:
+        """
+        Return coefficients by max voltage in kV
+        """
+        return self.coefficients.get(int(max_voltage))
+
+    def by_max_voltage(self, voltage_max) -> List[DeviceData]:
+        """
+        Return all devices with max voltage in V
+        """
+        return self.voltage_index.get(float(voltage_max), [])
+
+    def names(self) -> List[str]:
+        return list(self.devices.keys())
+
+    @staticmethod
+    def load(path: pathlib.Path = DEVICE_PATH) -> "DeviceRegistry":
+        devices = {}
+        for table in DEVICE_TABLES:
+            for line, row in _read_table(path / table):
+                try:
+                    data = _parse_device(row)
+                except RegistryError as e:
+                    logging.root.debug("Skip device {} from {}:{}, {}".format(row[0], table, line, e))
+                    continue
+                if data.name in devices:
+                    logging.root.warning("Duplicate device {} in {}:{}".format(data.name, table, line))
+                    continue
+                devices[data.name] = data
+        coefficients = {}
+        for line, row in _read_table(path / COEFFICIENT_TABLE):
+            try:
+                coeff = _parse_coefficient(row)
+            except RegistryError as e:
+                logging.root.warning("Skip coefficients from {}:{}, {}".format(COEFFICIENT_TABLE, line, e))
+                continue
+            coefficients[coeff.max_voltage] = coeff
+        return DeviceRegistry(devices, coefficients)
+
+
+@functools.lru_cache(maxsize=None)
+def load_registry(path: pathlib.Path = DEVICE_PATH) -> DeviceRegistry:
+    """
+    Return registry of devices, tables are read only at first call
+    """
+    return DeviceRegistry.load(path)
@@ -14,6 +14,7 @@ class PyFTDIDevice:
 
     BAUDRATE = 38400
     URLS = "ftdi"
+    READ_CHUNK = 512
 
     def __init__(self, url, name):
         self.port = None
@@ -41,6 +42,9 @@ class PyFTDIDevice:
         logger.debug("Write method get code : {}, data : {}".format(code, data))
         logger.debug("Write {}".format(temp))
 
+    def write_frames(self, frames: bytes):
+        self.port.write(frames)
+        logger.debug("Write {}".format(frames))
 
     def read(self, nbytes) -> List[int]:
         s = self.port.read(nbytes)
@@ -49,6 +53,15 @@ class PyFTDIDevice:
         logger.debug("Convert read to {}".format(result))
         return result
 
+    def read_available(self) -> List[int]:
+        """
+        Read bytes which already received by port without waiting.
+        """
+        # FtdiSerial.in_waiting is not implemented, single USB read returns buffered bytes of FTDI chip
+        s = self.port.ftdi.read_data(self.READ_CHUNK)
+        logger.debug("Read available {}".format(s))
+        return list(s)
+
     @staticmethod
     def open_urls(urls):
         devices = []
@@ -73,8 +86,8 @@ class PyFTDIDevice:
         new_urls = []
         for url, name in PyFTDIDevice.get_urls(key):
             for exist in exist_dev:
-                if url == exist.device.url:
+                if url == getattr(exist.device, "url", None):
                     break
             else:
-                new_urls.append(url)
+                new_urls.append((url, name))
         return PyFTDIDevice.open_urls(new_urls)
\ No newline at end of file
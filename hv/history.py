@@ -0,0 +1,180 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class _Column:
+    """
+    Growable NumPy array, capacity is doubled when array is full.
+    """
+
+    def __init__(self, capacity):
+        self.data = np.empty(capacity)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.data):
+            data = np.empty(max(end, 2 * len(self.data)))
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:end] = values
+        self.size = end
+
+    def view(self, start=0, stop=None):
+        stop = self.size if stop is None else min(stop, self.size)
+        return self.data[start:stop]
+
+
+class _Level:
+    """
+    Buckets of one level of decimation pyramid: time range and min/max of voltage and current.
+    """
+    COLUMNS = ("start", "end", "voltage_min", "voltage_max", "current_min", "current_max")
+
+    def __init__(self, capacity):
+        for name in self.COLUMNS:
+            setattr(self, name, _Column(capacity))
+
+    @property
+    def size(self):
+        return self.start.size
+
+    def extend(self, start, end, voltage_min, voltage_max, current_min, current_max):
+        self.start.extend(start)
+        self.end.extend(end)
+        self.voltage_min.extend(voltage_min)
+        self.voltage_max.extend(voltage_max)
+        self.current_min.extend(current_min)
+        self.current_max.extend(current_max)
+
+
+class HistoryStore:
+    """
+    Full history of samples with min/max decimation pyramid.
+
+    Level 0 keeps all samples. Every bucket of level k covers FACTOR buckets of level k - 1,
+    so size of levels decreases geometrically and number of levels grows as logarithm of history length.
+    Pyramid is updated incrementally as data arrives, query returns about requested number
+    of points for any time range and any history length.
+    """
+    FACTOR = 4
+    CAPACITY = 4096
+
+    def __init__(self):
+        self.times = _Column(self.CAPACITY)
+        self.voltage = _Column(self.CAPACITY)
+        self.current = _Column(self.CAPACITY)
+        self.levels = []
+
+    def __len__(self):
+        return self.times.size
+
+    def extend(self, times, voltage, current):
+        self.times.extend(times)
+        self.voltage.extend(voltage)
+        self.current.extend(current)
+        self._update_levels()
+
+    def _update_levels(self):
+        n = self.FACTOR
+        source_size = self.times.size
+        level_index = 0
+        while source_size >= n:
+            if level_index == len(self.levels):
+                self.levels.append(_Level(max(self.CAPACITY // n ** (level_index + 1), 16)))
+            level = self.levels[level_index]
+            first, last = level.size, source_size // n
+            if first == last:
+                break
+            if level_index == 0:
+                start = end = self.times.view(first * n, last * n).reshape(-1, n)
+                voltage_min = voltage_max = self.voltage.view(first * n, last * n).reshape(-1, n)
+                current_min = current_max = self.current.view(first * n, last * n).reshape(-1, n)
+            else:
+                source = self.levels[level_index - 1]
+
+                def view(column):
+                    return column.view(first * n, last * n).reshape(-1, n)
+
+                start, end = view(source.start), view(source.end)
+                voltage_min, voltage_max = view(source.voltage_min), view(source.voltage_max)
+                current_min, current_max = view(source.current_min), view(source.current_max)
+            level.extend(start[:, 0], end[:, -1], voltage_min.min(axis=1), voltage_max.max(axis=1),
+                         current_min.min(axis=1), current_max.max(axis=1))
+            source_size = level.size
+            level_index += 1
+
+    def time_range(self) -> Tuple[float, float]:
+        return self.times.data[0], self.times.data[self.times.size - 1]
+
+    def raw(self, start=None, stop=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return full resolution samples in time range
+        """
+        times = self.times.view()
+        first = 0 if start is None else np.searchsorted(times, start, side="left")
+        last = len(times) if stop is None else np.searchsorted(times, stop, side="right")
+        return times[first:last].copy(), self.voltage.view(first, last).copy(), self.current.view(first, last).copy()
+
+    def last(self, n) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the last n samples
+        """
+        first = max(self.times.size - n, 0)
+        return self.times.view(first).copy(), self.voltage.view(first).copy(), self.current.view(first).copy()
+
+    def query(self, start, stop, points) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return times, voltages, currents for plot of time range with at most about `points` points.
+        If range contain more samples, min/max envelope of coarser level is returned.
+        """
+        times = self.times.view()
+        first = np.searchsorted(times, start, side="left")
+        last = np.searchsorted(times, stop, side="right")
+        # Include neighbour samples so line is continued to the edges of plot
+        first, last = max(first - 1, 0), min(last + 1, len(times))
+        count = last - first
+        level_index = -1
+        # Every bucket gives two points: min and max
+        while count > points and level_index + 1 < len(self.levels):
+            level_index += 1
+            count = 2 * (last - first) // self.FACTOR ** (level_index + 1)
+        if level_index < 0:
+            return times[first:last].copy(), self.voltage.view(first, last).copy(), self.current.view(first, last).copy()
+        return self._query_level(level_index, start, stop)
+
+    @staticmethod
+    def _envelope(level, first, last):
+        times = np.empty(2 * (last - first))
+        times[0::2] = level.start.view(first, last)
+        times[1::2] = level.end.view(first, last)
+        voltage = np.empty_like(times)
+        voltage[0::2] = level.voltage_min.view(first, last)
+        voltage[1::2] = level.voltage_max.view(first, last)
+        current = np.empty_like(times)
+        current[0::2] = level.current_min.view(first, last)
+        current[1::2] = level.current_max.view(first, last)
+        return times, voltage, current
+
+    def _tail(self, level_index):
+        """
+        Return points of the newest samples which are not collected in complete bucket of level yet
+        """
+        first = self.levels[level_index].size * self.FACTOR
+        if level_index == 0:
+            return self.last(self.times.size - first)
+        source = self.levels[level_index - 1]
+        head = self._envelope(source, first, source.size)
+        tail = self._tail(level_index - 1)
+        return tuple(np.concatenate(pair) for pair in zip(head, tail))
+
+    def _query_level(self, level_index, start, stop):
+        level = self.levels[level_index]
+        starts = level.start.view()
+        first = max(np.searchsorted(starts, start, side="right") - 1, 0)
+        last = min(np.searchsorted(starts, stop, side="right") + 1, level.size)
+        result = self._envelope(level, first, last)
+        if last == level.size:
+            result = tuple(np.concatenate(pair) for pair in zip(result, self._tail(level_index)))
+        return result
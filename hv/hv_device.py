@@ -1,105 +1,33 @@
 import logging
-import math
-import pathlib
+import threading
 import time
-from dataclasses import dataclass
 from typing import List
 
-ROOT_PATH = pathlib.Path(__file__).parent.absolute()
-DEVICE_PATH = pathlib.Path(ROOT_PATH, "device_data")
+from hv import protocol, transports
+from hv.codec import DeviceCodec
+from hv.device_registry import DeviceCoefficient, DeviceData, ROOT_PATH, DEVICE_PATH
+from hv.protocol import FrameParser, Reading, ReadError, ReadTimeout, FRAME_SIZE
 
 """
-Сейчас подключение к девайсу происходит через PyFTDI  и протестированно на Linux.
+Сейчас подключение к девайсу по умолчанию происходит через PyFTDI и протестированно на Linux.
+Транспорт выбирается в hv.transports: pyftdi, serial (драйвер ядра ftdi_sio через pyserial) или ftd2xx.
 Для корректной работы программы под Windows возможно потребуется реализация подключение через FTD2XX.
 """
-FTD2XX = False
-if FTD2XX:
-    from hv.ftd2xx_device import FTD2XXDevice as Device
-else:
-    from hv.ftdi_device import PyFTDIDevice as Device
 
 
-@dataclass
-class DeviceCoefficient:
-    max_voltage: int
-    voltage_coef: float
-    current_coef_6w: float
-    current_coef_15w: float
-    current_coef_60w: float
-
-    @staticmethod
-    def load_data(voltage):
-        with open(DEVICE_PATH / "data_from_protocol.csv") as fin:
-            fin.readline()
-            for line in fin.readlines():
-                line = line.split(",")
-                if int(line[0]) == voltage:
-                    return DeviceCoefficient(*tuple(map(float, line)))
-
-
-@dataclass
-class DeviceData:
-    name: str
-    codemax_ADC: int
-    codemax_DAC: int
-    voltage_max: float
-    voltage_min: float
-    voltage_step: float
-    current_step: float
-    polarity: str
-    sensor_resistance: float
-    feedback_resistanse: float
-    current_min: float
-    current_max: float
-    current_units: str
-
-    def resolve_current_label(self):
-        if self.current_units == "micro":
-            return "μA"
-        elif self.current_units == "milli":
-            return "mA"
-        else:
-            return "μA"
-
-    def resolve_current_step(self):
-        if self.current_units == "micro":
-            return self.current_step
-        elif self.current_units == "milli":
-            return self.current_step / 1000
-        else:
-            return self.current_step
-
-    @staticmethod
-    def load_device_data(name):
-        with open(pathlib.Path(DEVICE_PATH, "device_table.csv")) as fin:
-            fin.readline()
-            for line in fin.readlines():
-                line = line.split(",")
-                if line[0] == name:
-                    return DeviceData(name=name,
-                                      codemax_ADC=int(line[1]),
-                                      codemax_DAC=int(line[2]),
-                                      voltage_max=float(line[3]),
-                                      voltage_min=float(line[4]),
-                                      voltage_step=float(line[5]),
-                                      current_step=float(line[6]),
-                                      polarity=line[7],
-                                      sensor_resistance=float(line[8]),
-                                      feedback_resistanse=float(line[9]),
-                                      current_min=float(line[10]),
-                                      current_max=float(line[11]),
-                                      current_units=line[12].strip()
-                                      )
-        return None
-
 class HVDevice:
     MANUFACTUTER = "Mantigora"  # See Unit1.pas
 
-    SET_CODE = 0x01
-    UPDATE_CODE = 0x02
-    RESET_CODE = 0x03
-    RESERVE_CODE = 0x04
-    GET_CODE = 0x05
+    SET_CODE = protocol.SET_CODE
+    UPDATE_CODE = protocol.UPDATE_CODE
+    RESET_CODE = protocol.RESET_CODE
+    RESERVE_CODE = protocol.RESERVE_CODE
+    GET_CODE = protocol.GET_CODE
+    GET_REPLY_SIZE = FRAME_SIZE
+    READ_TIMEOUT = 0.5  # seconds, for reply of one request
+
+    # GET command is one byte and reply is five bytes, each byte is ten bits on the line (8N1)
+    MAX_POLL_RATE = protocol.BAUDRATE / ((1 + GET_REPLY_SIZE) * 10)  # Hz
 
     def __init__(self, device, data: DeviceData = None):
         self.device = device
@@ -107,6 +35,12 @@ class HVDevice:
         self.units_label = data.resolve_current_label()
         self.init_coefficient()
         self.is_open = False
+        self.round_trip = None  # duration of the last GET request, seconds
+        self.parser = FrameParser()
+        # Reply of failed request can come later and must be dropped before the next request
+        self.stale = False
+        # Device is used from GUI and acquisition threads, command and its reply must not interleave
+        self._lock = threading.RLock()
 
     def init_coefficient(self):
         coeff = DeviceCoefficient.load_data(int(self.data.voltage_max / 1000))
@@ -124,6 +58,7 @@ class HVDevice:
                 self.current_coef = None
         else:
             self.current_coef = None
+        self.codec = DeviceCodec(self.data, self.voltage_coeff, self.current_coef)
 
     def __str__(self):
         return str(self.device)
@@ -140,104 +75,163 @@ class HVDevice:
 
     def _write(self, code, data=None):
         try:
-            self.device.write(code, data)
+            with self._lock:
+                self.device.write(code, data)
         except Exception as e:
             self.is_open = False
             logging.root.warning(str(e))
 
+    def encode_value(self, voltage, current) -> List[int]:
+        """
+        Return data bytes of SET command for Voltage (V) and Current (microA or milliA)
+        """
+        return list(self.codec.encode_setpoint(voltage, current))
+
     def set_value(self, voltage, current):
-        coeff = self.data.codemax_DAC / self.data.voltage_max
-        if not math.isclose(coeff, self.voltage_coeff, abs_tol=1e-2):
-            logging.root.warning("Voltage coefficients not consistent {}, {}".format(coeff, self.voltage_coeff))
-        voltage = round(voltage * coeff)
-        first_byte_U = voltage - math.trunc(voltage / 256) * 256
-        second_byte_U = math.trunc(voltage / 256)
-
-        coeff = self.data.codemax_DAC / self.data.current_max
-        if self.current_coef is not None:
-            if not math.isclose(coeff, self.current_coef, abs_tol=1e-2):
-                logging.root.warning("Current coefficients not consistent {}, {}".format(coeff, self.current_coef))
-        current = round(current * coeff)
-        first_byte_I = current - math.trunc(current / 256) * 256
-        second_byte_I = math.trunc(current / 256)
-
-        self._write(HVDevice.SET_CODE, [first_byte_U, second_byte_U,
-                                        first_byte_I, second_byte_I])
+        self._write(HVDevice.SET_CODE, self.encode_value(voltage, current))
 
     def update_value(self):
         self._write(HVDevice.UPDATE_CODE)
 
+    def transaction(self) -> "Transaction":
+        return Transaction(self)
+
+    def execute(self, frames: List[int], replies: int) -> List[Reading]:
+        """
+        Write several commands in one transfer, then read replies of all GET commands.
+        Return list of (Current, Voltage) in order of GET commands
+        """
+        with self._lock:
+            if replies != 0:
+                self.drain()
+            try:
+                self.device.write_frames(bytes(frames))
+            except Exception as e:
+                self.is_open = False
+                logging.root.warning(str(e))
+                return []
+            if replies == 0:
+                return []
+            frames = self._read_frames(replies)
+        return [self.decode_IU(frame) for frame in frames]
+
     def reset_value(self):
         self._write(HVDevice.RESET_CODE)
 
-    def get_IU(self):
+    def drain(self):
+        """
+        Drop replies which came after failure of previous request
         """
-        Return Current (microA or milliA) and Voltage (V)
+        if self.stale:
+            stale = self.parser.feed(self.device.read_available())
+            self.parser.dropped += len(stale)
+            self.parser.clear()
+            self.stale = False
+
+    def _read_frames(self, count) -> List[bytes]:
+        if not self.is_open:
+            raise ReadError("Device {} is not connected".format(self))
+        frames = []
+        deadline = time.monotonic() + count * HVDevice.READ_TIMEOUT
+        while len(frames) < count:
+            try:
+                temp = self.device.read(self.parser.missing() + (count - len(frames) - 1) * FRAME_SIZE)
+            except Exception as e:
+                self.is_open = False
+                raise ReadError(str(e))
+            if not temp or time.monotonic() > deadline:
+                self.stale = True
+                raise ReadTimeout("Can not get data from device {}, got {} of {} replies".format(
+                    self, len(frames), count))
+            frames += self.parser.feed(temp)
+        return frames
+
+    def get_IU(self) -> Reading:
         """
-        self._write(HVDevice.GET_CODE)
-        temp = self.device.read(5)
-        if temp is None or len(temp) < 5:
-            print("Can not get data from device, data_array={}".format(str(temp)))
-            return 0, 0
-        if temp[4] != 13:
-            print("Bad read: ", temp)
-            return 0, 0
-        ADC_mean_count = 16
-        U = (temp[2] * 256 + temp[3]) * self.data.voltage_max / self.data.codemax_ADC / ADC_mean_count
-        # Return absolute value
-        # if self.data.polarity == "N":
-        #     U = -U
-        I = (temp[0] * 256 + temp[1]) * self.data.current_max / self.data.codemax_DAC
-        if self.data.current_units == "micro":
-            I = I - abs(U / self.data.feedback_resistanse)
-        elif self.data.current_units == "milli":
-            I = I / 1000
-        return I, U
+        Return Current (microA or milliA) and Voltage (V).
+        Raise ReadError if device didn't reply.
+        """
+        with self._lock:
+            self.drain()
+            start = time.perf_counter()
+            self._write(HVDevice.GET_CODE)
+            frame = self._read_frames(1)[0]
+            self.round_trip = time.perf_counter() - start
+        return self.decode_IU(frame)
+
+    def decode_IU(self, temp) -> Reading:
+        """
+        Convert reply of GET command to Current (microA or milliA) and Voltage (V)
+        """
+        return self.codec.decode_frame(temp)
 
     @staticmethod
     def find_all_devices() -> List["HVDevice"]:
-        devices = Device.find_all_device(lambda x: True)
+        devices = transports.selected().find_all_device(lambda x: True)
         devices = [HVDevice(dev, DeviceData.load_device_data(dev.name)) for dev in devices]
         return devices  # + [create_test_device()]
 
     @staticmethod
     def find_new_devices(old) -> List["HVDevice"]:
-        devices = Device.find_new_device(old, lambda x: True)
+        devices = transports.selected().find_new_device(old, lambda x: True)
         devices = [HVDevice(dev, DeviceData.load_device_data(dev.name)) for dev in devices]
         return devices
 
 
-def create_test_device():
-
-    class FakeDevice:
-        name = "HT-60-30-P"
-        data = [0xFF, 0xFF, 0xFF, 0xFF]
-
-        def __str__(self):
-            return self.name + "-TEST"
-
-        def open(self):
-            print("open")
-            logging.root.info("Open device {}".format(self))
-
-        def close(self):
-            print("close")
-            logging.root.info("Close device {}".format(self))
-
-        def write(self, code,data=None):
-            print("Code:", code, "Data:", data)
-            logging.root.debug("Write method get code : {}, data : {}".format(code, data))
-            if code == 1:
-                self.data = data
-            elif code == 2:
-                pass
-                # raise Exception
-            elif code == 3:
-                self.data = [0,0,0,0]
-
-        def read(self, n):
-            print("Read:", n)
-            return self.data[2:] + self.data[0:2][::-1] + [13]
-    dev = FakeDevice()
-    dev = HVDevice(dev, DeviceData.load_device_data(dev.name))
-    return dev
+class Transaction:
+    """
+    Batch of commands which written to device in single USB transfer:
+
+        with device.transaction() as transaction:
+            transaction.set_value(voltage, current)
+            transaction.update_value()
+            transaction.get_IU()
+        I, U = transaction.results[0]
+
+    Replies of GET commands are read together after write and demultiplexed to `results`.
+    """
+
+    def __init__(self, device: HVDevice):
+        self.device = device
+        self.frames = []
+        self.replies = 0
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+
+    def set_value(self, voltage, current):
+        self.frames += [HVDevice.SET_CODE] + self.device.encode_value(voltage, current)
+        return self
+
+    def update_value(self):
+        self.frames.append(HVDevice.UPDATE_CODE)
+        return self
+
+    def reset_value(self):
+        self.frames.append(HVDevice.RESET_CODE)
+        return self
+
+    def get_IU(self):
+        self.frames.append(HVDevice.GET_CODE)
+        self.replies += 1
+        return self
+
+    def commit(self) -> List[Reading]:
+        if self.frames:
+            self.results = self.device.execute(self.frames, self.replies)
+            self.frames = []
+            self.replies = 0
+        return self.results
+
+
+def create_test_device(name="HT-60-30-P"):
+    """
+    Return simulated device of given model, see hv.simulator
+    """
+    from hv.simulator import SimulatedDevice
+    return HVDevice(SimulatedDevice("sim://test", name), DeviceData.load_device_data(name))
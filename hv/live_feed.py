@@ -0,0 +1,148 @@
+import mmap
+import pathlib
+import struct
+from typing import Tuple
+
+import numpy as np
+
+from hv.recording import RECORD_DTYPE
+
+
+class LiveFeedFormat:
+    """
+    Ring file of the newest samples of one device, shared with other processes by memory mapping.
+
+    Header is HEADER_SIZE bytes: magic, header size, record size, capacity and sequence number,
+    sequence is the total number of written samples. Header is followed by 2 * capacity records RECORD_DTYPE,
+    every sample is written twice: at position seq % capacity and at the mirror position + capacity.
+    So the newest n <= capacity samples are always contiguous and can be returned as view without copy.
+    Sequence is updated after samples, readers check it to detect overwrite.
+    """
+    SUFFIX = ".ring"
+    MAGIC = b"HVLIVE\x00\x01"
+    HEADER_SIZE = 64
+    HEADER = struct.Struct("<8sIIQ")
+    SEQUENCE_OFFSET = HEADER.size
+    CAPACITY = 65536
+
+    @staticmethod
+    def file_size(capacity):
+        return LiveFeedFormat.HEADER_SIZE + 2 * capacity * RECORD_DTYPE.itemsize
+
+    @staticmethod
+    def map(buffer) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return views of sequence number and of records in mapped file
+        """
+        magic, size, record_size, capacity = LiveFeedFormat.HEADER.unpack_from(buffer)
+        if magic != LiveFeedFormat.MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError("Not a HV-controls live feed")
+        sequence = np.ndarray((1,), dtype="<u8", buffer=buffer, offset=LiveFeedFormat.SEQUENCE_OFFSET)
+        records = np.ndarray((2 * capacity,), dtype=RECORD_DTYPE, buffer=buffer, offset=size)
+        return sequence, records
+
+
+class LiveFeedWriter:
+    """
+    Write samples of device to ring file, see LiveFeedFormat. File is recreated on open.
+    """
+
+    def __init__(self, path, capacity=LiveFeedFormat.CAPACITY):
+        self.path = pathlib.Path(path)
+        self.capacity = capacity
+        with self.path.open("wb") as fout:
+            fout.truncate(LiveFeedFormat.file_size(capacity))
+            fout.write(LiveFeedFormat.HEADER.pack(LiveFeedFormat.MAGIC, LiveFeedFormat.HEADER_SIZE,
+                                                  RECORD_DTYPE.itemsize, capacity))
+        self._file = self.path.open("r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self._sequence, self._records = LiveFeedFormat.map(self._mmap)
+
+    @property
+    def sequence(self):
+        return int(self._sequence[0])
+
+    def write(self, times, voltage, current):
+        times = np.asarray(times, dtype=float)
+        if len(times) == 0:
+            return
+        # Samples older than capacity would be overwritten in the same call
+        skip = max(len(times) - self.capacity, 0)
+        times = times[skip:]
+        voltage = np.asarray(voltage, dtype=float)[skip:]
+        current = np.asarray(current, dtype=float)[skip:]
+        count = len(times)
+        sequence = self.sequence + skip
+        index = (sequence + np.arange(count)) % self.capacity
+        for position in [index, index + self.capacity]:
+            self._records["time"][position] = times
+            self._records["voltage"][position] = voltage
+            self._records["current"][position] = current
+        self._sequence[0] = sequence + count
+
+    def close(self):
+        self._sequence = self._records = None
+        self._mmap.close()
+        self._file.close()
+
+
+class LiveFeedReader:
+    """
+    Read the newest samples from ring file written by other process.
+
+        reader = LiveFeedReader(path)
+        samples = reader.latest(1000)  # view of the last 1000 samples, fields "time", "voltage", "current"
+
+    Views are not copied, so they can be overwritten by writer after `capacity` new samples.
+    Use `copy=True` to get consistent copy.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._file = self.path.open("rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._sequence, self._records = LiveFeedFormat.map(self._mmap)
+        self.capacity = len(self._records) // 2
+
+    @property
+    def sequence(self):
+        return int(self._sequence[0])
+
+    def _view(self, sequence, n):
+        n = min(n, sequence, self.capacity)
+        end = sequence % self.capacity + self.capacity
+        return self._records[end - n:end]
+
+    def latest(self, n, copy=False) -> np.ndarray:
+        """
+        Return the newest n samples (or less if feed is shorter)
+        """
+        return self._read(self.sequence, n, copy)[1]
+
+    def read_since(self, sequence, copy=False) -> Tuple[int, np.ndarray]:
+        """
+        Return current sequence number and samples written after `sequence`.
+        If more than capacity samples were written, only the newest capacity samples are returned.
+        """
+        last = self.sequence
+        return self._read(last, max(last - sequence, 0), copy)
+
+    def _read(self, sequence, n, copy):
+        while True:
+            view = self._view(sequence, n)
+            if not copy:
+                return sequence, view
+            result = view.copy()
+            if self.sequence - sequence + len(result) <= self.capacity:
+                return sequence, result
+            # Writer overwrote samples during copy
+            sequence = self.sequence
+
+    def close(self):
+        self._sequence = self._records = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views returned to caller are still alive, mapping is released with them
+            pass
+        self._file.close()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from typing import List, Optional
+
+from hv.async_device import AsyncHVDevice
+from hv.hv_device import HVDevice
+
+
+class Summary:
+    """
+    Count, mean, min and max of readings of one device since the last report.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.errors = 0
+        self.voltage_sum = self.current_sum = 0.0
+        self.voltage_min = self.current_min = math.inf
+        self.voltage_max = self.current_max = -math.inf
+
+    def add(self, voltage, current):
+        self.count += 1
+        self.voltage_sum += voltage
+        self.current_sum += current
+        self.voltage_min = min(self.voltage_min, voltage)
+        self.voltage_max = max(self.voltage_max, voltage)
+        self.current_min = min(self.current_min, current)
+        self.current_max = max(self.current_max, current)
+
+    def report(self):
+        if self.count == 0:
+            return "{}: no readings, errors {}".format(self.name, self.errors)
+        return "{}: {} readings, errors {}, U mean {:.6g} min {:.6g} max {:.6g}, I mean {:.6g} min {:.6g} max {:.6g}".format(
+            self.name, self.count, self.errors, self.voltage_sum / self.count, self.voltage_min, self.voltage_max,
+            self.current_sum / self.count, self.current_min, self.current_max)
+
+
+class Monitor:
+    """
+    Stream timestamped readings of devices to output at fixed rate.
+
+    Devices are polled concurrently by AsyncHVDevice at absolute deadlines, so schedule doesn't drift.
+    If poll takes longer than period, missed ticks are skipped and counted in `overruns`.
+    Lines are buffered and written every FLUSH_INTERVAL. Summary statistics are written to stderr
+    every `summary` seconds (0 disables) and at exit.
+    """
+    FLUSH_INTERVAL = 1.0  # seconds
+    FORMATS = ("jsonl", "csv")
+
+    def __init__(self, devices: List[HVDevice], rate=1.0, output_format="jsonl", summary=0.0,
+                 duration: Optional[float] = None, output=None):
+        if output_format not in self.FORMATS:
+            raise ValueError("Unknown format {}".format(output_format))
+        if not 0 < rate < float("inf"):
+            raise ValueError("Rate must be positive, got {}".format(rate))
+        self.devices = [AsyncHVDevice(device) for device in devices]
+        self.rate = min(rate, min(device.MAX_POLL_RATE for device in devices))
+        self.output_format = output_format
+        self.summary = summary
+        self.duration = duration
+        self.output = sys.stdout if output is None else output
+        self.overruns = 0
+        self.summaries = [Summary(str(device)) for device in devices]
+        self._names = [json.dumps(str(device)) for device in devices]
+        self._lines = []
+
+    def _header(self):
+        if self.output_format == "csv":
+            self._lines.append("time,device,voltage,current\n")
+
+    def _format(self, t, index, reading):
+        I, U = reading
+        if self.output_format == "csv":
+            return "{},{},{},{}\n".format(t, self._names[index], U, I)
+        return '{{"time":{},"device":{},"voltage":{},"current":{}}}\n'.format(t, self._names[index], U, I)
+
+    def _flush(self):
+        if self._lines:
+            self.output.write("".join(self._lines))
+            self._lines = []
+        self.output.flush()
+
+    def _report(self):
+        for summary in self.summaries:
+            sys.stderr.write(summary.report() + "\n")
+            summary.clear()
+        if self.overruns:
+            sys.stderr.write("overruns: {}\n".format(self.overruns))
+        sys.stderr.flush()
+
+    async def _poll(self):
+        readings = await asyncio.gather(*[device.get_IU() for device in self.devices], return_exceptions=True)
+        t = time.time()
+        for index, reading in enumerate(readings):
+            if isinstance(reading, Exception):
+                self.summaries[index].errors += 1
+                logging.root.debug("Can't read {}: {}".format(self.devices[index], reading))
+                continue
+            self._lines.append(self._format(t, index, reading))
+            self.summaries[index].add(reading.voltage, reading.current)
+
+    async def run(self):
+        await asyncio.gather(*[device.open() for device in self.devices])
+        loop = asyncio.get_running_loop()
+        period = 1 / self.rate
+        start = deadline = loop.time()
+        next_flush = start + self.FLUSH_INTERVAL
+        next_summary = start + self.summary if self.summary else math.inf
+        stop = start + self.duration if self.duration else math.inf
+        self._header()
+        try:
+            while deadline < stop:
+                await self._poll()
+                deadline += period
+                now = loop.time()
+                if now > deadline:
+                    missed = int((now - deadline) / period) + 1
+                    self.overruns += missed
+                    deadline += missed * period
+                if now >= next_flush:
+                    self._flush()
+                    next_flush = now + self.FLUSH_INTERVAL
+                if now >= next_summary:
+                    self._report()
+                    next_summary += self.summary
+                await asyncio.sleep(max(deadline - loop.time(), 0))
+        finally:
+            self._flush()
+            if self.summary and any(summary.count or summary.errors for summary in self.summaries):
+                self._report()
+            await asyncio.gather(*[device.close() for device in self.devices])
+
+
+def run_monitor(devices: List[HVDevice], rate=1.0, output_format="jsonl", summary=0.0,
+                duration: Optional[float] = None):
+    monitor = Monitor(devices, rate, output_format, summary, duration)
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Reader of output was closed, e.g. `| head`, don't fail again on flush at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
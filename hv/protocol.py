@@ -0,0 +1,87 @@
+from typing import List, NamedTuple
+
+SET_CODE = 0x01
+UPDATE_CODE = 0x02
+RESET_CODE = 0x03
+RESERVE_CODE = 0x04
+GET_CODE = 0x05
+
+BAUDRATE = 38400
+FRAME_SIZE = 5
+TERMINATOR = 0x0D
+
+
+class Reading(NamedTuple):
+    """
+    Result of GET command: Current (microA or milliA) and Voltage (V)
+    """
+    current: float
+    voltage: float
+
+
+class ReadError(Exception):
+    pass
+
+
+class ReadTimeout(ReadError):
+    pass
+
+
+class FrameError(ReadError):
+    pass
+
+
+class FrameParser:
+    """
+    Incremental parser of GET replies. Reply is five bytes terminated by 0x0D.
+
+    Parser buffers partial reads. If the stream lost alignment (byte was lost or garbage was received),
+    parser drops bytes until terminator and continues from the next frame.
+    """
+
+    def __init__(self, size=FRAME_SIZE, terminator=TERMINATOR):
+        self.size = size
+        self.terminator = terminator
+        self.buffer = bytearray()
+        self.frames = 0  # number of parsed frames
+        self.dropped = 0  # number of broken or discarded frames
+        self.resyncs = 0  # number of alignment recoveries
+        self._resync = False
+
+    def missing(self):
+        """
+        Number of bytes required to complete current frame
+        """
+        return self.size - len(self.buffer) % self.size
+
+    def feed(self, data) -> List[bytes]:
+        self.buffer += bytes(data)
+        frames = []
+        end = self.size - 1
+        while len(self.buffer) >= self.size:
+            if self.buffer[end] == self.terminator:
+                frames.append(bytes(self.buffer[:self.size]))
+                del self.buffer[:self.size]
+                self.frames += 1
+                if self._resync:
+                    self._resync = False
+                    self.resyncs += 1
+                continue
+            if not self._resync:
+                self._resync = True
+                self.dropped += 1
+            index = self.buffer.find(self.terminator, self.size)
+            if index == -1:
+                # Keep tail which can be start of the next frame
+                del self.buffer[:len(self.buffer) - end]
+            else:
+                del self.buffer[:index - end]
+        return frames
+
+    def clear(self):
+        """
+        Drop incomplete frame
+        """
+        if self.buffer:
+            self.dropped += 1
+            self.buffer.clear()
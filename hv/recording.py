@@ -0,0 +1,514 @@
+import atexit
+import gzip
+import json
+import logging
+import lzma
+import os
+import pathlib
+import queue
+import shutil
+import struct
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("voltage", "<f8"), ("current", "<f8")])
+
+
+class TimeIndex:
+    """
+    Sparse time index of CSV record, sidecar file `<record>.idx`.
+
+    Index is array of DTYPE: time and byte offset of every STEP-th line of record.
+    Reader finds offset of requested time by binary search and seeks to it, so reading of time range
+    does not depend on size of record. Index is written by CsvFormat together with record,
+    lines which are not indexed yet (old records or record of crashed writer) are indexed on demand by `update`.
+    """
+    SUFFIX = ".idx"
+    STEP = 4096  # lines
+    DTYPE = np.dtype([("time", "<f8"), ("offset", "<u8")])
+    BLOCK_SIZE = 1 << 20
+    writing = set()  # records which are written by CsvFormat of this process
+
+    @staticmethod
+    def path_for(path) -> pathlib.Path:
+        return pathlib.Path(str(path) + TimeIndex.SUFFIX)
+
+    @staticmethod
+    def load(path) -> np.ndarray:
+        """
+        Return valid entries of index of record
+        """
+        index_path = TimeIndex.path_for(path)
+        if not index_path.exists():
+            return np.empty(0, dtype=TimeIndex.DTYPE)
+        data = index_path.read_bytes()
+        entries = np.frombuffer(data[:len(data) - len(data) % TimeIndex.DTYPE.itemsize], dtype=TimeIndex.DTYPE)
+        # Record can be truncated or replaced after index was written
+        invalid = np.flatnonzero(entries["offset"] >= pathlib.Path(path).stat().st_size)
+        return entries[:invalid[0]] if len(invalid) != 0 else entries
+
+    @staticmethod
+    def scan(fin, offset=0, phase=0):
+        """
+        Index lines of binary file `fin` from `offset` to end.
+        Line is indexed if it is `phase`-th line after last indexed line, modulo STEP,
+        broken lines are not indexed and incomplete last line is left for the next scan.
+        Return list of entries and phase of the next line.
+        """
+        fin.seek(offset)
+        if offset == 0:
+            first = fin.readline()
+            if first and not TimeIndex.is_data_line(first):
+                offset = len(first)
+            fin.seek(offset)
+        entries = []
+        tail = b""
+        while True:
+            block = fin.read(TimeIndex.BLOCK_SIZE)
+            if not block:
+                break
+            data = tail + block
+            ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+            starts = np.concatenate([[0], ends[:-1] + 1])
+            for start, end in zip(starts[(-phase) % TimeIndex.STEP::TimeIndex.STEP].tolist(),
+                                  ends[(-phase) % TimeIndex.STEP::TimeIndex.STEP].tolist()):
+                separator = data.find(b",", start, end)
+                if separator < 0:
+                    continue
+                try:
+                    entries.append((float(data[start:separator]), offset + start))
+                except ValueError:
+                    continue
+            phase = (phase + len(ends)) % TimeIndex.STEP
+            consumed = int(ends[-1]) + 1 if len(ends) != 0 else 0
+            tail = data[consumed:]
+            offset += consumed
+        return entries, phase
+
+    @staticmethod
+    def is_data_line(line):
+        try:
+            float(line.split(b",", 1)[0])
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def update(path) -> np.ndarray:
+        """
+        Index lines after the last entry of index and save index if it is possible.
+        Index of record which is written in this process is not saved, writer owns it.
+        Index is replaced atomically, so writer of other process keeps writing its own file.
+        """
+        entries = TimeIndex.load(path)
+        offset = int(entries["offset"][-1]) if len(entries) != 0 else 0
+        with open(path, "rb") as fin:
+            new, _ = TimeIndex.scan(fin, offset)
+        if len(entries) != 0:
+            # The first line is the last entry
+            new = new[1:]
+        if new:
+            entries = np.concatenate([entries, np.array(new, dtype=TimeIndex.DTYPE)])
+            if os.path.abspath(path) in TimeIndex.writing:
+                return entries
+            index_path = TimeIndex.path_for(path)
+            temp_path = index_path.with_name(index_path.name + ".tmp")
+            try:
+                temp_path.write_bytes(entries.tobytes())
+                os.replace(str(temp_path), str(index_path))
+            except OSError as e:
+                logging.root.debug("Can't save index of {}: {}".format(path, e))
+        return entries
+
+    @staticmethod
+    def seek(entries, time) -> int:
+        """
+        Return offset of line from which record should be read to find samples after `time`
+        """
+        position = np.searchsorted(entries["time"], time, side="right") - 1
+        return int(entries["offset"][position]) if position >= 0 else 0
+
+
+class CsvFormat:
+    """
+    Text format: one line "Unix time, s,Voltage, V,Current, μA" per sample, without header.
+    Sparse time index is written to sidecar file, see TimeIndex.
+    """
+    SUFFIX = ".csv"
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.fout = open(path, "ab")
+        self._size = self.fout.tell()
+        entries = TimeIndex.load(path) if self._size else np.empty(0, dtype=TimeIndex.DTYPE)
+        self.phase = 0
+        if len(entries) != 0:
+            with open(path, "rb") as fin:
+                self.phase = TimeIndex.scan(fin, int(entries["offset"][-1]))[1]
+        self.index = TimeIndex.path_for(path).open("wb")
+        self.index.write(entries.tobytes())
+        TimeIndex.writing.add(self.path)
+
+    def write(self, times, voltage, current):
+        lines = ["{},{},{}\n".format(t, U, I) for t, U, I in zip(times.tolist(), voltage.tolist(), current.tolist())]
+        indexed = np.arange((-self.phase) % TimeIndex.STEP, len(lines), TimeIndex.STEP)
+        if len(indexed) != 0:
+            offsets = np.cumsum([0] + [len(line) for line in lines])
+            entries = np.empty(len(indexed), dtype=TimeIndex.DTYPE)
+            entries["time"] = np.asarray(times)[indexed]
+            entries["offset"] = self._size + offsets[indexed]
+            self.index.write(entries.tobytes())
+        self.phase = (self.phase + len(lines)) % TimeIndex.STEP
+        data = "".join(lines).encode("ascii")
+        self.fout.write(data)
+        self._size += len(data)
+
+    def flush(self):
+        self.fout.flush()
+        self.index.flush()
+
+    def size(self):
+        return self._size
+
+    def close(self):
+        TimeIndex.writing.discard(self.path)
+        self.fout.close()
+        self.index.close()
+
+
+class BinaryFormat:
+    """
+    Columnar binary format which can be memory-mapped into NumPy:
+
+        header = BinaryFormat.read_header(path)
+        data = np.memmap(path, RECORD_DTYPE, "r", header.size, (header.count,))
+
+    Header is HEADER_SIZE bytes: magic, header size, record size, sample counter and description of record.
+    Records are RECORD_DTYPE: time (Unix time, s), voltage (V) and current (μA) as little-endian float64.
+    Sample counter is updated on every flush, records after counter are incomplete and ignored.
+    """
+    SUFFIX = ".hvr"
+    MAGIC = b"HVREC\x00\x00\x01"
+    HEADER_SIZE = 64
+    HEADER = struct.Struct("<8sIIQ")
+    COUNT_OFFSET = 16
+
+    class Header:
+        def __init__(self, size, record_size, count):
+            self.size = size
+            self.record_size = record_size
+            self.count = count
+
+    def __init__(self, path):
+        path = pathlib.Path(path)
+        if path.exists() and path.stat().st_size > 0:
+            header = self.read_header(path)
+            self.count = header.count
+            self.fout = path.open("r+b")
+            self.fout.truncate(header.size + header.count * header.record_size)
+            self.fout.seek(0, 2)
+        else:
+            self.count = 0
+            self.fout = path.open("wb")
+            self.fout.write(self.pack_header(0))
+
+    @staticmethod
+    def pack_header(count):
+        description = ",".join(["{}:{}".format(name, RECORD_DTYPE[name].str) for name in RECORD_DTYPE.names])
+        header = BinaryFormat.HEADER.pack(BinaryFormat.MAGIC, BinaryFormat.HEADER_SIZE, RECORD_DTYPE.itemsize, count)
+        return (header + description.encode("ascii")).ljust(BinaryFormat.HEADER_SIZE, b"\x00")
+
+    @staticmethod
+    def read_header(path) -> "BinaryFormat.Header":
+        with open(path, "rb") as fin:
+            return BinaryFormat.unpack_header(fin.read(BinaryFormat.HEADER.size), path)
+
+    @staticmethod
+    def unpack_header(data, name="file") -> "BinaryFormat.Header":
+        if len(data) < BinaryFormat.HEADER.size:
+            raise ValueError("{} is not a HV-controls record".format(name))
+        magic, size, record_size, count = BinaryFormat.HEADER.unpack_from(data)
+        if magic != BinaryFormat.MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError("{} is not a HV-controls record".format(name))
+        return BinaryFormat.Header(size, record_size, count)
+
+    def write(self, times, voltage, current):
+        records = np.empty(len(times), dtype=RECORD_DTYPE)
+        records["time"] = times
+        records["voltage"] = voltage
+        records["current"] = current
+        self.fout.write(records.tobytes())
+        self.count += len(records)
+
+    def flush(self):
+        self.fout.flush()
+        self.fout.seek(self.COUNT_OFFSET)
+        self.fout.write(struct.pack("<Q", self.count))
+        self.fout.seek(0, 2)
+        self.fout.flush()
+
+    def size(self):
+        return self.fout.tell()
+
+    def close(self):
+        self.flush()
+        self.fout.close()
+
+
+FORMATS = {fmt.SUFFIX: fmt for fmt in [CsvFormat, BinaryFormat]}
+
+
+def resolve_format(path):
+    """
+    Return format class by file suffix, CSV is default.
+    """
+    return FORMATS.get(pathlib.Path(path).suffix.lower(), CsvFormat)
+
+
+COMPRESSION = {
+    "gzip": (".gz", gzip.open),
+    "lzma": (".xz", lzma.open),
+}
+
+
+class Manifest:
+    """
+    JSON list of segments of rotated record with their time ranges, file `<stem>.manifest.json`.
+    Tools can open only segments which cover requested time range.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._lock = threading.Lock()
+        if path.exists():
+            with path.open() as fin:
+                self.segments = json.load(fin)["segments"]
+        else:
+            self.segments = []
+
+    @staticmethod
+    def path_for(path) -> pathlib.Path:
+        path = pathlib.Path(path)
+        return path.with_name("{}.manifest.json".format(path.stem))
+
+    def next_index(self):
+        return max([segment["index"] for segment in self.segments], default=0) + 1
+
+    def update(self, index, **fields):
+        with self._lock:
+            for segment in self.segments:
+                if segment["index"] == index:
+                    segment.update(fields)
+                    break
+            else:
+                self.segments.append(dict(index=index, **fields))
+            self._save()
+
+    def _save(self):
+        temp = self.path.with_name(self.path.name + ".tmp")
+        with temp.open("w") as fout:
+            json.dump({"segments": self.segments}, fout, indent=1)
+        os.replace(str(temp), str(self.path))
+
+
+class Compressor(threading.Thread):
+    """
+    Background thread which compress closed segments and remove originals.
+    Closing doesn't wait for compression of queued segments (it can take minutes),
+    compressors which are still running are awaited at exit of interpreter, see `wait_all`.
+    """
+    _active = set()
+    _active_lock = threading.Lock()
+
+    def __init__(self, manifest: Manifest, compression):
+        super(Compressor, self).__init__(name="compressor-{}".format(manifest.path), daemon=True)
+        self.manifest = manifest
+        self.suffix, self.opener = COMPRESSION[compression]
+        self._queue = queue.SimpleQueue()
+
+    def start(self):
+        with Compressor._active_lock:
+            Compressor._active.add(self)
+        super(Compressor, self).start()
+
+    def add(self, index, path: pathlib.Path):
+        self._queue.put((index, path))
+
+    def run(self):
+        try:
+            self._compress_all()
+        finally:
+            with Compressor._active_lock:
+                Compressor._active.discard(self)
+
+    def _compress_all(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            index, path = item
+            target = path.with_name(path.name + self.suffix)
+            try:
+                with path.open("rb") as fin, self.opener(str(target), "wb") as fout:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+                path.unlink()
+                # Compressed segment can't be seeked, so index is not needed
+                index_path = TimeIndex.path_for(path)
+                if index_path.exists():
+                    index_path.unlink()
+                self.manifest.update(index, file=target.name)
+            except Exception as e:
+                logging.root.error("Compression of {} failed: {}".format(path, e))
+
+    def close(self):
+        """
+        Stop thread after compression of queued segments, don't wait for it
+        """
+        self._queue.put(None)
+
+    @staticmethod
+    def wait_all():
+        """
+        Wait for compression of all closed records
+        """
+        with Compressor._active_lock:
+            compressors = list(Compressor._active)
+        for compressor in compressors:
+            logging.root.info("Wait for compression of {}".format(compressor.manifest.path))
+            compressor.close()
+            compressor.join()
+
+
+# Compressor threads are daemons, so segments are compressed completely before interpreter kills them
+atexit.register(Compressor.wait_all)
+
+
+class RotatingOutput:
+    """
+    Output which splits record to segments `<stem>.0001<suffix>`, `<stem>.0002<suffix>`, ...
+    New segment is started when segment exceeds `max_size` bytes or covers `max_interval` seconds.
+    Closed segments are compressed in background if `compression` is "gzip" or "lzma".
+    """
+
+    def __init__(self, path, max_size=0, max_interval=0.0, compression: Optional[str] = None):
+        self.path = pathlib.Path(path)
+        self.format = resolve_format(path)
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.manifest = Manifest(Manifest.path_for(path))
+        self.compressor = None
+        if compression:
+            self.compressor = Compressor(self.manifest, compression)
+            self.compressor.start()
+        self.index = self.manifest.next_index() - 1
+        self.output = None
+
+    def _segment_path(self, index):
+        return self.path.with_name("{}.{:04d}{}".format(self.path.stem, index, self.path.suffix))
+
+    def _open(self, start):
+        self.index += 1
+        self.segment = self._segment_path(self.index)
+        self.output = self.format(self.segment)
+        self.start, self.end, self.samples = start, start, 0
+        self.manifest.update(self.index, file=self.segment.name, start=start, end=start, samples=0, closed=False)
+
+    def _close_segment(self):
+        self.output.close()
+        self.output = None
+        self.manifest.update(self.index, end=self.end, samples=self.samples, closed=True)
+        if self.compressor is not None:
+            self.compressor.add(self.index, self.segment)
+
+    def _need_rotation(self, time):
+        if self.max_size and self.output.size() >= self.max_size:
+            return True
+        return bool(self.max_interval) and time - self.start >= self.max_interval
+
+    def write(self, times, voltage, current):
+        if self.output is not None and self._need_rotation(times[0]):
+            self._close_segment()
+        if self.output is None:
+            self._open(times[0])
+        self.output.write(times, voltage, current)
+        self.end = times[-1]
+        self.samples += len(times)
+
+    def flush(self):
+        if self.output is not None:
+            self.output.flush()
+            self.manifest.update(self.index, end=self.end, samples=self.samples)
+
+    def close(self):
+        if self.output is not None:
+            self._close_segment()
+        if self.compressor is not None:
+            self.compressor.close()
+
+
+class RecordWriter(threading.Thread):
+    """
+    Background thread which writes samples to file.
+    Samples are queued without blocking and written in batches,
+    file is flushed every `flush_interval` seconds or every `flush_size` samples.
+    If `max_size` (bytes) or `max_interval` (seconds) is set, record is split into segments, see RotatingOutput,
+    only segments can be compressed.
+    """
+    FLUSH_INTERVAL = 1.0  # seconds
+    FLUSH_SIZE = 1024  # samples
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE,
+                 max_size=0, max_interval=0.0, compression: Optional[str] = None):
+        super(RecordWriter, self).__init__(name="record-{}".format(path), daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._queue = queue.SimpleQueue()
+        if max_size or max_interval:
+            self._output = RotatingOutput(path, max_size, max_interval, compression)
+        elif compression:
+            raise ValueError("Compression of record requires rotation")
+        else:
+            self._output = resolve_format(path)(path)
+
+    def add(self, times, voltage, current):
+        self._queue.put((np.asarray(times, dtype=float), np.asarray(voltage, dtype=float),
+                         np.asarray(current, dtype=float)))
+
+    def _write(self, batch):
+        if batch:
+            times, voltage, current = [np.concatenate(column) for column in zip(*batch)]
+            self._output.write(times, voltage, current)
+            self._output.flush()
+
+    def run(self):
+        batch = []
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    batch.append(item)
+                    size += len(item[0])
+                if size >= self.flush_size or time.monotonic() >= deadline:
+                    self._write(batch)
+                    batch, size = [], 0
+                    deadline = time.monotonic() + self.flush_interval
+            self._write(batch)
+        except Exception as e:
+            logging.root.error("Recording to {} failed: {}".format(self.path, e))
+        finally:
+            self._output.close()
+
+    def close(self):
+        self._queue.put(None)
+        self.join()
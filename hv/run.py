@@ -1,33 +1,243 @@
 import argparse
+import datetime
 import logging
+import re
 import sys
+import time
 
 
 def hv_controls_cmd(args):
     from hv.cmd_ui import HVShell
-    HVShell(args).cmdloop()
+    if args.script is not None:
+        HVShell(args).run_script(args.script)
+    else:
+        HVShell(args).cmdloop()
+
+
+class StartupProfile:
+    """
+    Durations of startup phases, reported to stderr if enabled
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self._last = self._start = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        for phase, duration in self.phases:
+            sys.stderr.write("{:<20} {:8.1f} ms\n".format(phase, duration * 1000))
+        sys.stderr.write("{:<20} {:8.1f} ms\n".format("total", (self._last - self._start) * 1000))
+        sys.stderr.flush()
 
 
 def hv_controls_qt(args):
-    from PyQt5 import QtWidgets
+    profile = StartupProfile(args.startup_profile)
+    from PyQt5 import QtCore, QtWidgets
     from hv.ui.main_window import HVWindow, materials_theme
+    profile.mark("imports")
     app = QtWidgets.QApplication(sys.argv)
     app.setOrganizationName("NPM_Group")
     app.setOrganizationDomain("npm.mipt.ru")
     app.setApplicationName("HV-controls")
+    profile.mark("application")
     stylesheet = materials_theme()
     app.setStyleSheet(stylesheet)
+    profile.mark("fonts and stylesheet")
 
     window = HVWindow(args)
+    profile.mark("window")
     window.show()
+    profile.mark("show")
+
+    def first_event():
+        profile.mark("first event")
+        profile.report()
+
+    QtCore.QTimer.singleShot(0, first_event)
     return sys.exit(app.exec_())
 
 
+def hv_controls_query(args):
+    from hv import data
+    chunks = data.read_chunks(args.file, args.start, args.stop)
+    if args.agg is not None:
+        chunks = data.aggregate(chunks, args.agg)
+        names = data.AGGREGATE_DTYPE.names
+    else:
+        names = data.RECORD_DTYPE.names
+    try:
+        sys.stdout.write(",".join(names) + "\n")
+        for chunk in chunks:
+            columns = [chunk[name].tolist() for name in names]
+            sys.stdout.write("".join([",".join(map(str, row)) + "\n" for row in zip(*columns)]))
+        sys.stdout.flush()
+    except BrokenPipeError:
+        pass
+    return 0
+
+
+def hv_controls_daemon(args):
+    from hv.daemon import run_daemon, default_socket_path
+    from hv.hv_device import HVDevice
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    devices = HVDevice.find_all_devices()
+    if not devices:
+        logging.root.error("No devices found")
+        return 1
+    run_daemon(args.socket or default_socket_path(), devices, args.rate, args.auto_rate, not args.no_reset)
+    return 0
+
+
+def hv_controls_scpi(args):
+    from hv.scpi import run_server
+    from hv.hv_device import HVDevice
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    devices = HVDevice.find_all_devices()
+    if not devices:
+        logging.root.error("No devices found")
+        return 1
+    run_server(devices, args.host, args.port, not args.no_reset)
+    return 0
+
+
+def hv_controls_monitor(args):
+    from hv.monitor import run_monitor
+    from hv.hv_device import HVDevice
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    devices = HVDevice.find_all_devices()
+    if args.device:
+        devices = [devices[index] for index in args.device if index < len(devices)]
+    if not devices:
+        logging.root.error("No devices found")
+        return 1
+    run_monitor(devices, args.rate, args.format, args.summary, args.duration)
+    return 0
+
+
+def _parse_time(value):
+    """
+    Unix time, ISO date and time or time of today, e.g. 14:32
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            moment = datetime.datetime.combine(datetime.date.today(), datetime.time.fromisoformat(value))
+        except ValueError:
+            raise argparse.ArgumentTypeError("Unknown time {}".format(value))
+    return moment.timestamp()
+
+
+INTERVAL_UNITS = {"ms": 1e-3, "s": 1.0, "m": 60.0, "min": 60.0, "h": 3600.0, "d": 86400.0}
+
+
+def _parse_interval(value):
+    match = re.fullmatch(r"([0-9.]+)\s*([a-z]*)", value.strip())
+    if match is None or match.group(2) not in INTERVAL_UNITS.keys() and match.group(2) != "":
+        raise argparse.ArgumentTypeError("Unknown interval {}, use e.g. 500ms, 1s, 5m, 1h".format(value))
+    interval = float(match.group(1)) * INTERVAL_UNITS.get(match.group(2), 1.0)
+    if interval <= 0:
+        raise argparse.ArgumentTypeError("Interval must be positive")
+    return interval
+
+
+def _parse_serial_port(value):
+    """
+    URL of port and model of source, e.g. /dev/ttyUSB0=HT-60-30-P
+    """
+    url, sep, name = value.rpartition("=")
+    if not sep or not url or not name:
+        raise argparse.ArgumentTypeError("Expected PORT=MODEL, got {}".format(value))
+    return url, name
+
+
+def _positive(value):
+    rate = float(value)
+    if not rate > 0 or rate == float("inf"):
+        raise argparse.ArgumentTypeError("Expected positive number, got {}".format(value))
+    return rate
+
+
+def _positive_int(value):
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("Expected positive integer, got {}".format(value))
+    return count
+
+
+def _milliseconds(value):
+    return None if value is None else value / 1000
+
+
+def _select_transport(args):
+    from hv import transports
+    if args.fake_device:
+        transports.select("simulator", count=args.fake_count, models=args.fake_model,
+                          latency=_milliseconds(args.sim_latency), jitter=_milliseconds(args.sim_jitter),
+                          load_resistance=args.sim_load)
+    else:
+        transports.select(args.transport, latency_timer=args.latency_timer, read_chunk=args.read_chunk,
+                          ports=args.serial_ports)
+
+
 def create_parser():
+    from hv import transports
     parser = argparse.ArgumentParser("HV-controls")
     parser.add_argument("--no-gui", action="store_true")
-    parser.add_argument("--fake-device", action="store_true")
+    parser.add_argument("--fake-device", action="store_true", help="Use simulated devices instead of hardware")
+    parser.add_argument("--fake-count", type=_positive_int, default=1, metavar="N",
+                        help="Number of simulated devices, used with --fake-device")
+    parser.add_argument("--fake-model", action="append", metavar="MODEL",
+                        help="Model of simulated devices from device tables, repeated cyclically")
+    parser.add_argument("--sim-latency", type=float, metavar="MS", help="Latency of simulated link")
+    parser.add_argument("--sim-jitter", type=float, metavar="MS", help="Standard deviation of simulated latency")
+    parser.add_argument("--sim-load", type=float, metavar="MOHM", help="Load resistance of simulated devices")
     parser.add_argument("--debug", action="store_true")
+    parser.add_argument("--script", help="Execute file of console commands, used with --no-gui")
+    parser.add_argument("--startup-profile", action="store_true", help="Print time of startup phases of GUI")
+    parser.add_argument("--transport", choices=transports.names(), default=transports.DEFAULT,
+                        help="Backend of connection to devices")
+    parser.add_argument("--latency-timer", type=int, metavar="MS",
+                        help="Latency timer of FTDI chip for serial transport, 1-255 ms")
+    parser.add_argument("--read-chunk", type=int, metavar="BYTES",
+                        help="Maximum size of single read for serial transport")
+    parser.add_argument("--serial-port", dest="serial_ports", type=_parse_serial_port, action="append",
+                        metavar="PORT=MODEL", help="Use given port instead of discovery for serial transport")
+    subparsers = parser.add_subparsers(dest="command")
+    query = subparsers.add_parser("query", help="Print time range of record as CSV")
+    query.add_argument("file", help="Record (CSV, .hvr, compressed segment) or manifest of rotated record")
+    query.add_argument("--from", dest="start", type=_parse_time, help="Unix time, ISO date and time or HH:MM[:SS]")
+    query.add_argument("--to", dest="stop", type=_parse_time, help="Unix time, ISO date and time or HH:MM[:SS]")
+    query.add_argument("--agg", type=_parse_interval,
+                       help="Print count, mean, min and max for intervals, e.g. 1s, 500ms, 5m")
+    daemon = subparsers.add_parser("daemon", help="Poll devices without GUI and serve them on Unix socket")
+    daemon.add_argument("--socket", help="Path of Unix socket, default $XDG_RUNTIME_DIR/hv-controls.sock")
+    daemon.add_argument("--rate", type=_positive, default=1.0, help="Poll rate, Hz")
+    daemon.add_argument("--auto-rate", action="store_true", help="Tune poll rate by round trip of device")
+    daemon.add_argument("--no-reset", action="store_true", help="Don't reset voltage on exit")
+    monitor = subparsers.add_parser("monitor", help="Stream readings of devices to stdout")
+    monitor.add_argument("--rate", type=_positive, default=1.0, help="Readings per second for every device")
+    monitor.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    monitor.add_argument("--summary", type=float, default=0.0, metavar="SECONDS",
+                         help="Print count, mean, min and max of readings to stderr every SECONDS")
+    monitor.add_argument("--duration", type=float, help="Stop after given seconds")
+    monitor.add_argument("--device", type=int, action="append", help="Index of device, all devices by default")
+    scpi = subparsers.add_parser("scpi", help="Serve SCPI-like commands over TCP")
+    scpi.add_argument("--host", default="127.0.0.1", help="Address to listen, localhost by default")
+    scpi.add_argument("--port", type=int, default=5025)
+    scpi.add_argument("--no-reset", action="store_true", help="Don't reset voltage on exit")
     return parser
 
 
@@ -39,6 +249,19 @@ def app():
     else:
         logging.root.setLevel(logging.INFO)
 
+    if args.command == "query":
+        return hv_controls_query(args)
+    try:
+        _select_transport(args)
+    except (ImportError, ValueError) as e:
+        logging.root.error("Can't use transport: {}".format(e))
+        return 1
+    if args.command == "daemon":
+        return hv_controls_daemon(args)
+    if args.command == "monitor":
+        return hv_controls_monitor(args)
+    if args.command == "scpi":
+        return hv_controls_scpi(args)
     if args.no_gui:
         logging.basicConfig(filename = "hv-controls.log")
         hv_controls_cmd(args)
@@ -0,0 +1,200 @@
+import bisect
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+SKIP = "skip"
+CATCH_UP = "catch-up"
+POLICIES = (SKIP, CATCH_UP)
+
+
+class Task:
+    """
+    Periodic task of Scheduler. Tick `index` is due at `start + index * period` of time.monotonic,
+    deadlines are computed from the start, so errors of single ticks don't add up.
+
+    `late` counts wake-ups later than `tolerance` after deadline of the next tick. If ticks were missed
+    (e.g. callback took longer than period), policy SKIP runs only the newest due tick and counts others
+    in `skipped`, policy CATCH_UP runs all missed ticks in order without waiting.
+
+    With `offsets` (sorted times in [0, period)) task has several ticks per period,
+    tick `index` is due at `start + (index // len(offsets)) * period + offsets[index % len(offsets)]`.
+    Ticks at positions `barriers` of offsets are never skipped: SKIP runs the first of them instead of the newest tick.
+    """
+
+    def __init__(self, callback: Callable[[int], None], period, start, policy=SKIP, tolerance=None,
+                 offsets: Optional[Sequence[float]] = None, barriers: Sequence[int] = (),
+                 clock: Callable[[], float] = time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy {}".format(policy))
+        if period <= 0:
+            raise ValueError("Period must be positive")
+        self.offsets = (0.0,) if offsets is None else tuple(float(offset) for offset in offsets)
+        if not self.offsets or any(b <= a for a, b in zip(self.offsets, self.offsets[1:])) or \
+                self.offsets[0] < 0 or self.offsets[-1] >= period:
+            raise ValueError("Offsets must be sorted and within period")
+        self.barriers = sorted(set(int(position) for position in barriers))
+        if any(not 0 <= position < len(self.offsets) for position in self.barriers):
+            raise ValueError("Barriers must be positions of offsets")
+        self.callback = callback
+        self.clock = clock
+        self.period = period
+        self.start = start
+        self.policy = policy
+        if tolerance is None:
+            gaps = [b - a for a, b in zip(self.offsets, self.offsets[1:] + (self.offsets[0] + period,))]
+            tolerance = min(gaps) / 2
+        self.tolerance = tolerance
+        self.index = 0  # the next tick, or the running one in callback
+        self.late = 0
+        self.skipped = 0
+        self.cancelled = False
+
+    def deadline(self, index=None):
+        cycle, position = divmod(self.index if index is None else index, len(self.offsets))
+        return self.start + cycle * self.period + self.offsets[position]
+
+    def delay(self, seconds):
+        """
+        Run the current tick again `seconds` from now and shift all following ticks,
+        must be called from callback of the task
+        """
+        self.start += self.clock() + seconds - self.deadline()
+
+    def _first_barrier(self, last) -> Optional[int]:
+        count = len(self.offsets)
+        indices = [self.index + (position - self.index) % count for position in self.barriers]
+        first = min(indices, default=None)
+        return first if first is not None and first <= last else None
+
+    def due(self, now):
+        """
+        Return indices of ticks to run now
+        """
+        cycle = int((now - self.start) // self.period)
+        position = bisect.bisect_right(self.offsets, now - self.start - cycle * self.period) - 1
+        last = max(cycle * len(self.offsets) + position, self.index)
+        if now - self.deadline() > self.tolerance:
+            self.late += 1
+        if last == self.index or self.policy == CATCH_UP:
+            return range(self.index, last + 1)
+        barrier = self._first_barrier(last)
+        if barrier is not None:
+            last = barrier
+        self.skipped += last - self.index
+        return range(last, last + 1)
+
+
+class Scheduler:
+    """
+    Thread which runs periodic tasks at absolute deadlines of time.monotonic:
+
+        task = default_scheduler().schedule(lambda index: print(index), period=0.5)
+        ...
+        default_scheduler().cancel(task)
+
+    Callbacks run in the thread of scheduler one after another, so they must not block for long:
+    slow callback delays ticks of other tasks, delayed ticks are handled by policy of their task.
+    After cancel() returns callback of the task doesn't run and isn't running.
+    `clock` replaces time.monotonic, e.g. by fake clock of tests.
+    """
+
+    def __init__(self, name="scheduler", clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running: Optional[Task] = None
+
+    def schedule(self, callback: Callable[[int], None], period, start=None, policy=SKIP, tolerance=None,
+                 offsets: Optional[Sequence[float]] = None, barriers: Sequence[int] = ()) -> Task:
+        """
+        Run callback(index) every period seconds from start (now by default), at every offset if they are given
+        """
+        task = Task(callback, period, self.clock() if start is None else start, policy, tolerance, offsets,
+                    barriers, self.clock)
+        with self._condition:
+            self._push(task)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return task
+
+    def cancel(self, task: Task):
+        """
+        Cancel task and wait for its running callback to return,
+        callback can cancel its own task (it doesn't wait in thread of scheduler)
+        """
+        with self._condition:
+            task.cancelled = True
+            self._condition.notify_all()
+            if threading.current_thread() is not self._thread:
+                while self._running is task:
+                    self._condition.wait()
+
+    def _push(self, task: Task):
+        heapq.heappush(self._heap, (task.deadline(), next(self._counter), task))
+
+    def _next(self) -> Task:
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, task = self._heap[0]
+                if task.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                timeout = deadline - self.clock()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+                heapq.heappop(self._heap)
+                return task
+
+    def _run(self):
+        while True:
+            task = self._next()
+            for index in task.due(self.clock()):
+                with self._condition:
+                    if task.cancelled:
+                        break
+                    self._running = task
+                task.index = index
+                start = task.start
+                try:
+                    task.callback(index)
+                except Exception:
+                    logging.root.exception("Error in scheduled task")
+                finally:
+                    with self._condition:
+                        self._running = None
+                        self._condition.notify_all()
+                if task.start != start:
+                    # Tick was delayed, it runs again at new deadline
+                    break
+                task.index = index + 1
+            with self._condition:
+                if not task.cancelled:
+                    self._push(task)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> Scheduler:
+    """
+    Return scheduler shared by all generators, its thread is started by the first task
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Scheduler()
+        return _default
@@ -0,0 +1,416 @@
+import asyncio
+import itertools
+import logging
+import signal
+from typing import Callable, List, Optional
+
+from hv.hv_device import HVDevice, Transaction
+from hv.protocol import ReadError
+
+"""
+SCPI-like command set, short and long forms of mnemonics are accepted, optional nodes are in brackets:
+
+    *IDN?, *RST, *CLS, *OPC?
+    SYSTem:ERRor[:NEXT]?
+    INSTrument:CATalog?, INSTrument:NSELect <n>, INSTrument:NSELect?      (devices are numbered from 1)
+    [SOURce:]VOLTage[:LEVel] <V>|MIN|MAX, [SOURce:]VOLTage[:LEVel]?
+    [SOURce:]CURRent[:LEVel] <μA or mA>|MIN|MAX, [SOURce:]CURRent[:LEVel]?
+    OUTPut[:STATe] ON|OFF|1|0, OUTPut[:STATe]?
+    MEASure[:SCALar]:VOLTage[:DC]?, MEASure[:SCALar]:CURRent[:DC]?, MEASure[:SCALar]?   (voltage,current)
+
+Commands of one line are separated by ";", relative header continues path of the previous header,
+e.g. "MEAS:VOLT?;CURR?". Replies of queries of one line are joined by ";" and terminated by "\\n".
+"""
+
+
+class ScpiError(Exception):
+    def __init__(self, code, message):
+        super(ScpiError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return '{},"{}"'.format(self.code, self.message)
+
+
+UNDEFINED_HEADER = (-113, "Undefined header")
+DATA_TYPE_ERROR = (-104, "Data type error")
+MISSING_PARAMETER = (-109, "Missing parameter")
+DATA_OUT_OF_RANGE = (-222, "Data out of range")
+HARDWARE_ERROR = (-240, "Hardware error")
+QUEUE_OVERFLOW = (-350, "Queue overflow")
+
+NOT_A_NUMBER = "9.91E+37"
+
+
+class _Node:
+    def __init__(self, mnemonic):
+        self.optional = mnemonic.startswith("[")
+        mnemonic = mnemonic.strip("[]")
+        self.long = mnemonic.upper()
+        self.short = "".join(c for c in mnemonic if not c.islower())
+
+    def match(self, token):
+        return token == self.short or token == self.long
+
+
+def _compile(pattern) -> List[List[_Node]]:
+    """
+    Return all variants of header pattern without and with optional nodes
+    """
+    nodes = [_Node(mnemonic) for mnemonic in pattern.replace("[:", ":[").replace(":]", "]:").split(":") if mnemonic]
+    optional = [node for node in nodes if node.optional]
+    variants = []
+    for mask in itertools.product([False, True], repeat=len(optional)):
+        skipped = {id(node) for node, keep in zip(optional, mask) if not keep}
+        variants.append([node for node in nodes if id(node) not in skipped])
+    return variants
+
+
+class ScpiDevice:
+    """
+    Device with state of SCPI instrument: setpoints and output state.
+    When output is on, new setpoint is applied to device immediately.
+    """
+
+    def __init__(self, device: HVDevice):
+        self.device = device
+        self.voltage = 0.0
+        self.current = device.data.current_max
+        self.output = False
+
+
+class ScpiSession:
+    """
+    State of one connection: selected device, error queue and batch of device commands.
+
+    All commands of received lines are collected into one Transaction of HVDevice,
+    so batch of setpoints and queries is written in single USB transfer.
+    Repeated measurement queries without commands between them share one GET request.
+    """
+    MAX_ERRORS = 32
+
+    def __init__(self, devices: List[ScpiDevice]):
+        self.devices = devices
+        self.selected = 0
+        self.errors: List[ScpiError] = []
+        self._transaction: Optional[Transaction] = None
+        self._last_get = None
+        self.commands = []
+        for pattern, handler in [
+            ("*IDN?", self.identify), ("*RST", self.reset), ("*CLS", self.clear), ("*OPC?", self.complete),
+            ("SYSTem:ERRor[:NEXT]?", self.next_error),
+            ("INSTrument:CATalog?", self.catalog), ("INSTrument:NSELect", self.select),
+            ("INSTrument:NSELect?", self.selection),
+            ("[SOURce]:VOLTage[:LEVel]", self.set_voltage), ("[SOURce]:VOLTage[:LEVel]?", self.voltage),
+            ("[SOURce]:CURRent[:LEVel]", self.set_current), ("[SOURce]:CURRent[:LEVel]?", self.current),
+            ("OUTPut[:STATe]", self.set_output), ("OUTPut[:STATe]?", self.output),
+            ("MEASure[:SCALar]:VOLTage[:DC]?", self.measure_voltage),
+            ("MEASure[:SCALar]:CURRent[:DC]?", self.measure_current),
+            ("MEASure[:SCALar]?", self.measure),
+        ]:
+            query = pattern.endswith("?")
+            for variant in _compile(pattern.rstrip("?")):
+                self.commands.append((variant, query, handler))
+
+    @property
+    def instrument(self) -> ScpiDevice:
+        return self.devices[self.selected]
+
+    def push_error(self, error: ScpiError):
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(error)
+        else:
+            self.errors[-1] = ScpiError(*QUEUE_OVERFLOW)
+
+    # Parsing
+
+    def _resolve(self, tokens, query) -> Callable:
+        for variant, is_query, handler in self.commands:
+            if is_query == query and len(variant) == len(tokens) and all(
+                    node.match(token) for node, token in zip(variant, tokens)):
+                return handler
+        raise ScpiError(*UNDEFINED_HEADER)
+
+    @staticmethod
+    def parse_line(line):
+        """
+        Generate header tokens, argument and query flag of every command of line
+        """
+        path = []
+        for command in line.split(";"):
+            command = command.strip()
+            if not command:
+                continue
+            header, _, argument = command.partition(" ")
+            query = header.endswith("?")
+            header = header.rstrip("?").upper()
+            if header.startswith("*"):
+                tokens = [header]
+            elif header.startswith(":"):
+                tokens = header[1:].split(":")
+            else:
+                tokens = path + header.split(":")
+            if not header.startswith("*"):
+                path = tokens[:-1]
+            yield tokens, argument.strip(), query
+
+    # Batch of device commands
+
+    def transaction(self) -> Transaction:
+        if self._transaction is None or self._transaction.device is not self.instrument.device:
+            self.commit()
+            self._transaction = self.instrument.device.transaction()
+        return self._transaction
+
+    def _command(self):
+        self._last_get = None
+        return self.transaction()
+
+    def _get(self):
+        """
+        Return transaction and index of reply of GET command
+        """
+        transaction = self.transaction()
+        if self._last_get is None or self._last_get[0] is not transaction:
+            transaction.get_IU()
+            self._last_get = (transaction, transaction.replies - 1)
+        return self._last_get
+
+    def commit(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            self._last_get = None
+            if transaction.replies == 0 and not transaction.frames:
+                return
+            try:
+                transaction.commit()
+            except ReadError as e:
+                logging.root.warning(str(e))
+                transaction.results = []
+                self.push_error(ScpiError(HARDWARE_ERROR[0], str(e)))
+                return
+            if not transaction.device.is_open:
+                self.push_error(ScpiError(*HARDWARE_ERROR))
+
+    @staticmethod
+    def _reading(transaction: Transaction, index):
+        if index < len(transaction.results):
+            return transaction.results[index]
+        return None
+
+    def execute(self, lines: List[str]) -> str:
+        """
+        Execute lines of commands and return replies
+        """
+        replies = []
+        for line in lines:
+            items = []
+            for tokens, argument, query in self.parse_line(line):
+                try:
+                    handler = self._resolve(tokens, query)
+                    result = handler() if query else handler(argument)
+                except ScpiError as e:
+                    self.push_error(e)
+                    result = NOT_A_NUMBER
+                if query:
+                    items.append(result)
+            replies.append(items)
+        self.commit()
+        lines = [";".join(item() if callable(item) else item for item in items) for items in replies if items]
+        return "".join(line + "\n" for line in lines)
+
+    # Arguments
+
+    @staticmethod
+    def _number(argument, minimum, maximum):
+        if not argument:
+            raise ScpiError(*MISSING_PARAMETER)
+        keyword = argument.upper()
+        if keyword in ("MIN", "MINIMUM"):
+            return minimum
+        if keyword in ("MAX", "MAXIMUM"):
+            return maximum
+        try:
+            value = float(argument)
+        except ValueError:
+            raise ScpiError(*DATA_TYPE_ERROR)
+        if not minimum <= value <= maximum:
+            raise ScpiError(*DATA_OUT_OF_RANGE)
+        return value
+
+    @staticmethod
+    def _boolean(argument):
+        keyword = argument.upper()
+        if keyword in ("ON", "1"):
+            return True
+        if keyword in ("OFF", "0"):
+            return False
+        if not argument:
+            raise ScpiError(*MISSING_PARAMETER)
+        raise ScpiError(*DATA_TYPE_ERROR)
+
+    @staticmethod
+    def _format(value):
+        return "{:.6E}".format(value)
+
+    # Commands
+
+    def identify(self):
+        return "NPM Group,HV-controls,{},0".format(self.instrument.device)
+
+    def reset(self, argument):
+        instrument = self.instrument
+        self._command().reset_value()
+        instrument.output = False
+        instrument.voltage = 0.0
+        instrument.current = instrument.device.data.current_max
+
+    def clear(self, argument):
+        self.errors.clear()
+
+    def complete(self):
+        return "1"
+
+    def next_error(self):
+        if self.errors:
+            return str(self.errors.pop(0))
+        return '0,"No error"'
+
+    def catalog(self):
+        return ",".join('"{}"'.format(instrument.device) for instrument in self.devices)
+
+    def select(self, argument):
+        index = int(self._number(argument, 1, len(self.devices)))
+        self.selected = index - 1
+
+    def selection(self):
+        return str(self.selected + 1)
+
+    def _apply(self):
+        instrument = self.instrument
+        if instrument.output:
+            self._command().set_value(instrument.voltage, instrument.current).update_value()
+
+    def set_voltage(self, argument):
+        data = self.instrument.device.data
+        self.instrument.voltage = self._number(argument, 0.0, data.voltage_max)
+        self._apply()
+
+    def voltage(self):
+        return self._format(self.instrument.voltage)
+
+    def set_current(self, argument):
+        data = self.instrument.device.data
+        self.instrument.current = self._number(argument, 0.0, data.current_max)
+        self._apply()
+
+    def current(self):
+        return self._format(self.instrument.current)
+
+    def set_output(self, argument):
+        state = self._boolean(argument)
+        self.instrument.output = state
+        if state:
+            self._apply()
+        else:
+            self._command().reset_value()
+
+    def output(self):
+        return "1" if self.instrument.output else "0"
+
+    def _measure(self, formatter):
+        transaction, index = self._get()
+
+        def reply():
+            reading = self._reading(transaction, index)
+            return formatter(reading) if reading is not None else NOT_A_NUMBER
+
+        return reply
+
+    def measure_voltage(self):
+        return self._measure(lambda reading: self._format(reading.voltage))
+
+    def measure_current(self):
+        return self._measure(lambda reading: self._format(reading.current))
+
+    def measure(self):
+        return self._measure(lambda reading: "{},{}".format(self._format(reading.voltage),
+                                                            self._format(reading.current)))
+
+
+class ScpiServer:
+    """
+    TCP server of SCPI-like commands, see module description.
+
+    Connection is persistent and commands can be pipelined: all complete lines which were received
+    are executed as one batch, replies are written in order of queries.
+    Batches are executed in thread pool, so slow device doesn't block other connections.
+    """
+    HOST = "127.0.0.1"
+    PORT = 5025  # Standard port of SCPI sockets
+    READ_SIZE = 65536
+    MAX_LINE = 65536
+
+    def __init__(self, devices: List[HVDevice], host=HOST, port=PORT):
+        self.devices = [ScpiDevice(device) for device in devices]
+        self.host = host
+        self.port = port
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = ScpiSession(self.devices)
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername")
+        logging.root.info("SCPI client {} connected".format(peer))
+        buffer = b""
+        try:
+            while True:
+                data = await reader.read(self.READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                end = buffer.rfind(b"\n")
+                if end == -1:
+                    if len(buffer) > self.MAX_LINE:
+                        buffer = b""
+                        session.push_error(ScpiError(-223, "Too much data"))
+                    continue
+                lines = buffer[:end].decode("ascii", "replace").replace("\r", "").split("\n")
+                buffer = buffer[end + 1:]
+                reply = await loop.run_in_executor(None, session.execute, lines)
+                if reply:
+                    writer.write(reply.encode("ascii"))
+                    await writer.drain()
+        except ConnectionError as e:
+            logging.root.debug(str(e))
+        finally:
+            logging.root.info("SCPI client {} disconnected".format(peer))
+            writer.close()
+
+    async def serve(self):
+        """
+        Serve until SIGTERM or cancellation
+        """
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except NotImplementedError:
+            pass
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logging.root.info("Serve SCPI on {}:{}".format(self.host, self.port))
+        async with server:
+            await stop.wait()
+
+
+def run_server(devices: List[HVDevice], host=ScpiServer.HOST, port=ScpiServer.PORT, reset=True):
+    for device in devices:
+        device.open()
+    try:
+        asyncio.run(ScpiServer(devices, host, port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            if reset and device.is_open:
+                device.reset_value()
+            device.close()
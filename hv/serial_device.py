@@ -0,0 +1,157 @@
+import logging
+import os
+import pathlib
+from typing import Optional, Callable, List
+
+import serial
+from serial.tools import list_ports
+
+logger = logging.root
+
+
+class SerialDevice:
+    """
+    Transport through serial port of kernel driver (`ftdi_sio` on Linux, `/dev/ttyUSB*`) by pyserial.
+
+    Latency timer of FTDI chip (1-255 ms, 16 ms by default) is the longest time chip holds
+    received bytes before sending them to host, it is set by sysfs on open if LATENCY_TIMER is not None.
+    READ_CHUNK is the maximum size of single read of buffered bytes.
+    """
+
+    BAUDRATE = 38400
+    TIMEOUT = 0.2  # seconds
+    LATENCY_TIMER = None  # ms, None keeps setting of driver
+    READ_CHUNK = 512
+    FTDI_VENDOR_ID = 0x0403
+    PORTS = []  # (url, name) of ports given explicitly, they replace discovery
+
+    def __init__(self, url, name):
+        self.port = None
+        self.name = name
+        self.url = url
+
+    def __str__(self):
+        return "{}:{}".format(self.name, self.url)
+
+    @staticmethod
+    def configure(latency_timer=None, read_chunk=None, ports=None):
+        if latency_timer is not None:
+            if not 1 <= latency_timer <= 255:
+                raise ValueError("Latency timer must be from 1 to 255 ms")
+            SerialDevice.LATENCY_TIMER = latency_timer
+        if read_chunk is not None:
+            SerialDevice.READ_CHUNK = read_chunk
+        if ports is not None:
+            SerialDevice.PORTS = list(ports)
+
+    def open_port(self, url):
+        port = serial.serial_for_url(url, baudrate=self.BAUDRATE, bytesize=serial.EIGHTBITS,
+                                     parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                     timeout=self.TIMEOUT, do_not_open=True)
+        port.open()
+        return port
+
+    def open(self):
+        self.port = self.open_port(self.url)
+        if self.LATENCY_TIMER is not None:
+            self.set_latency_timer(self.LATENCY_TIMER)
+        logger.info("Open serial port for {}".format(self))
+
+    def set_latency_timer(self, value):
+        path = pathlib.Path("/sys/bus/usb-serial/devices", pathlib.Path(os.path.realpath(self.url)).name,
+                            "latency_timer")
+        try:
+            path.write_text(str(value))
+        except OSError as e:
+            logger.warning("Can't set latency timer of {}: {}".format(self, e))
+
+    def close(self):
+        self.port.close()
+        logger.info("Close serial port for {}".format(self))
+
+    def write(self, code: int, data: List[int] = None):
+        temp = bytes([code] + data) if data is not None else bytes([code])
+        self.port.write(temp)
+        logger.debug("Write {}".format(temp))
+
+    def write_frames(self, frames: bytes):
+        self.port.write(frames)
+        logger.debug("Write {}".format(frames))
+
+    def read(self, nbytes) -> List[int]:
+        s = self.port.read(nbytes)
+        logger.debug("Read {}".format(s))
+        return list(s)
+
+    def read_available(self) -> List[int]:
+        """
+        Read bytes which already received by port without waiting.
+        """
+        waiting = self.port.in_waiting
+        if waiting == 0:
+            return []
+        s = self.port.read(min(waiting, self.READ_CHUNK))
+        logger.debug("Read available {}".format(s))
+        return list(s)
+
+    @classmethod
+    def get_urls(cls, key: Optional[Callable] = None):
+        if cls.PORTS:
+            urls = cls.PORTS
+        else:
+            urls = [(port.device, port.product or port.description) for port in list_ports.comports()
+                    if port.vid == cls.FTDI_VENDOR_ID]
+        return filter(key, urls)
+
+    @classmethod
+    def find_all_device(cls, key: Optional[Callable] = None):
+        return [cls(url, name) for url, name in cls.get_urls(key)]
+
+    @classmethod
+    def find_new_device(cls, exist_dev: List["HVDevice"], key: Optional[Callable] = None):
+        exist = {getattr(dev.device, "url", None) for dev in exist_dev}
+        return [cls(url, name) for url, name in cls.get_urls(key) if url not in exist]
+
+
+class LoopbackDevice(SerialDevice):
+    """
+    Serial port on pseudo terminal for testing without hardware (Unix only).
+    Test plays the source on the other end `peer`, file descriptor of master side of terminal:
+
+        transports.select("loopback")
+        device = HVDevice.find_all_devices()[0]
+        device.open()
+        os.read(device.device.peer, 1)  # GET code
+        os.write(device.device.peer, reply)
+    """
+    NAMES = ["HT-60-30-P"]  # models of created devices
+
+    def __init__(self, url, name):
+        super(LoopbackDevice, self).__init__(url, name)
+        self.peer = None
+
+    @staticmethod
+    def configure(latency_timer=None, read_chunk=None, ports=None):
+        SerialDevice.configure(read_chunk=read_chunk)
+        if ports is not None:
+            LoopbackDevice.NAMES = [name for _, name in ports]
+
+    def open(self):
+        import pty
+        import tty
+        self.peer, slave = pty.openpty()
+        tty.setraw(slave)
+        try:
+            self.port = self.open_port(os.ttyname(slave))
+        finally:
+            os.close(slave)
+        logger.info("Open pseudo terminal {} for {}".format(self.port.port, self))
+
+    def close(self):
+        super(LoopbackDevice, self).close()
+        os.close(self.peer)
+        self.peer = None
+
+    @classmethod
+    def get_urls(cls, key: Optional[Callable] = None):
+        return filter(key, [("loop{}".format(index), name) for index, name in enumerate(cls.NAMES)])
@@ -0,0 +1,205 @@
+import dataclasses
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional, Callable, List
+
+from hv import protocol
+from hv.codec import CODE_MAX, DeviceCodec
+from hv.device_registry import DeviceData, load_registry
+
+logger = logging.root
+
+
+@dataclass
+class SimulationConfig:
+    """
+    Parameters of simulated sources and of their link.
+    Current limit works as in real source: if load needs more current than setpoint,
+    source switches to constant current mode and output voltage drops.
+    """
+    rise_time: float = 0.5  # seconds, output slew from zero to max voltage
+    load_resistance: float = 100.0  # MOhm
+    noise: float = 1.0  # standard deviation of ADC readings, codes
+    latency: float = 0.002  # seconds, from the end of request to the first byte of reply
+    jitter: float = 0.0005  # seconds, standard deviation of latency
+    seed: Optional[int] = None
+
+
+class SimulatedDevice:
+    """
+    Transport which plays Mantigora source, it speaks the byte protocol of real device:
+    SET (code and 4 bytes of DAC codes) stores setpoint, UPDATE applies it, RESET drops output to zero,
+    GET replies 5 bytes: current and voltage ADC codes (big-endian) and 0x0D.
+
+    Output follows setpoint with slew rate voltage_max / rise_time and current limit on load resistance.
+    Replies become readable after transmission time at BAUDRATE, latency and jitter of link.
+    """
+
+    BAUDRATE = protocol.BAUDRATE
+    BYTE_TIME = 10 / BAUDRATE  # seconds, 8N1
+    TIMEOUT = 0.2  # seconds, as timeout of serial port
+    COUNT = 1
+    MODELS = ["HT-60-30-P"]  # models of created devices, repeated cyclically
+    CONFIG = SimulationConfig()
+
+    def __init__(self, url, name, config: SimulationConfig = None):
+        self.url = url
+        self.name = name
+        self.config = self.CONFIG if config is None else config
+        self.data: DeviceData = load_registry().device(name)
+        if self.data is None:
+            raise ValueError("Unknown model {}".format(name))
+        self.codec = DeviceCodec(self.data)
+        # Devices with the same seed must not have the same noise
+        self.random = random.Random(None if self.config.seed is None else "{}:{}".format(self.config.seed, url))
+        self.slew_rate = self.data.voltage_max / self.config.rise_time if self.config.rise_time > 0 else float("inf")
+        # Current of load and feedback resistor in units of decoded current
+        units = 1.0 if self.data.current_units == "micro" else 1e-3
+        self.load_conductance = units / self.config.load_resistance
+        self.leakage = self.codec.leakage
+        self.is_open = False
+        self._clear()
+
+    def _clear(self):
+        self.pending = (0, 0)  # DAC codes of the last SET
+        self.target = 0.0  # V
+        self.limit = 0.0  # current limit, units of decoded current
+        self.output = 0.0  # V
+        self.updated = time.monotonic()
+        self._input = b""
+        self._replies = []  # [ready time, bytes]
+        self._busy = 0.0  # time when line to host is free
+
+    def __str__(self):
+        return "{}:{}".format(self.name, self.url)
+
+    @staticmethod
+    def configure(count=None, models=None, **options):
+        if count is not None:
+            SimulatedDevice.COUNT = count
+        if models:
+            registry = load_registry()
+            unknown = [name for name in models if registry.device(name) is None]
+            if unknown:
+                raise ValueError("Unknown models {}, available: {}".format(
+                    ", ".join(unknown), ", ".join(registry.names())))
+            SimulatedDevice.MODELS = list(models)
+        config = {key: value for key, value in options.items() if value is not None}
+        SimulatedDevice.CONFIG = dataclasses.replace(SimulatedDevice.CONFIG, **config)
+
+    def open(self):
+        self._clear()
+        self.is_open = True
+        logger.info("Open simulated device {}".format(self))
+
+    def close(self):
+        self.is_open = False
+        logger.info("Close simulated device {}".format(self))
+
+    def _advance(self, now):
+        """
+        Move output to target with slew rate and current limit up to time `now`
+        """
+        target = self.target
+        if self.load_conductance > 0:
+            target = min(target, self.limit / self.load_conductance)
+        step = self.slew_rate * max(now - self.updated, 0.0) if self.slew_rate != float("inf") else float("inf")
+        if abs(target - self.output) <= step:
+            self.output = target
+        else:
+            self.output += step if target > self.output else -step
+        self.updated = now
+
+    def _reading(self) -> bytes:
+        voltage = self.output
+        current = voltage * (self.load_conductance + self.leakage)
+        noise = self.config.noise
+        U = round(voltage / self.codec.voltage_unit + self.random.gauss(0, noise))
+        I = round(current / self.codec.current_unit + self.random.gauss(0, noise))
+        U = min(max(U, 0), CODE_MAX)
+        I = min(max(I, 0), CODE_MAX)
+        return bytes((I >> 8, I & 0xFF, U >> 8, U & 0xFF, protocol.TERMINATOR))
+
+    def _execute(self, code, data, now):
+        self._advance(now)
+        if code == protocol.SET_CODE:
+            self.pending = (data[0] | data[1] << 8, data[2] | data[3] << 8)
+        elif code == protocol.UPDATE_CODE:
+            U, I = self.pending
+            self.target = min(U / self.codec.voltage_scale, self.data.voltage_max)
+            self.limit = I * self.codec.current_unit
+        elif code == protocol.RESET_CODE:
+            self.target = 0.0
+        elif code == protocol.GET_CODE:
+            delay = max(self.random.gauss(self.config.latency, self.config.jitter), 0.0)
+            ready = max(now + delay, self._busy) + protocol.FRAME_SIZE * self.BYTE_TIME
+            self._busy = ready
+            self._replies.append([ready, self._reading()])
+
+    def write_frames(self, frames: bytes):
+        if not self.is_open:
+            raise IOError("Device {} is not open".format(self))
+        now = time.monotonic()
+        stream = self._input + bytes(frames)
+        position = 0
+        while position < len(stream):
+            code = stream[position]
+            size = 5 if code == protocol.SET_CODE else 1
+            if position + size > len(stream):
+                break
+            # Commands are executed when they are received completely
+            position += size
+            self._execute(code, stream[position - size + 1:position], now + position * self.BYTE_TIME)
+        self._input = stream[position:]
+
+    def write(self, code: int, data: List[int] = None):
+        self.write_frames(bytes([code] + data) if data is not None else bytes([code]))
+
+    def _take(self, nbytes, now) -> List[int]:
+        result = b""
+        while self._replies and len(result) < nbytes and self._replies[0][0] <= now:
+            ready, reply = self._replies[0]
+            taken = reply[:nbytes - len(result)]
+            result += taken
+            if len(taken) == len(reply):
+                self._replies.pop(0)
+            else:
+                self._replies[0][1] = reply[len(taken):]
+        return list(result)
+
+    def read(self, nbytes) -> List[int]:
+        """
+        Wait until nbytes of replies are received or timeout
+        """
+        deadline = time.monotonic() + self.TIMEOUT
+        result = []
+        while len(result) < nbytes:
+            now = time.monotonic()
+            result += self._take(nbytes - len(result), now)
+            if len(result) == nbytes or not self._replies or now >= deadline:
+                break
+            time.sleep(max(min(self._replies[0][0], deadline) - now, 0))
+        if len(result) < nbytes and not self._replies:
+            # Nothing more will come, real port waits until timeout
+            time.sleep(max(deadline - time.monotonic(), 0))
+        return result
+
+    def read_available(self) -> List[int]:
+        return self._take(protocol.FRAME_SIZE * len(self._replies), time.monotonic())
+
+    @staticmethod
+    def get_urls(key: Optional[Callable] = None):
+        models = SimulatedDevice.MODELS
+        urls = [("sim://{}".format(index), models[index % len(models)]) for index in range(SimulatedDevice.COUNT)]
+        return filter(key, urls)
+
+    @staticmethod
+    def find_all_device(key: Optional[Callable] = None):
+        return [SimulatedDevice(url, name) for url, name in SimulatedDevice.get_urls(key)]
+
+    @staticmethod
+    def find_new_device(exist_dev, key: Optional[Callable] = None):
+        exist = {getattr(dev.device, "url", None) for dev in exist_dev}
+        return [SimulatedDevice(url, name) for url, name in SimulatedDevice.get_urls(key) if url not in exist]
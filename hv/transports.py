@@ -0,0 +1,78 @@
+import importlib
+import logging
+from typing import Callable, Dict, List, Union
+
+"""
+Registry of transports between HVDevice and hardware.
+
+Transport is a class with interface of PyFTDIDevice: instance has `name` (model of source), `url`,
+open, close, write, write_frames, read and read_available; class has static methods
+find_all_device(key) and find_new_device(old, key) and optional `configure(**options)`.
+Backends are imported only when they are selected, so missing driver of one backend doesn't break others:
+
+    transports.register("my-pty", "my_package.pty_device:PtyDevice")
+    transports.select("my-pty")
+    devices = HVDevice.find_all_devices()
+"""
+DEFAULT = "pyftdi"
+
+_loaders: Dict[str, Union[str, Callable]] = {
+    "pyftdi": "hv.ftdi_device:PyFTDIDevice",
+    "serial": "hv.serial_device:SerialDevice",
+    "loopback": "hv.serial_device:LoopbackDevice",
+    "ftd2xx": "hv.ftd2xx_device:FTD2XXDevice",
+    "simulator": "hv.simulator:SimulatedDevice",
+}
+_classes = {}
+_selected = DEFAULT
+
+
+def register(name, loader: Union[str, Callable]):
+    """
+    Register transport. Loader is "module:Class" or function which returns class of transport.
+    """
+    _loaders[name] = loader
+    _classes.pop(name, None)
+
+
+def names() -> List[str]:
+    return list(_loaders.keys())
+
+
+def load(name):
+    """
+    Import and return class of transport
+    """
+    if name not in _classes:
+        if name not in _loaders:
+            raise ValueError("Unknown transport {}, available: {}".format(name, ", ".join(names())))
+        loader = _loaders[name]
+        if isinstance(loader, str):
+            module, attribute = loader.split(":")
+            _classes[name] = getattr(importlib.import_module(module), attribute)
+        else:
+            _classes[name] = loader()
+    return _classes[name]
+
+
+def select(name, **options):
+    """
+    Use transport `name` for discovery of devices, options are passed to `configure` of transport
+    """
+    global _selected
+    transport = load(name)
+    options = {key: value for key, value in options.items() if value is not None}
+    if options:
+        if not hasattr(transport, "configure"):
+            raise ValueError("Transport {} has no options".format(name))
+        transport.configure(**options)
+    _selected = name
+    logging.root.debug("Use transport {}".format(name))
+    return transport
+
+
+def selected():
+    """
+    Return class of selected transport, it is imported on the first call
+    """
+    return load(_selected)
@@ -44,8 +44,9 @@ class HVBasicSetup(QWidget):
 
         def apply():
             if self.device.is_open:
-                setup()
-                self.device.update_value()
+                with self.device.transaction() as transaction:
+                    transaction.set_value(voltage_input.value(), current_input.value())
+                    transaction.update_value()
 
         setup_and_turn_on = QPushButton("Setup&&Turn on")
         setup_and_turn_on.clicked.connect(apply)
@@ -12,9 +12,9 @@ class HVCentralWidget(QTabWidget):
         self.tabCloseRequested.connect(self.close_tab)
 
     def open_device(self, item: HVItem):
+        item.device.open()
         widget = HVWidget(self, item)
         self.addTab(widget, str(item.device))
-        item.device.open()
 
     def close_tab(self, index):
         widget = self.widget(index)
@@ -4,7 +4,7 @@ import logging
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QListWidget, QPushButton, QLabel
 
-from hv.hv_device import create_test_device, HVDevice
+from hv.hv_device import HVDevice
 from hv.ui.widgets import HVItem
 
 
@@ -16,11 +16,6 @@ class DeviceList(QDockWidget):
     def timerEvent(self, a0: 'QTimerEvent') -> None:
         self.refresh()
 
-    def add_fake_device(self):
-        logging.root.info("Working with fake device")
-        fake_device = create_test_device()
-        HVItem(self.device_list, fake_device)
-
     def init_UI(self, args):
         widget = QWidget()
         vbox = QVBoxLayout(widget)
@@ -29,9 +24,8 @@ class DeviceList(QDockWidget):
         self.device_list.setMovement(0)
 
         if args.fake_device:
-            self.add_fake_device()
-        else:
-            self.init_model()
+            logging.root.info("Working with {} simulated devices".format(args.fake_count))
+        self.init_model()
 
         self.refresh_btn = QPushButton("Refresh\ndevice list")
         self.refresh_btn.clicked.connect(self.refresh)
@@ -1,35 +1,106 @@
+import logging
 import math
+from typing import Optional
 
 from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtWidgets import QWidget
 
 from hv.hv_device import HVDevice
+from hv.protocol import ReadError
+from hv.scheduler import SKIP, Task, default_scheduler
+from hv.waveform import Waveform
 
 class Generator(QObject):
+    """
+    Generator changes setpoints of device by ticks of shared Scheduler at absolute deadlines,
+    so waveform doesn't drift on long runs. Ticks run in thread of scheduler,
+    late ticks are handled by LATE_POLICY (see hv.scheduler.Task).
+
+    Generators with fixed waveform compile it ahead of time (see hv.waveform) and play it,
+    tick of playback writes pre-encoded transfer of its row.
+    """
     NAME = ""
     abort_signal = pyqtSignal()
 
     MIN_PERIOD = 1.0
     MAX_PERIOD = MIN_PERIOD*1_000
     MIN_TICK = 0.5
+    LATE_POLICY = SKIP
 
     def __init__(self, device: HVDevice):
         super(Generator, self).__init__()
         self.device = device
         self.voltage_accuracy = self.device.data.voltage_step
+        self.tasks = []
+        self.waveform: Optional[Waveform] = None
+        self.playback: Optional[Task] = None
 
     def start(self):
         pass
 
     def stop(self):
-        pass
+        self.cancel()
+
+    def compile(self) -> Optional[Waveform]:
+        """
+        Return compiled waveform of current parameters, None if generator computes setpoints at runtime
+        """
+        return None
+
+    def schedule(self, callback, period, start=None, offsets=None, barriers=()) -> Task:
+        task = default_scheduler().schedule(callback, period, start, self.LATE_POLICY, offsets=offsets,
+                                            barriers=barriers)
+        self.tasks.append(task)
+        return task
+
+    def play(self, waveform: Waveform, start=None):
+        """
+        Play waveform cyclically from start, every row is tick at its time.
+        Late ticks don't skip waits and setpoints they wait for
+        """
+        self.waveform = waveform
+        self.playback = self.schedule(self._play_row, waveform.period, start, waveform.times, waveform.barriers)
+
+    def _play_row(self, index):
+        if self.playback.cancelled:
+            return
+        if not self.device.is_open:
+            self.abort()
+            return
+        row = index % len(self.waveform)
+        frames = self.waveform.frames[row]
+        if frames:
+            self.device.execute(frames, 0)
+            return
+        try:
+            I, U = self.device.get_IU()
+        except ReadError:
+            U = None
+        if U is None or not self.waveform.reached(row, U):
+            self.playback.delay(self.waveform.poll)
+
+    def cancel(self):
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            default_scheduler().cancel(task)
+            if task.late or task.skipped:
+                logging.root.info("Generator {}: {} late ticks, {} skipped".format(self.NAME, task.late,
+                                                                                   task.skipped))
+
+    def abort(self):
+        """
+        Stop ticks and ask widget to turn generator off
+        """
+        self.cancel()
+        self.abort_signal.emit()
 
     def setup(self, voltage=0.0, current=0.0):
         if math.isclose(voltage, 0.0, abs_tol=self.voltage_accuracy):
             self.device.reset_value()
         else:
-            self.device.set_value(voltage, current)
-            self.device.update_value()
+            with self.device.transaction() as transaction:
+                transaction.set_value(voltage, current)
+                transaction.update_value()
 
 
 class GeneratorWidget(QWidget):
@@ -48,4 +119,4 @@ class GeneratorWidget(QWidget):
         self.setDisabled(False)
 
     def export_settings(self) -> dict:
-        return None
\ No newline at end of file
+        return None
@@ -1,7 +1,6 @@
-import itertools
 import pathlib
+import time
 
-from PyQt5 import QtCore
 from PyQt5.QtCore import QSettings
 from PyQt5.QtWidgets import QVBoxLayout, QLineEdit, QHBoxLayout, QPushButton, QFileDialog
 
@@ -38,14 +37,11 @@ class CustomGenerator(Generator):
             self.period = user.PERIOD
             self.MIN_TICK = user.TIME_STEP
             self.func = user.generator
-            self.times = itertools.cycle([self.MIN_PERIOD*i for i in range(int(self.period/self.MIN_PERIOD))])
-            self.timer = self.startTimer(self.MIN_TICK*1000, QtCore.Qt.PreciseTimer)
+            self.schedule(self.tick, self.MIN_TICK, time.monotonic() + self.MIN_TICK)
 
-    def stop(self):
-        self.killTimer(self.timer)
-
-    def timerEvent(self, a0: 'QTimerEvent') -> None:
-        U, I = self.func(next(self.times))
+    def tick(self, index):
+        # Time in period is computed from index of tick, so it doesn't accumulate errors
+        U, I = self.func((index * self.MIN_TICK) % self.period)
         if self.device.is_open:
             if self.device.data.current_units == "milli":
                 I = I / 1000
@@ -54,7 +50,7 @@ class CustomGenerator(Generator):
                 self._last_current = I
                 self._last_voltage = U
         else:
-            self.abort_signal.emit()
+            self.abort()
 
 
 class CustomGeneratorWidget(GeneratorWidget):
@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import QHBoxLayout, QLabel, QDoubleSpinBox, QVBoxLayout
 
 from hv.hv_device import HVDevice
 from hv.ui.generators.base import Generator, GeneratorWidget
-from hv.ui.generators.widgets import add_voltage_current_controls
+from hv.ui.generators.widgets import add_voltage_current_controls, add_preview_button
 from hv.ui.regulator import HVRegulator
 
 @dataclass
@@ -82,4 +82,5 @@ class ScanningWidget(GeneratorWidget):
     def init_UI(self):
         vbox = QVBoxLayout(self)
         add_voltage_current_controls(self, vbox, self.generator)
-        self._create_time_parameters(vbox)
\ No newline at end of file
+        self._create_time_parameters(vbox)
+        add_preview_button(self, vbox, self.generator)
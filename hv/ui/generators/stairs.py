@@ -1,13 +1,13 @@
 import dataclasses
-import math
+import time
 from dataclasses import dataclass
 
-from PyQt5 import QtCore
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QDoubleSpinBox, QHBoxLayout
 
+from hv import waveform
 from hv.hv_device import HVDevice
 from hv.ui.generators import Generator, GeneratorWidget
-from hv.ui.generators.widgets import add_voltage_current_controls
+from hv.ui.generators.widgets import add_voltage_current_controls, add_preview_button
 
 
 @dataclass
@@ -30,32 +30,16 @@ class Stairs(Generator):
         else:
             self.parameters = StairsParameters(**parameters)
 
+    def compile(self):
+        parameters = self.parameters
+        return waveform.stairs(self.device.codec, self.voltage_accuracy, parameters.time_step,
+                               parameters.voltage_step, parameters.max_voltage, parameters.min_voltage,
+                               parameters.current)
+
     def start(self):
-        self.current_voltage = self.parameters.min_voltage
-        self.up = False
+        compiled = self.compile()
         self.setup(self.parameters.min_voltage, self.parameters.current)
-        self.timer_id  = self.startTimer(self.parameters.time_step*1000, QtCore.Qt.PreciseTimer)
-
-    def stop(self):
-        self.killTimer(self.timer_id)
-
-    def timerEvent(self, a0: 'QTimerEvent') -> None:
-        if self.device.is_open:
-            if self.up:
-                self.current_voltage += self.parameters.voltage_step
-                if self.current_voltage > self.parameters.max_voltage:
-                    self.up = False
-                    self.setup(self.parameters.min_voltage, self.parameters.current)
-                else:
-                    self.setup(self.current_voltage, self.parameters.current)
-            else:
-                I, U = self.device.get_IU()
-                if math.isclose(U, self.parameters.min_voltage, abs_tol=self.device.data.voltage_step):
-                    self.up = True
-                    self.current_voltage = self.parameters.min_voltage
-
-        else:
-            self.abort_signal.emit()
+        self.play(compiled, time.monotonic() + self.parameters.time_step)
 
 
 class StairsWidget(GeneratorWidget):
@@ -104,4 +88,5 @@ class StairsWidget(GeneratorWidget):
     def init_UI(self):
         vbox = QVBoxLayout(self)
         add_voltage_current_controls(self, vbox, self.generator)
-        self._create_stairs_parameters(vbox)
\ No newline at end of file
+        self._create_stairs_parameters(vbox)
+        add_preview_button(self, vbox, self.generator)
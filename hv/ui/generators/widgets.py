@@ -1,3 +1,5 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton
+
 from hv.ui.regulator import HVRegulator
 
 
@@ -25,4 +27,46 @@ def add_voltage_current_controls(parent, layout, generator):
     layout.addWidget(min_voltage_input)
     layout.addWidget(max_voltage_input)
     layout.addWidget(current_input)
-    return 0
\ No newline at end of file
+    return 0
+
+
+class WaveformPreview(QDialog):
+    """
+    Plot of compiled waveform of generator, the same schedule is played by start
+    """
+    CYCLES = 2
+
+    def __init__(self, parent, generator):
+        super(WaveformPreview, self).__init__(parent)
+        self.generator = generator
+        self.setWindowTitle("Preview: {}".format(generator.NAME))
+        self.init_UI()
+
+    def init_UI(self):
+        from matplotlib.backends.backend_qt5agg import FigureCanvas
+        from matplotlib.figure import Figure
+        waveform = self.generator.compile()
+        vbox = QVBoxLayout(self)
+        waits = int((waveform.rows["wait"] != 0).sum())
+        text = "Period {:g} s, {} setpoints".format(waveform.period, len(waveform) - waits)
+        if waits:
+            text += ", {} waits for voltage (hold cycle until reached)".format(waits)
+        vbox.addWidget(QLabel(text))
+        canvas = FigureCanvas(Figure(figsize=(6, 3)))
+        vbox.addWidget(canvas)
+        axes = canvas.figure.add_subplot(111)
+        times, voltage, _ = waveform.profile(self.CYCLES)
+        axes.step(times, voltage, where="post")
+        for row in waveform.rows[waveform.rows["wait"] != 0]:
+            for cycle in range(self.CYCLES):
+                axes.axvline(row["time"] + cycle * waveform.period, color="gray", linestyle=":")
+        axes.set_xlabel("Time, s")
+        axes.set_ylabel("Voltage, V")
+        canvas.figure.tight_layout()
+
+
+def add_preview_button(parent, layout, generator):
+    preview_btn = QPushButton("Preview", parent)
+    preview_btn.clicked.connect(lambda: WaveformPreview(parent, generator).exec_())
+    layout.addWidget(preview_btn)
+    return preview_btn
@@ -1,25 +1,31 @@
-import time
+import logging
 
 from PyQt5 import QtCore
 from PyQt5.QtGui import QPalette
-from PyQt5.QtWidgets import QWidget, QCheckBox, QHBoxLayout, QVBoxLayout, QScrollArea
+from PyQt5.QtWidgets import QWidget, QCheckBox, QHBoxLayout, QVBoxLayout, QScrollArea, QLabel, QDoubleSpinBox
 
+from hv.acquisition import Acquisition
+from hv.live_feed import LiveFeedWriter
 from hv.ui.indicator import Indicator
-from hv.ui.oscilloscope import Oscilloscope
 from hv.ui.recorder import Recorder
 from hv.ui.source_setup import HVSourceSetup
-from hv.ui.utils import HVWidgetSettings
+from hv.ui.utils import HVWidgetSettings, live_feed_path
 from hv.ui.widgets import HVItem, AttentionLabel, ConnectionLostLabel
 
 
 class HVWidget(QWidget):
+    REFRESH_PERIOD = 100  # milliseconds
 
     def __init__(self, parent, item: HVItem):
         super().__init__(parent)
         self.item = item
         self.settings = HVWidgetSettings.load_settings(str(self.item.device), self.item.device.data)
+        self.acquisition = Acquisition(self.item.device, self.settings.poll_rate, self.settings.auto_poll_rate)
+        self.last_count = 0
+        self.live_feed = None
         self.init_UI()
-        self.timer_id = self.startTimer(2000, QtCore.Qt.PreciseTimer)
+        self.acquisition.start()
+        self.timer_id = self.startTimer(self.REFRESH_PERIOD, QtCore.Qt.PreciseTimer)
 
     def _create_reset_box(self):
         check_box = QCheckBox("Autoreset voltage by exit", self)
@@ -35,12 +41,71 @@ class HVWidget(QWidget):
         check_box.setChecked(self.settings.auto_reset)
         return check_box
 
+    def _create_live_feed_box(self):
+        check_box = QCheckBox("Live feed for other processes", self)
+        path = live_feed_path(str(self.item.device))
+        check_box.setToolTip(str(path))
+
+        def handler(state):
+            self.settings.live_feed = bool(state)
+            if state and self.live_feed is None:
+                self.live_feed = LiveFeedWriter(path)
+                logging.root.info("Live feed of {} is written to {}".format(self.item.device, path))
+            elif not state and self.live_feed is not None:
+                self.live_feed.close()
+                self.live_feed = None
+
+        check_box.stateChanged.connect(handler)
+        check_box.setChecked(self.settings.live_feed)
+        return check_box
+
+    def _create_poll_rate_box(self):
+        hbox = QHBoxLayout()
+        hbox.addWidget(QLabel("Poll rate, Hz:", self))
+        rate_input = QDoubleSpinBox(self)
+        rate_input.setDecimals(1)
+        rate_input.setMinimum(Acquisition.MIN_RATE)
+        rate_input.setMaximum(self.acquisition.max_rate)
+        rate_input.setSingleStep(Acquisition.MIN_RATE)
+        rate_input.setValue(self.settings.poll_rate)
+        hbox.addWidget(rate_input)
+        auto_box = QCheckBox("Auto", self)
+        hbox.addWidget(auto_box)
+        self.poll_status_label = QLabel(self)
+        hbox.addWidget(self.poll_status_label)
+
+        def rate(value):
+            self.settings.poll_rate = value
+            if not self.acquisition.auto_rate:
+                self.acquisition.change_rate(value)
+
+        rate_input.valueChanged.connect(rate)
+
+        def auto(state):
+            state = bool(state)
+            self.settings.auto_poll_rate = state
+            self.acquisition.auto_rate = state
+            rate_input.setDisabled(state)
+            if not state:
+                self.acquisition.change_rate(rate_input.value())
+
+        auto_box.stateChanged.connect(auto)
+        auto_box.setChecked(self.settings.auto_poll_rate)
+        return hbox
+
+    def _update_poll_status(self):
+        self.poll_status_label.setText("{:.1f} Hz, overruns: {}, errors: {}, resyncs: {}".format(
+            self.acquisition.rate, self.acquisition.overruns, self.acquisition.errors,
+            self.item.device.parser.resyncs))
+
     def init_UI(self):
+        # matplotlib is imported only when the first device tab is opened
+        from hv.ui.oscilloscope import Oscilloscope
         data = self.item.device.data
         self.attention_label = AttentionLabel(self)
         self.connection_loss_label = ConnectionLostLabel(self)
         self.indicator = Indicator(self, data.resolve_current_label())
-        self.record = Recorder(self, self.settings.last_file)
+        self.record = Recorder(self, self.settings)
         self.source_setup = HVSourceSetup(self, self.item.device, self.settings)
         self._oscilloscope = Oscilloscope(self, data.resolve_current_label())
 
@@ -51,6 +116,8 @@ class HVWidget(QWidget):
         self.controls_box.addWidget(self.attention_label)
         self.controls_box.addWidget(self._create_reset_box(), QtCore.Qt.AlignLeft)
         self.controls_box.addWidget(self.record)
+        self.controls_box.addWidget(self._create_live_feed_box(), QtCore.Qt.AlignLeft)
+        self.controls_box.addLayout(self._create_poll_rate_box())
         self.controls_box.addWidget(self.indicator, 11)
         self.controls_box.addWidget(self.source_setup)
         self.controls_box.addStretch(10)
@@ -59,34 +126,37 @@ class HVWidget(QWidget):
     def timerEvent(self, a0: 'QTimerEvent') -> None:
         if self.item.device.is_open:
             self.read_values()
+            self._update_poll_status()
         else:
-            # If loss connection to device, repeat connect
+            # If loss connection to device, acquisition thread repeat connect
             self.setDisabled(True)
             self.connection_loss_label.show()
-            self.item.device.open()
-            if self.item.device.is_open:
-                pass
-                # self.connection_loss_label.hide()
 
     def read_values(self):
-        if self.item.device.is_open:
-            I, U = self.item.device.get_IU()
-            t = time.time()
-            self.indicator.current_display.display(I)
-            self.indicator.voltage_display.display(U)
-            self._oscilloscope.update_data(t, U, I)
-            i = I
-            if self.item.device.data.current_units == "milli":
-                i = i * 1000
-            self.record.add_data(t, U, i)
+        self.last_count, times, voltage, current = self.acquisition.buffer.read_since(self.last_count)
+        if len(times) == 0:
+            return
+        self.indicator.current_display.display(current[-1])
+        self.indicator.voltage_display.display(voltage[-1])
+        self._oscilloscope.extend_data(times, voltage, current)
+        if self.item.device.data.current_units == "milli":
+            current = current * 1000
+        self.record.extend_data(times, voltage, current)
+        if self.live_feed is not None:
+            self.live_feed.write(times, voltage, current)
 
     def closeTab(self):
         self.killTimer(self.timer_id)
+        self.acquisition.stop()
+        self.read_values()
         if self.settings.auto_reset:
             if self.item.device.is_open:
                 self.item.device.reset_value()
         self.item.device.close()
-        self.settings.last_file = self.record.filename
+        self.record.close()
+        if self.live_feed is not None:
+            self.live_feed.close()
+            self.live_feed = None
         self.settings.last_generator = self.source_setup.generator.current_generator.generator.NAME
         self.settings.update_generators(self.source_setup.generator.current_generator.export_settings())
         HVWidgetSettings.save_settings(str(self.item.device), self.settings)
\ No newline at end of file
@@ -1,7 +1,7 @@
+import json
 import logging
 import pathlib
 
-import jinja2
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import QSettings, QSize
 from PyQt5.QtGui import QIcon
@@ -10,28 +10,54 @@ from PyQt5.QtGui import QFontDatabase
 
 from hv.ui.central_widget import HVCentralWidget
 from hv.ui.device_list import DeviceList, DeviceInfo
-from hv.ui.utils import QtLogging
+from hv.ui.utils import QtLogging, appdata
 from hv.ui.widgets import HVItem
 
 ROOT_PATH = pathlib.Path(__file__).absolute().parent
 RESOURCE_PATH = pathlib.Path(ROOT_PATH, "resources")
 
 
-def materials_theme():
-    fonts_path = RESOURCE_PATH / 'fonts' / 'roboto'
-    for font in fonts_path.iterdir():
-        if font.suffix == '.ttf':
-            QFontDatabase.addApplicationFont(str(font))
+FONTS = ["Roboto-Regular.ttf", "Roboto-Bold.ttf"]  # faces used by material.css
+THEME = {
+    "font_family": "Roboto",
+    "font_size": "12pt"
+}
+STYLESHEET_CACHE = "material.css"
+
 
-    loader = jinja2.FileSystemLoader(str(RESOURCE_PATH))
+def render_stylesheet(template, theme):
+    import jinja2
+    loader = jinja2.FileSystemLoader(str(template.parent))
     env = jinja2.Environment(autoescape=False, loader=loader)
-    stylesheet = env.get_template("material.css")
+    return env.get_template(template.name).render(**theme)
+
+
+def cached_stylesheet(template: pathlib.Path, theme):
+    """
+    Return rendered template, it is rendered again only if template or theme was changed
+    """
+    key = json.dumps({"mtime": template.stat().st_mtime_ns, "theme": theme}, sort_keys=True)
+    cache = appdata() / STYLESHEET_CACHE
+    try:
+        with cache.open("r", encoding="utf-8") as fin:
+            if fin.readline().rstrip("\n") == "/* " + key + " */":
+                return fin.read()
+    except OSError:
+        pass
+    stylesheet = render_stylesheet(template, theme)
+    try:
+        with cache.open("w", encoding="utf-8") as fout:
+            fout.write("/* " + key + " */\n" + stylesheet)
+    except OSError as e:
+        logging.root.debug("Can't cache stylesheet: {}".format(e))
+    return stylesheet
 
-    theme = {
-        "font_family": "Roboto",
-        "font_size" : "12pt"
-    }
-    return stylesheet.render(**theme)
+
+def materials_theme():
+    fonts_path = RESOURCE_PATH / 'fonts' / 'roboto'
+    for font in FONTS:
+        QFontDatabase.addApplicationFont(str(fonts_path / font))
+    return cached_stylesheet(RESOURCE_PATH / "material.css", THEME)
 
 
 class HVWindow(QMainWindow):
@@ -1,31 +1,47 @@
 import time
 
 import numpy as np
+from PyQt5 import QtCore
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog
 from matplotlib.backends.backend_qt5agg import (FigureCanvas,  NavigationToolbar2QT as NavigationToolbar)
 from matplotlib.figure import Figure
 
+from hv.history import HistoryStore
 from hv.ui.widgets import update_style
 
 
 class Oscilloscope(QWidget):
+    """
+    Plot of samples of the whole session.
+
+    In live mode plot follows the last N samples, zoom or pan switch plot to the selected time range.
+    Plot always get about one point per pixel from decimation pyramid of HistoryStore.
+    Plot is redrawn by timer not often than MAX_FPS. Axes are laid out once, only lines are blitted
+    over cached background. Full redraw happens only if data leave current limits of axes.
+    """
     N = 300
+    MAX_FPS = 10
+    MARGIN = 0.1  # Free space around data on rescale, part of data range
 
     def __init__(self, parent, current_units):
         super(Oscilloscope, self).__init__(parent)
         self.current_units = current_units
         self.turn_on = True
+        self._dirty = False
+        self._full_redraw = False
+        self._background = None
+        self.follow = True
+        self._setting_limits = False
         self.init_data()
         self.init_UI()
+        self.timer_id = self.startTimer(int(1000 / self.MAX_FPS), QtCore.Qt.CoarseTimer)
 
     def init_data(self):
         self.init_time = time.time()
-        self.times = list(np.linspace(self.init_time - self.N, self.init_time, self.N, endpoint=True))
-        self.voltage = [0 for i in self.times]
-        self.current = [0 for i in self.times]
+        self.history = HistoryStore()
 
     def init_axes(self, dynamic_canvas):
-        self._voltage_ax, self._current_ax = dynamic_canvas.figure.subplots(2, 1)
+        self._voltage_ax, self._current_ax = dynamic_canvas.figure.subplots(2, 1, sharex=True)
         self._voltage_ax.set_ylabel("Voltage, kV", fontsize = 16)
         self._current_ax.set_xlabel("Time, s", fontsize = 16)
         self._current_ax.set_ylabel("Current, {}".format(self.current_units), fontsize = 16)
@@ -33,10 +49,13 @@ class Oscilloscope(QWidget):
             axes.grid(True)
             axes.minorticks_on()
             axes.tick_params(axis="y",which="both", right=True, labelright=True)
-        self._voltage_line = self._voltage_ax.plot(np.asarray(self.times) - self.init_time, self.voltage)[0]
-        self._current_line = self._current_ax.plot(np.asarray(self.times) - self.init_time, self.current)[0]
+        self._voltage_line = self._voltage_ax.plot([], [], animated=True)[0]
+        self._current_line = self._current_ax.plot([], [], animated=True)[0]
         self._figure.tight_layout()
-
+        dynamic_canvas.mpl_connect("draw_event", self._on_draw)
+        dynamic_canvas.mpl_connect("resize_event", self._on_resize)
+        for axes in [self._voltage_ax, self._current_ax]:
+            axes.callbacks.connect("xlim_changed", self._on_xlim_changed)
 
     def init_UI(self):
         vbox = QVBoxLayout(self)
@@ -46,9 +65,13 @@ class Oscilloscope(QWidget):
         vbox.addLayout(hbox)
         hbox.addWidget(NavigationToolbar(dynamic_canvas, self))
         hbox.addStretch()
+        live_btn = QPushButton("Live")
+        session_btn = QPushButton("Session")
         stop_btn = QPushButton("Stop")
         save_btn = QPushButton("Save buffer")
         stop_btn.setProperty("turn_on", self.turn_on)
+        hbox.addWidget(live_btn)
+        hbox.addWidget(session_btn)
         hbox.addWidget(stop_btn)
         hbox.addWidget(save_btn)
         vbox.addWidget(dynamic_canvas)
@@ -65,33 +88,132 @@ class Oscilloscope(QWidget):
 
         stop_btn.clicked.connect(turn)
 
+        def live():
+            self.follow = True
+            self._update_canvas(full=True)
+
+        live_btn.clicked.connect(live)
+
+        def session():
+            if len(self.history) != 0:
+                self.follow = False
+                start, stop = self.history.time_range()
+                self._set_xlim(start - self.init_time, stop - self.init_time)
+                self._update_canvas(full=True)
+
+        session_btn.clicked.connect(session)
+
         def save():
             name = QFileDialog.getSaveFileName(self, "Save oscilloscope buffer.")[0]
             if name is not None and name != "":
+                # Visible time range in full resolution
+                x_min, x_max = self._voltage_ax.get_xlim()
+                times, voltage, current = self.history.raw(x_min + self.init_time, x_max + self.init_time)
                 with open(name, "w") as fout:
                     fout.write('"{}","{}","{}"\n'.format("Unix time, s", "Voltage, kV", "Current, {}".format(self.current_units)))
-                    for time, U, I in zip(self.times, self.voltage, self.current):
+                    for time, U, I in zip(times.tolist(), voltage.tolist(), current.tolist()):
                         fout.write("{},{},{}\n".format(time, U, I))
 
         save_btn.clicked.connect(save)
 
     def update_data(self, time, U, I):
+        self.extend_data([time], [U], [I])
+
+    def extend_data(self, times, U, I):
         if self.turn_on:
-            self.times.pop(0)
-            self.voltage.pop(0)
-            self.current.pop(0)
-            self.times.append(time)
-            self.voltage.append(U/1000) # to kilovolts
-            self.current.append(I)
-            self._update_canvas()
-
-    def _update_axes(self, line, axes, x0, x, y):
-        line.set_data(np.asarray(x) - x0, np.asarray(y))
-        axes.relim()
-        axes.autoscale()
-
-    def _update_canvas(self):
-        self._update_axes(self._voltage_line, self._voltage_ax, self.init_time, self.times, self.voltage)
-        self._update_axes(self._current_line, self._current_ax, self.init_time, self.times, self.current)
+            self.history.extend(times, np.asarray(U) / 1000, I) # to kilovolts
+            self._dirty = True
+
+    def timerEvent(self, a0: 'QTimerEvent') -> None:
+        if self._dirty and self.isVisible():
+            self._update_canvas(self._full_redraw)
+            self._dirty = False
+            self._full_redraw = False
+
+    def _on_draw(self, event):
+        self._background = self._figure.canvas.copy_from_bbox(self._figure.bbox)
+        self._draw_lines()
+
+    def _on_resize(self, event):
         self._figure.tight_layout()
-        self._figure.canvas.draw()
\ No newline at end of file
+        self._dirty = True
+
+    def _on_xlim_changed(self, axes):
+        if not self._setting_limits:
+            # User zoom or pan plot
+            self.follow = False
+            self._dirty = True
+            self._full_redraw = True
+
+    def _draw_lines(self):
+        self._voltage_ax.draw_artist(self._voltage_line)
+        self._current_ax.draw_artist(self._current_line)
+
+    @staticmethod
+    def _fit_limits(low, high, margin):
+        delta = (high - low) * margin
+        if delta == 0:
+            delta = max(abs(high) * margin, margin)
+        return low - delta, high + delta
+
+    def _set_xlim(self, x_min, x_max):
+        self._setting_limits = True
+        try:
+            self._voltage_ax.set_xlim(x_min, x_max)
+        finally:
+            self._setting_limits = False
+
+    def _update_xlim(self, x, full):
+        x_min, x_max = self._voltage_ax.get_xlim()
+        if full or x[-1] > x_max or x[0] < x_min:
+            # Leave free space at right to avoid redraw on every sample
+            span = max(x[-1] - x[0], 1.0)
+            self._set_xlim(x[0], x[0] + span * (1 + 2 * self.MARGIN))
+            return True
+        return False
+
+    def _update_ylim(self, axes, y, full):
+        y_min, y_max = axes.get_ylim()
+        low, high = y.min(), y.max()
+        if full or low < y_min or high > y_max:
+            axes.set_ylim(*self._fit_limits(low, high, self.MARGIN))
+            return True
+        return False
+
+    def _query(self):
+        points = int(self._voltage_ax.bbox.width)
+        if self.follow:
+            times = self.history.last(self.N)[0]
+            start, stop = times[0], times[-1]
+        else:
+            x_min, x_max = self._voltage_ax.get_xlim()
+            start, stop = x_min + self.init_time, x_max + self.init_time
+        times, voltage, current = self.history.query(start, stop, max(points, 2))
+        return times - self.init_time, voltage, current
+
+    def _update_canvas(self, full=False):
+        if len(self.history) == 0:
+            return
+        x, voltage, current = self._query()
+        if len(x) == 0:
+            return
+        self._voltage_line.set_data(x, voltage)
+        self._current_line.set_data(x, current)
+        full = full or self._background is None
+        if self.follow:
+            # Shift of time axes is rare, so it is good moment to shrink limits of values
+            full = self._update_xlim(x, full)
+            changed = self._update_ylim(self._voltage_ax, voltage, full)
+            changed = self._update_ylim(self._current_ax, current, full) or changed
+        else:
+            changed = full
+            if full:
+                self._update_ylim(self._voltage_ax, voltage, True)
+                self._update_ylim(self._current_ax, current, True)
+        if full or changed:
+            self._figure.canvas.draw()
+        else:
+            canvas = self._figure.canvas
+            canvas.restore_region(self._background)
+            self._draw_lines()
+            canvas.blit(self._figure.bbox)
@@ -1,18 +1,91 @@
-from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLineEdit, QPushButton, QFileDialog
+from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QLineEdit, QPushButton, QFileDialog, QLabel,
+                             QDoubleSpinBox, QComboBox)
 
+from hv.recording import RecordWriter
+from hv.ui.utils import HVWidgetSettings
 from hv.ui.widgets import update_style
 
 
 class Recorder(QWidget):
-    def __init__(self, parent, filename):
+    """
+    Record samples to CSV file, or to binary file if file has suffix .hvr.
+    Samples are written by background thread.
+    If rotation is set, record is split into segments `<name>.0001.csv`, ... listed in `<name>.manifest.json`.
+    """
+    COMPRESSION = {"None": "", "gzip": "gzip", "LZMA": "lzma"}
+
+    def __init__(self, parent, settings: HVWidgetSettings):
         super(Recorder, self).__init__(parent)
-        self.filename = filename
+        self.settings = settings
         self.turn_on = False
+        self.writer = None
         self.init_UI()
 
+    @property
+    def filename(self):
+        return self.settings.last_file
+
+    def _create_rotation_box(self):
+        hbox = QHBoxLayout()
+        hbox.addWidget(QLabel("Rotate by, MB:", self))
+        size_input = QDoubleSpinBox(self)
+        size_input.setMaximum(1e6)
+        size_input.setSpecialValueText("off")
+        size_input.setValue(self.settings.record_rotate_size)
+        hbox.addWidget(size_input)
+        hbox.addWidget(QLabel("hours:", self))
+        interval_input = QDoubleSpinBox(self)
+        interval_input.setMaximum(1e4)
+        interval_input.setSpecialValueText("off")
+        interval_input.setValue(self.settings.record_rotate_interval)
+        hbox.addWidget(interval_input)
+        hbox.addWidget(QLabel("compress:", self))
+        compression_box = QComboBox(self)
+        compression_box.addItems(self.COMPRESSION.keys())
+        for text, value in self.COMPRESSION.items():
+            if value == self.settings.record_compression:
+                compression_box.setCurrentText(text)
+        hbox.addWidget(compression_box)
+
+        def size(value):
+            self.settings.record_rotate_size = value
+            self._update_compression()
+
+        def interval(value):
+            self.settings.record_rotate_interval = value
+            self._update_compression()
+
+        def compression(text):
+            self.settings.record_compression = self.COMPRESSION[text]
+
+        size_input.valueChanged.connect(size)
+        interval_input.valueChanged.connect(interval)
+        compression_box.currentTextChanged.connect(compression)
+        self.rotation_inputs = [size_input, interval_input, compression_box]
+        self.compression_box = compression_box
+        self._update_compression()
+        return hbox
+
+    def _rotation(self):
+        return bool(self.settings.record_rotate_size or self.settings.record_rotate_interval)
+
+    def _update_compression(self):
+        # Only closed segments are compressed
+        self.compression_box.setEnabled(not self.turn_on and self._rotation())
+
+    def _create_writer(self):
+        return RecordWriter(self.filename,
+                            max_size=int(self.settings.record_rotate_size * 2 ** 20),
+                            max_interval=self.settings.record_rotate_interval * 3600,
+                            compression=(self.settings.record_compression or None) if self._rotation() else None)
+
     def init_UI(self):
+        vbox = QVBoxLayout()
+        vbox.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(vbox)
         hbox = QHBoxLayout()
-        self.setLayout(hbox)
+        vbox.addLayout(hbox)
+        vbox.addLayout(self._create_rotation_box())
         save_btn = QPushButton(self.style().standardIcon(self.style().SP_DirOpenIcon),"", self)
         hbox.addWidget(save_btn)
 
@@ -20,12 +93,13 @@ class Recorder(QWidget):
         hbox.addWidget(field)
 
         def change_filename(new):
-            self.filename = new
+            self.settings.last_file = new
 
         field.textChanged.connect(change_filename)
 
         def select_name():
-            name = QFileDialog.getSaveFileName(self, "Create/Select file for record")[0]
+            name = QFileDialog.getSaveFileName(self, "Create/Select file for record", self.filename,
+                                               "CSV (*.csv);;Binary columnar (*.hvr);;All files (*)")[0]
             if name is not None and name != "":
                 field.setText(name)
 
@@ -39,18 +113,30 @@ class Recorder(QWidget):
             self.turn_on = not self.turn_on
             field.setDisabled(self.turn_on)
             save_btn.setDisabled(self.turn_on)
+            for widget in self.rotation_inputs:
+                widget.setDisabled(self.turn_on)
+            self._update_compression()
             button.setProperty("turn_on", self.turn_on)
             update_style(button)
             if self.turn_on:
-                self.fout = open(self.filename, "a")
+                self.writer = self._create_writer()
+                self.writer.start()
                 button.setText("Stop record")
             else:
-                self.fout.close()
+                self.writer.close()
+                self.writer = None
                 button.setText("Start record")
 
         button.clicked.connect(turn)
 
     def add_data(self, time, U, I):
+        self.extend_data([time], [U], [I])
+
+    def extend_data(self, times, U, I):
         if self.turn_on:
-            self.fout.write("{},{},{}\n".format(time, U, I))
-            self.fout.flush()
+            self.writer.add(times, U, I)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
@@ -17,6 +17,13 @@ def appdata():
     return path
 
 
+def live_feed_path(name):
+    path = appdata() / "live"
+    if not path.exists():
+        os.makedirs(path)
+    return path / "{}.ring".format(name.replace("/", "_"))
+
+
 class QtLogging(logging.Handler):
     def __init__(self,parent, logger):
         super().__init__()
@@ -47,6 +54,12 @@ class HVWidgetSettings:
     auto_reset_generator: bool = True
     manual_mode: bool = True
     last_generator: str = "square wave"
+    poll_rate: float = 0.5  # Hz
+    auto_poll_rate: bool = False
+    record_rotate_size: float = 0.0  # MB, 0 - without rotation by size
+    record_rotate_interval: float = 0.0  # hours, 0 - without rotation by time
+    record_compression: str = ""  # "", "gzip" or "lzma"
+    live_feed: bool = False
     generators : dict = dataclasses.field(default_factory=dict)
 
     def resolve_generators(self, name):
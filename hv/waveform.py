@@ -0,0 +1,132 @@
+import functools
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from hv.codec import DeviceCodec
+from hv.protocol import RESET_CODE, UPDATE_CODE
+
+RISING = 1
+FALLING = -1
+
+ROW = np.dtype([("time", float), ("voltage", float), ("current", float), ("wait", np.int8)])
+
+
+class Waveform:
+    """
+    One cycle of generator compiled ahead of time to rows of (time, voltage, current, wait),
+    time is counted from the start of cycle. Consecutive rows with the same setpoint are removed
+    and every row keeps its encoded transfer (SET and UPDATE, or RESET for zero voltage),
+    so playback only looks up row by index of tick.
+
+    Row with `wait` doesn't change setpoint: playback polls device every `poll` seconds until measured
+    voltage reaches voltage of row (RISING from below, FALLING from above), the rest of cycle is shifted.
+    """
+
+    def __init__(self, rows: np.ndarray, period, poll, codec: DeviceCodec, accuracy):
+        rows = np.asarray(rows, dtype=ROW)
+        rows = _deduplicate(rows[rows["time"] < period])
+        rows.flags.writeable = False
+        self.rows = rows
+        self.period = period
+        self.poll = poll
+        self.accuracy = accuracy
+        self.frames: List[bytes] = _encode(rows, codec, accuracy)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.rows["time"]
+
+    @property
+    def barriers(self) -> List[int]:
+        """
+        Rows which playback must not skip: waits and setpoints they wait for
+        """
+        waits = np.flatnonzero(self.rows["wait"] != 0)
+        return sorted(set(waits.tolist()) | set(((waits - 1) % len(self.rows)).tolist()))
+
+    def reached(self, index, voltage) -> bool:
+        """
+        Check measured voltage against row `index` with wait
+        """
+        row = self.rows[index]
+        if row["wait"] == RISING:
+            return voltage >= row["voltage"] - self.accuracy
+        return voltage <= row["voltage"] + self.accuracy
+
+    def profile(self, cycles=2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return times, voltages and currents of setpoints for `cycles` periods (waits take no time),
+        the last point closes the last cycle
+        """
+        rows = self.rows[self.rows["wait"] == 0]
+        times = (rows["time"] + self.period * np.arange(cycles)[:, np.newaxis]).ravel()
+        voltage = np.tile(rows["voltage"], cycles)
+        current = np.tile(rows["current"], cycles)
+        return (np.append(times, cycles * self.period), np.append(voltage, voltage[-1:]),
+                np.append(current, current[-1:]))
+
+
+def _deduplicate(rows: np.ndarray) -> np.ndarray:
+    setpoints = np.flatnonzero(rows["wait"] == 0)
+    keep = rows["wait"] != 0
+    values = rows[setpoints]
+    keep[setpoints] = np.concatenate([[True], (np.diff(values["voltage"]) != 0) | (np.diff(values["current"]) != 0)])
+    return rows[keep].copy()
+
+
+def _encode(rows: np.ndarray, codec: DeviceCodec, accuracy) -> List[bytes]:
+    data = np.frombuffer(codec.encode_setpoints(rows["voltage"], rows["current"]), dtype=np.uint8).reshape(-1, 5)
+    frames = np.concatenate([data, np.full((len(rows), 1), UPDATE_CODE, dtype=np.uint8)], axis=1)
+    reset = bytes([RESET_CODE])
+    return [b"" if row["wait"] else reset if math.isclose(row["voltage"], 0.0, abs_tol=accuracy) else frame.tobytes()
+            for row, frame in zip(rows, frames)]
+
+
+# Compiled waveforms are cached by parameters and codec of device,
+# so restart of generator with the same parameters or its preview don't compile them again
+
+
+@functools.lru_cache(maxsize=32)
+def square_wave(codec: DeviceCodec, accuracy, period, impulse_length, max_voltage, min_voltage, current) -> Waveform:
+    rows = np.array([(0.0, max_voltage, current, 0), (impulse_length, min_voltage, current, 0)], dtype=ROW)
+    return Waveform(rows, period, period, codec, accuracy)
+
+
+@functools.lru_cache(maxsize=32)
+def stairs(codec: DeviceCodec, accuracy, time_step, voltage_step, max_voltage, min_voltage, current) -> Waveform:
+    """
+    Wait for min voltage, then rise by voltage steps up to max voltage and return to min voltage
+    """
+    count = max(int(math.floor((max_voltage - min_voltage) / voltage_step + 1e-9)), 0)
+    rows = np.zeros(count + 2, dtype=ROW)
+    rows["time"] = np.arange(count + 2) * time_step
+    rows["voltage"][0] = min_voltage
+    rows["voltage"][1:-1] = min_voltage + voltage_step * np.arange(1, count + 1)
+    rows["voltage"][-1] = min_voltage
+    rows["current"] = current
+    rows["wait"][0] = FALLING
+    return Waveform(rows, (count + 2) * time_step, time_step, codec, accuracy)
+
+
+@functools.lru_cache(maxsize=32)
+def reversed_rawtooth(codec: DeviceCodec, accuracy, tick, period, impulse_length, max_voltage, min_voltage,
+                      current) -> Waveform:
+    """
+    Set max voltage, wait for it and fall linearly to min voltage for impulse length, then stay at min voltage
+    """
+    cycle_ticks = max(round(period / tick), 1)
+    voltage_step = tick * (max_voltage - min_voltage) / impulse_length
+    # Ramp starts at the second tick and reaches min voltage after impulse length
+    ramp_ticks = min(math.ceil(impulse_length / tick - 1e-9) + 2, cycle_ticks)
+    rows = np.zeros(ramp_ticks, dtype=ROW)
+    rows["time"] = np.arange(ramp_ticks) * tick
+    rows["voltage"] = np.maximum(max_voltage - (np.arange(ramp_ticks) - 1).clip(0) * voltage_step, min_voltage)
+    rows["current"] = current
+    if ramp_ticks > 1:
+        rows["wait"][1] = RISING
+    return Waveform(rows, cycle_ticks * tick, tick, codec, accuracy)
@@ -40,8 +40,10 @@ setuptools.setup(
     install_requires=[
         "pyqt5",
         "pyftdi",
+        "pyserial",
         # "ftd2xx",
         "matplotlib",
+        "numpy",
         "Jinja2"
     ],
     python_requires=">=3.7"
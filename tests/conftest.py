@@ -0,0 +1,6 @@
+import pathlib
+import sys
+
+ROOT_PATH = pathlib.Path(__file__).absolute().parent.parent
+if str(ROOT_PATH) not in sys.path:
+    sys.path.insert(0, str(ROOT_PATH))
@@ -0,0 +1,148 @@
+import gzip
+import lzma
+import shutil
+
+import numpy as np
+import pytest
+
+from hv import data
+from hv.recording import RECORD_DTYPE, BinaryFormat, CsvFormat, RotatingOutput
+
+COUNT = 5000
+START = 1_700_000_000.0
+
+
+def samples(count=COUNT, start=START):
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    records["time"] = start + 0.01 * np.arange(count)
+    records["voltage"] = np.arange(count) % 1000
+    records["current"] = np.arange(count) % 7
+    return records
+
+
+def write(fmt, path, records, batch=333):
+    output = fmt(path)
+    for index in range(0, len(records), batch):
+        part = records[index:index + batch]
+        output.write(part["time"], part["voltage"], part["current"])
+    output.close()
+    return path
+
+
+def compress(path, suffix, opener):
+    target = path.with_name(path.name + suffix)
+    with path.open("rb") as fin, opener(str(target), "wb") as fout:
+        shutil.copyfileobj(fin, fout)
+    path.unlink()
+    return target
+
+
+def assert_records(actual, expected):
+    assert len(actual) == len(expected)
+    for name in RECORD_DTYPE.names:
+        np.testing.assert_allclose(actual[name], expected[name])
+
+
+@pytest.fixture(params=[CsvFormat, BinaryFormat], ids=["csv", "hvr"])
+def record(request, tmp_path):
+    fmt = request.param
+    return write(fmt, tmp_path / ("record" + fmt.SUFFIX), samples())
+
+
+def test_load_whole_record(record):
+    assert_records(data.load(record), samples())
+
+
+def test_chunks_are_bounded(record):
+    chunks = list(data.read_chunks(record, chunk_size=1000))
+    # CSV is read by blocks of bytes, lines of these samples are longer than 20 bytes
+    limit = 1000 if record.suffix == BinaryFormat.SUFFIX else 1000 * data.CSV_LINE_SIZE // 20
+    assert all(len(chunk) <= limit for chunk in chunks)
+    assert len(chunks) > 1
+    assert_records(np.concatenate(chunks), samples())
+
+
+def test_time_window(record):
+    expected = samples()
+    start, stop = expected["time"][1234], expected["time"][4321]
+    assert_records(data.load(record, start, stop), expected[1234:4322])
+
+
+def test_window_outside_record(record):
+    assert len(data.load(record, START - 100, START - 50)) == 0
+    assert len(data.load(record, START + 1000)) == 0
+
+
+def test_decimation(record):
+    expected = samples()
+    actual = np.concatenate(list(data.read_chunks(record, chunk_size=777, decimate=10)))
+    assert len(actual) == COUNT // 10
+    np.testing.assert_allclose(actual["voltage"], expected["voltage"].reshape(-1, 10).mean(axis=1))
+    np.testing.assert_allclose(actual["time"], expected["time"].reshape(-1, 10).mean(axis=1))
+
+
+def test_decimation_averages_rest(tmp_path):
+    expected = samples(25)
+    path = write(CsvFormat, tmp_path / "record.csv", expected)
+    actual = data.load(path, decimate=10)
+    assert len(actual) == 3
+    assert actual["voltage"][-1] == pytest.approx(expected["voltage"][20:].mean())
+
+
+def test_csv_with_header(tmp_path):
+    expected = samples(100)
+    path = tmp_path / "buffer.csv"
+    lines = ["{},{},{}\n".format(*row) for row in expected.tolist()]
+    path.write_text("Time, s,Voltage, V,Current, μA\n" + "".join(lines), encoding="utf-8")
+    assert_records(data.load(path), expected)
+
+
+def test_csv_incomplete_last_line_is_skipped(tmp_path):
+    expected = samples(100)
+    path = write(CsvFormat, tmp_path / "record.csv", expected)
+    with path.open("ab") as fout:
+        fout.write(b"1700000099.0,12")
+    assert_records(data.load(path), expected)
+
+
+def test_binary_ignores_records_after_counter(tmp_path):
+    expected = samples(100)
+    path = write(BinaryFormat, tmp_path / "record.hvr", expected)
+    with path.open("ab") as fout:
+        fout.write(samples(10).tobytes())
+    assert_records(data.load(path), expected)
+
+
+def test_not_a_binary_record(tmp_path):
+    path = tmp_path / "record.hvr"
+    path.write_bytes(b"garbage" * 20)
+    with pytest.raises(ValueError):
+        data.load(path)
+
+
+@pytest.mark.parametrize("suffix, opener", [(".gz", gzip.open), (".xz", lzma.open)], ids=["gzip", "lzma"])
+def test_compressed(record, suffix, opener):
+    expected = samples()
+    path = compress(record, suffix, opener)
+    assert_records(data.load(path), expected)
+    start, stop = expected["time"][100], expected["time"][200]
+    assert_records(data.load(path, start, stop), expected[100:201])
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".hvr"])
+@pytest.mark.parametrize("compression", [None, "gzip", "lzma"])
+def test_manifest_of_rotated_record(tmp_path, suffix, compression):
+    expected = samples()
+    path = tmp_path / ("record" + suffix)
+    output = RotatingOutput(path, max_interval=10.0, compression=compression)
+    for index in range(0, COUNT, 250):
+        part = expected[index:index + 250]
+        output.write(part["time"], part["voltage"], part["current"])
+    output.close()
+    if output.compressor is not None:
+        output.compressor.join()
+    assert not path.exists()
+    assert data.resolve_path(path).name == "record.manifest.json"
+    assert_records(data.load(path), expected)
+    start, stop = expected["time"][2100], expected["time"][3900]
+    assert_records(data.load(path, start, stop), expected[2100:3901])
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from hv.scheduler import CATCH_UP, SKIP, Scheduler, Task
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def noop(index):
+    pass
+
+
+def test_deadlines_are_counted_from_start():
+    task = Task(noop, 0.5, 10.0)
+    assert task.deadline() == 10.0
+    assert task.deadline(4) == 12.0
+
+
+def test_deadlines_of_offsets():
+    task = Task(noop, 4.0, 10.0, offsets=[0.0, 1.0, 2.5])
+    assert [task.deadline(index) for index in range(5)] == [10.0, 11.0, 12.5, 14.0, 15.0]
+    assert task.tolerance == 0.5
+
+
+@pytest.mark.parametrize("offsets", [[], [1.0, 0.5], [0.0, 4.0], [-1.0]])
+def test_invalid_offsets(offsets):
+    with pytest.raises(ValueError):
+        Task(noop, 4.0, 0.0, offsets=offsets)
+
+
+def test_invalid_barriers():
+    with pytest.raises(ValueError):
+        Task(noop, 4.0, 0.0, offsets=[0.0, 1.0], barriers=[2])
+
+
+def test_on_time_tick_is_not_late():
+    task = Task(noop, 1.0, 0.0)
+    assert list(task.due(0.1)) == [0]
+    assert task.late == 0
+    assert task.skipped == 0
+
+
+def test_skip_runs_newest_tick():
+    task = Task(noop, 1.0, 0.0, SKIP)
+    assert list(task.due(2.7)) == [2]
+    assert task.late == 1
+    assert task.skipped == 2
+
+
+def test_catch_up_runs_all_missed_ticks():
+    task = Task(noop, 1.0, 0.0, CATCH_UP)
+    assert list(task.due(2.7)) == [0, 1, 2]
+    assert task.late == 1
+    assert task.skipped == 0
+
+
+def test_tick_is_not_due_before_deadline():
+    task = Task(noop, 1.0, 0.0)
+    task.index = 3
+    assert list(task.due(2.5)) == [3]
+    assert task.late == 0
+
+
+def test_skip_stops_at_barrier():
+    task = Task(noop, 4.0, 0.0, SKIP, offsets=[0.0, 1.0, 2.0, 3.0], barriers=[1])
+    assert list(task.due(6.5)) == [1]
+    assert task.skipped == 1
+    task.index = 2
+    assert list(task.due(6.5)) == [5]
+    task.index = 6
+    assert list(task.due(6.5)) == [6]
+
+
+def test_barrier_in_the_next_cycle():
+    task = Task(noop, 4.0, 0.0, SKIP, offsets=[0.0, 1.0, 2.0, 3.0], barriers=[0])
+    task.index = 1
+    assert list(task.due(3.5)) == [3]
+    assert list(task.due(4.5)) == [4]
+
+
+def test_delay_counts_from_now():
+    clock = FakeClock(10.0)
+    task = Task(noop, 1.0, 0.0, clock=clock)
+    task.index = 3
+    task.delay(0.5)
+    assert task.deadline() == pytest.approx(10.5)
+    assert task.deadline(4) == pytest.approx(11.5)
+
+
+def test_delayed_tick_runs_again():
+    scheduler = Scheduler("test")
+    calls = []
+    done = threading.Event()
+
+    def callback(index):
+        calls.append(index)
+        if len(calls) < 3:
+            task.delay(0.01)
+        else:
+            done.set()
+
+    task = scheduler.schedule(callback, 10.0, time.monotonic() + 0.05)
+    assert done.wait(2.0)
+    scheduler.cancel(task)
+    assert calls == [0, 0, 0]
+
+
+def test_cancel_waits_for_running_callback():
+    scheduler = Scheduler("test")
+    started = threading.Event()
+    finished = threading.Event()
+    calls = []
+
+    def callback(index):
+        calls.append(index)
+        started.set()
+        time.sleep(0.1)
+        finished.set()
+
+    task = scheduler.schedule(callback, 0.01)
+    assert started.wait(2.0)
+    scheduler.cancel(task)
+    assert finished.is_set()
+    count = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == count
+
+
+def test_cancel_from_callback_does_not_wait():
+    scheduler = Scheduler("test")
+    done = threading.Event()
+
+    def callback(index):
+        scheduler.cancel(task)
+        done.set()
+
+    task = scheduler.schedule(callback, 0.01, time.monotonic() + 0.05)
+    assert done.wait(2.0)
+    assert task.cancelled
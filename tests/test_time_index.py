@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from hv import data
+from hv.recording import RECORD_DTYPE, CsvFormat, TimeIndex
+
+STEP = 8
+
+
+@pytest.fixture(autouse=True)
+def small_step(monkeypatch):
+    monkeypatch.setattr(TimeIndex, "STEP", STEP)
+
+
+def samples(count, start=1000.0):
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    records["time"] = start + 0.5 * np.arange(count)
+    records["voltage"] = np.arange(count)
+    records["current"] = 1.0
+    return records
+
+
+def write_csv(path, records, batch=5):
+    output = CsvFormat(path)
+    for index in range(0, len(records), batch):
+        part = records[index:index + batch]
+        output.write(part["time"], part["voltage"], part["current"])
+    output.close()
+    return path
+
+
+def line_at(path, offset):
+    with open(path, "rb") as fin:
+        fin.seek(offset)
+        return fin.readline()
+
+
+def test_writer_indexes_every_step_line(tmp_path):
+    records = samples(100)
+    path = write_csv(tmp_path / "record.csv", records)
+    entries = TimeIndex.load(path)
+    assert entries["time"].tolist() == records["time"][::STEP].tolist()
+    for time, offset in entries.tolist():
+        assert float(line_at(path, offset).split(b",")[0]) == time
+
+
+def test_writer_index_matches_scan(tmp_path):
+    path = write_csv(tmp_path / "record.csv", samples(100), batch=3)
+    with open(path, "rb") as fin:
+        entries, phase = TimeIndex.scan(fin)
+    assert entries == TimeIndex.load(path).tolist()
+    assert phase == 100 % STEP
+
+
+def test_appending_writer_continues_index(tmp_path):
+    records = samples(50)
+    path = write_csv(tmp_path / "record.csv", records[:21])
+    write_csv(path, records[21:])
+    assert TimeIndex.load(path)["time"].tolist() == records["time"][::STEP].tolist()
+
+
+def test_seek(tmp_path):
+    records = samples(100)
+    path = write_csv(tmp_path / "record.csv", records)
+    entries = TimeIndex.load(path)
+    assert TimeIndex.seek(entries, records["time"][0] - 1) == 0
+    offset = TimeIndex.seek(entries, records["time"][20])
+    assert float(line_at(path, offset).split(b",")[0]) == records["time"][16]
+    offset = TimeIndex.seek(entries, records["time"][-1] + 100)
+    assert float(line_at(path, offset).split(b",")[0]) == records["time"][96]
+
+
+def test_update_indexes_lines_without_index(tmp_path):
+    records = samples(40)
+    path = tmp_path / "record.csv"
+    path.write_text("".join("{},{},{}\n".format(*row) for row in records.tolist()))
+    entries = TimeIndex.update(path)
+    assert entries["time"].tolist() == records["time"][::STEP].tolist()
+    assert TimeIndex.load(path).tolist() == entries.tolist()
+
+
+def test_update_indexes_appended_lines(tmp_path):
+    records = samples(60)
+    path = write_csv(tmp_path / "record.csv", records[:30])
+    with path.open("a") as fout:
+        fout.write("".join("{},{},{}\n".format(*row) for row in records[30:].tolist()))
+    assert TimeIndex.update(path)["time"].tolist() == records["time"][::STEP].tolist()
+
+
+def test_scan_skips_header_broken_and_incomplete_lines(tmp_path):
+    path = tmp_path / "record.csv"
+    lines = ["{},1,1\n".format(index) for index in range(3 * STEP)]
+    lines[STEP] = "garbage\n"
+    lines[2 * STEP] = "13.5\n"
+    path.write_text("Time, s,Voltage, V,Current\n" + "".join(lines) + "99,1")
+    entries = TimeIndex.update(path)
+    assert entries["time"].tolist() == [0.0]
+
+
+def test_load_drops_entries_after_truncation(tmp_path):
+    path = write_csv(tmp_path / "record.csv", samples(100))
+    entries = TimeIndex.load(path)
+    with path.open("r+b") as fout:
+        fout.truncate(int(entries["offset"][5]))
+    assert TimeIndex.load(path).tolist() == entries[:5].tolist()
+
+
+def test_update_doesnt_replace_index_of_open_writer(tmp_path):
+    records = samples(30)
+    path = tmp_path / "record.csv"
+    output = CsvFormat(path)
+    output.write(records["time"][:10], records["voltage"][:10], records["current"][:10])
+    output.flush()
+    with path.open("a") as fout:
+        fout.write("".join("{},{},{}\n".format(*row) for row in records[10:].tolist()))
+    index = TimeIndex.path_for(path).read_bytes()
+    assert len(TimeIndex.update(path)) == 4
+    assert TimeIndex.path_for(path).read_bytes() == index
+    output.close()
+
+
+def test_query_with_start_uses_index(tmp_path):
+    records = samples(1000)
+    path = write_csv(tmp_path / "record.csv", records, batch=100)
+    start, stop = records["time"][333], records["time"][666]
+    actual = data.load(path, start, stop)
+    np.testing.assert_array_equal(actual["time"], records["time"][333:667])
+
+
+def test_aggregate_buckets_span_chunks(tmp_path):
+    records = samples(100)
+    path = write_csv(tmp_path / "record.csv", records)
+    interval = 4.0
+    result = np.concatenate(list(data.aggregate(data.read_chunks(path, chunk_size=3), interval)))
+    buckets = np.floor(records["time"] / interval)
+    assert result["time"].tolist() == (np.unique(buckets) * interval).tolist()
+    assert result["count"].sum() == len(records)
+    for row in result:
+        selected = records[buckets == row["time"] / interval]
+        assert row["count"] == len(selected)
+        assert row["voltage_mean"] == pytest.approx(selected["voltage"].mean())
+        assert row["voltage_min"] == selected["voltage"].min()
+        assert row["voltage_max"] == selected["voltage"].max()
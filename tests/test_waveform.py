@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from hv import waveform
+from hv.codec import DeviceCodec
+from hv.device_registry import DeviceData
+from hv.protocol import RESET_CODE, SET_CODE, UPDATE_CODE
+from hv.waveform import FALLING, RISING, ROW
+
+ACCURACY = 1.0
+
+
+@pytest.fixture(scope="module")
+def codec():
+    return DeviceCodec(DeviceData.load_device_data("HT-60-30-P"))
+
+
+def setpoint_frame(codec, voltage, current):
+    return bytes([SET_CODE]) + codec.encode_setpoint(voltage, current) + bytes([UPDATE_CODE])
+
+
+def test_square_wave(codec):
+    compiled = waveform.square_wave(codec, ACCURACY, 2.0, 0.6, 1000.0, 100.0, 50.0)
+    assert compiled.period == 2.0
+    assert compiled.times.tolist() == [0.0, 0.6]
+    assert compiled.rows["voltage"].tolist() == [1000.0, 100.0]
+    assert compiled.rows["wait"].tolist() == [0, 0]
+    assert compiled.frames == [setpoint_frame(codec, 1000.0, 50.0), setpoint_frame(codec, 100.0, 50.0)]
+    assert compiled.barriers == []
+
+
+def test_square_wave_min_voltage_zero_resets(codec):
+    compiled = waveform.square_wave(codec, ACCURACY, 2.0, 1.0, 1000.0, 0.0, 50.0)
+    assert compiled.frames[1] == bytes([RESET_CODE])
+
+
+def test_square_wave_full_duty_cycle(codec):
+    compiled = waveform.square_wave(codec, ACCURACY, 2.0, 2.0, 1000.0, 0.0, 50.0)
+    assert len(compiled) == 1
+    assert compiled.rows["voltage"].tolist() == [1000.0]
+
+
+def test_compiled_waveform_is_cached(codec):
+    first = waveform.square_wave(codec, ACCURACY, 3.0, 1.0, 1000.0, 0.0, 50.0)
+    assert waveform.square_wave(codec, ACCURACY, 3.0, 1.0, 1000.0, 0.0, 50.0) is first
+    assert not first.rows.flags.writeable
+
+
+def test_stairs(codec):
+    compiled = waveform.stairs(codec, ACCURACY, 0.5, 300.0, 1000.0, 0.0, 50.0)
+    assert compiled.period == 2.5
+    assert compiled.poll == 0.5
+    assert compiled.times.tolist() == [0.0, 0.5, 1.0, 1.5, 2.0]
+    assert compiled.rows["voltage"].tolist() == [0.0, 300.0, 600.0, 900.0, 0.0]
+    assert compiled.rows["wait"].tolist() == [FALLING, 0, 0, 0, 0]
+    assert compiled.frames[0] == b""
+    assert compiled.frames[1] == setpoint_frame(codec, 300.0, 50.0)
+    assert compiled.frames[-1] == bytes([RESET_CODE])
+    # Wait for min voltage and the setpoint of min voltage before it
+    assert compiled.barriers == [0, 4]
+
+
+def test_stairs_reach_max_voltage(codec):
+    compiled = waveform.stairs(codec, ACCURACY, 1.0, 250.0, 1000.0, 0.0, 50.0)
+    assert compiled.rows["voltage"].tolist() == [0.0, 250.0, 500.0, 750.0, 1000.0, 0.0]
+
+
+def test_stairs_step_above_range(codec):
+    compiled = waveform.stairs(codec, ACCURACY, 1.0, 500.0, 300.0, 100.0, 50.0)
+    assert compiled.rows["voltage"].tolist() == [100.0, 100.0]
+    assert compiled.rows["wait"].tolist() == [FALLING, 0]
+
+
+def test_reversed_rawtooth(codec):
+    compiled = waveform.reversed_rawtooth(codec, ACCURACY, 0.5, 4.0, 2.0, 1000.0, 0.0, 50.0)
+    assert compiled.period == 4.0
+    assert compiled.times.tolist() == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    assert compiled.rows["voltage"].tolist() == [1000.0, 1000.0, 750.0, 500.0, 250.0, 0.0]
+    assert compiled.rows["wait"].tolist() == [0, RISING, 0, 0, 0, 0]
+    assert compiled.frames[1] == b""
+    assert compiled.frames[-1] == bytes([RESET_CODE])
+    assert compiled.barriers == [0, 1]
+
+
+def test_reversed_rawtooth_impulse_shorter_than_tick(codec):
+    compiled = waveform.reversed_rawtooth(codec, ACCURACY, 0.5, 4.0, 0.3, 1000.0, 200.0, 50.0)
+    assert compiled.times.tolist() == [0.0, 0.5, 1.0]
+    assert compiled.rows["voltage"].tolist() == [1000.0, 1000.0, 200.0]
+    assert compiled.frames[-1] == setpoint_frame(codec, 200.0, 50.0)
+
+
+def test_reversed_rawtooth_is_cut_by_period(codec):
+    compiled = waveform.reversed_rawtooth(codec, ACCURACY, 0.5, 1.0, 1.0, 1000.0, 0.0, 50.0)
+    assert compiled.times.tolist() == [0.0, 0.5]
+    assert compiled.rows["wait"].tolist() == [0, RISING]
+
+
+def test_deduplicate_keeps_waits():
+    rows = np.array([(0.0, 100.0, 1.0, 0), (1.0, 100.0, 1.0, 0), (2.0, 100.0, 1.0, RISING),
+                     (3.0, 100.0, 1.0, 0), (4.0, 100.0, 2.0, 0), (5.0, 200.0, 2.0, 0)], dtype=ROW)
+    assert waveform._deduplicate(rows)["time"].tolist() == [0.0, 2.0, 4.0, 5.0]
+
+
+def test_reached(codec):
+    compiled = waveform.reversed_rawtooth(codec, ACCURACY, 0.5, 4.0, 2.0, 1000.0, 0.0, 50.0)
+    assert compiled.reached(1, 999.5)
+    assert compiled.reached(1, 1200.0)
+    assert not compiled.reached(1, 990.0)
+    compiled = waveform.stairs(codec, ACCURACY, 0.5, 300.0, 1000.0, 100.0, 50.0)
+    assert compiled.reached(0, 100.5)
+    assert compiled.reached(0, 50.0)
+    assert not compiled.reached(0, 110.0)
+
+
+def test_profile(codec):
+    compiled = waveform.square_wave(codec, ACCURACY, 2.0, 0.5, 1000.0, 0.0, 50.0)
+    times, voltage, current = compiled.profile(2)
+    assert times.tolist() == [0.0, 0.5, 2.0, 2.5, 4.0]
+    assert voltage.tolist() == [1000.0, 0.0, 1000.0, 0.0, 0.0]
+    assert current.tolist() == [50.0] * 5